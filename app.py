@@ -1,9 +1,34 @@
-from flask import Flask, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+import os
+import secrets
+from concurrent.futures import TimeoutError as FutureTimeout
+from flask import Flask, request, jsonify, g
 from peewee import IntegrityError
-from models.database_models import db, User, Feed, Subscription
+from models.database_models import db, create_tables, User, Feed, Article, Subscription, Category
+from services.response_cache import ResponseCache, MemoryStore, RedisStore
+from services.auth import TokenManager, require_auth, hash_password, verify_password
+from services.notifications import NotificationEngine
+from services.article_events import notify_subscriptions_changed
+from services.trends import TrendSnapshot
+from services.summaries import Summarizer, OpenAIBackend
 
 app = Flask(__name__)
+# SECRET_KEY must be shared by every API process so tokens validate everywhere
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
+tokens = TokenManager(app.config['SECRET_KEY'])
+notifications = NotificationEngine()
+trends = TrendSnapshot(os.environ.get('TRENDS_SNAPSHOT', 'trends.json'))
+# Without an OpenAI key nothing is generated, so feed-provided summaries are never overwritten
+summarizer = (
+    Summarizer(OpenAIBackend(api_key=os.environ['OPENAI_API_KEY'])) if os.environ.get('OPENAI_API_KEY') else None
+)
+SUMMARY_WAIT_SECONDS = 20
+# Set CACHE_REDIS_URL to share cached responses across API processes
+if not os.environ.get('CACHE_REDIS_URL') and int(os.environ.get('WEB_CONCURRENCY', '1')) > 1:
+    # Each process would keep its own counters and miss the others' invalidations
+    raise RuntimeError('CACHE_REDIS_URL is required when running more than one API worker')
+response_cache = ResponseCache(
+    RedisStore(os.environ['CACHE_REDIS_URL']) if os.environ.get('CACHE_REDIS_URL') else MemoryStore()
+)
 
 @app.route('/register', methods=['POST'])
 def register():
@@ -15,7 +40,10 @@ def register():
     if not name or not email or not password:
         return jsonify({'error': 'Missing required fields'}), 400
     
-    password_hash = generate_password_hash(password)
+    try:
+        password_hash = hash_password(password)
+    except FutureTimeout:
+        return jsonify({'error': 'Server busy, try again'}), 503
     
     try:
         with db.atomic():
@@ -35,12 +63,28 @@ def login():
     
     try:
         user = User.get(User.email == email)
-        if check_password_hash(user.password_hash, password):
-            return jsonify({'message': 'Login successful'}), 200
+        if verify_password(user.password_hash, password):
+            return jsonify(dict(tokens.issue(user.id), message='Login successful')), 200
         else:
             return jsonify({'error': 'Invalid credentials'}), 401
     except User.DoesNotExist:
         return jsonify({'error': 'Invalid credentials'}), 401
+    except FutureTimeout:
+        # Every hashing worker is busy; tell the client to back off rather than fail with 500
+        return jsonify({'error': 'Server busy, try again'}), 503
+
+@app.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    data = request.get_json()
+    refresh = data.get('refresh_token')
+
+    if not refresh:
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    issued = tokens.refresh(refresh)
+    if issued is None:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+    return jsonify(issued), 200
 
 @app.route('/register_feed', methods=['POST'])
 def register_feed():
@@ -61,11 +105,10 @@ def register_feed():
         return jsonify({'error': 'Feed URL already registered'}), 400
 
 @app.route('/api/subscriptions', methods=['GET'])
+@require_auth(tokens)
+@response_cache.cached(lambda: g.user_id)
 def get_subscriptions():
-    user_id = request.args.get('user_id')
-    if not user_id:
-        return jsonify({'error': 'Missing user_id'}), 400
-
+    user_id = g.user_id
     subscriptions = Subscription.select().where(Subscription.user_id == user_id)
     subscriptions_data = [
         {
@@ -80,7 +123,96 @@ def get_subscriptions():
         }
         for subscription in subscriptions
     ]
-    return jsonify(subscriptions_data), 200
+    return subscriptions_data, 200
+
+@app.route('/api/subscriptions', methods=['POST'])
+@require_auth(tokens)
+def subscribe():
+    data = request.get_json() or {}
+    feed_id = data.get('feed_id')
+    category_id = data.get('category_id')
+
+    if not feed_id:
+        return jsonify({'error': 'Missing required fields'}), 400
+    if not Feed.select().where(Feed.id == feed_id).exists():
+        return jsonify({'error': 'Feed not found'}), 404
+    if category_id and not Category.select().where(
+            (Category.id == category_id) & (Category.user == g.user_id)).exists():
+        return jsonify({'error': 'Category not found'}), 404
+    if Subscription.select().where((Subscription.user == g.user_id) & (Subscription.feed == feed_id)).exists():
+        return jsonify({'error': 'Already subscribed'}), 400
+
+    with db.atomic():
+        subscription = Subscription.create(user=g.user_id, feed=feed_id, category=category_id or None)
+        # Delivered to the SSE servers when the transaction commits
+        notify_subscriptions_changed(g.user_id)
+    response_cache.invalidate_user(g.user_id)
+    return jsonify({'id': subscription.id, 'message': 'Subscribed successfully'}), 201
+
+@app.route('/api/subscriptions/<int:subscription_id>', methods=['DELETE'])
+@require_auth(tokens)
+def unsubscribe(subscription_id):
+    with db.atomic():
+        deleted = (Subscription
+                   .delete()
+                   .where((Subscription.id == subscription_id) & (Subscription.user == g.user_id))
+                   .execute())
+        if deleted:
+            notify_subscriptions_changed(g.user_id)
+    if not deleted:
+        return jsonify({'error': 'Subscription not found'}), 404
+    response_cache.invalidate_user(g.user_id)
+    return jsonify({'message': 'Unsubscribed successfully'}), 200
+
+@app.route('/api/notifications', methods=['GET'])
+@require_auth(tokens)
+def get_notifications():
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    items = notifications.fetch(g.user_id, limit=limit)
+    for item in items:
+        item['created_at'] = item['created_at'].isoformat() if item['created_at'] else None
+    return jsonify(items), 200
+
+@app.route('/api/notifications/read', methods=['POST'])
+@require_auth(tokens)
+def mark_notifications_read():
+    notifications.mark_all_read(g.user_id)
+    return jsonify({'message': 'Notifications marked as read'}), 200
+
+@app.route('/api/trends', methods=['GET'])
+def get_trends():
+    # scope is 'all', 'lang:<code>', 'feed:<id>' or 'category:<id>'
+    scope = request.args.get('scope', 'all')
+    kind = request.args.get('kind')
+    limit = min(request.args.get('limit', 20, type=int), 50)
+    return jsonify({
+        'generated_at': trends.generated_at,
+        'scope': scope,
+        'trends': trends.top(scope, kind=kind, limit=limit),
+    }), 200
+
+@app.route('/api/articles/<int:article_id>/summary', methods=['GET'])
+@require_auth(tokens)
+def get_article_summary(article_id):
+    if summarizer is None:
+        article = Article.select(Article.summary).where(Article.id == article_id).first()
+        if article is None:
+            return jsonify({'error': 'Article not found'}), 404
+        if not article.summary:
+            return jsonify({'error': 'Summarization is not configured'}), 503
+        return jsonify({'article_id': article_id, 'summary': article.summary}), 200
+    future = summarizer.submit(article_id)
+    if future is None:
+        return jsonify({'error': 'Article not found'}), 404
+    try:
+        summary = future.result(timeout=SUMMARY_WAIT_SECONDS)
+    except FutureTimeout:
+        # Still being generated; the client can poll again
+        return jsonify({'article_id': article_id, 'status': 'pending'}), 202
+    except Exception:
+        return jsonify({'error': 'Summary unavailable'}), 502
+    return jsonify({'article_id': article_id, 'summary': summary}), 200
 
 if __name__ == '__main__':
+    create_tables()
     app.run(debug=True)
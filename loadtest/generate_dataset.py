@@ -0,0 +1,197 @@
+"""
+Seeded synthetic dataset for load testing the API against a local Postgres.
+
+Feed popularity (articles per feed and subscribers per feed) follows a Zipf
+distribution, so a handful of feeds are huge and most are tiny, as in
+production. Every user can log in as user<N>@example.com / password.
+
+    python -m loadtest.generate_dataset --reset --users 10000 --feeds 2000 --articles 1000000
+"""
+import argparse
+import csv
+import io
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, List, Sequence
+
+from werkzeug.security import generate_password_hash
+
+from models.database_models import (
+    db, create_tables, MODELS, User, Feed, Article, Category, Subscription, UserInteraction,
+    Notification, Setting, FeedEvent, NotificationCursor
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_ROWS = 50000
+LOADTEST_PASSWORD = 'password'
+WORDS = (
+    'xu hướng công nghệ kinh tế thị trường dữ liệu ai model startup cloud '
+    'security open source python release update report market growth policy '
+    'chip energy climate health sport travel finance bank crypto mobile'
+).split()
+
+
+def zipf_cum_weights(n: int, s: float) -> List[float]:
+    """Cumulative Zipf weights for ranks 1..n, ready for random.choices"""
+    total = 0.0
+    cum = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank ** s
+        cum.append(total)
+    return cum
+
+
+def copy_rows(model, columns: Sequence[str], rows: Iterator[Sequence]) -> int:
+    """Stream rows into a table with COPY ... FROM STDIN in bounded buffers"""
+    table = model._meta.table_name
+    sql = f'COPY "{table}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)'
+    cursor = db.connection().cursor()
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % COPY_BUFFER_ROWS == 0:
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+    if buffer.tell():
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+    return count
+
+
+def sentence(rng: random.Random, low: int, high: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+class DatasetGenerator:
+    def __init__(self, users: int, feeds: int, articles: int, subscriptions_per_user: int,
+                 interactions: int, zipf_s: float = 1.1, seed: int = 42):
+        self.users = users
+        self.feeds = feeds
+        self.articles = articles
+        self.subscriptions_per_user = min(subscriptions_per_user, feeds)
+        self.interactions = interactions
+        self.rng = random.Random(seed)
+        self.feed_weights = zipf_cum_weights(feeds, zipf_s)
+        self.now = datetime.now()
+
+    def _timed(self, label: str, fn: Callable[[], int]):
+        start = time.perf_counter()
+        count = fn()
+        elapsed = time.perf_counter() - start
+        logger.info(f"{label}: {count} rows in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    def _users(self) -> Iterator[Sequence]:
+        # One hash for everyone: hashing millions of passwords would dominate the run
+        password_hash = generate_password_hash(LOADTEST_PASSWORD)
+        for i in range(1, self.users + 1):
+            yield (i, f'User {i}', f'user{i}@example.com', password_hash, 'user')
+
+    def _feeds(self) -> Iterator[Sequence]:
+        languages = ['vi', 'en']
+        for i in range(1, self.feeds + 1):
+            yield (i, f'Feed {i}', f'https://feed{i}.example.com/rss', sentence(self.rng, 5, 15),
+                   self.rng.choice(languages))
+
+    def _articles(self) -> Iterator[Sequence]:
+        feed_ids = range(1, self.feeds + 1)
+        batch = 10000
+        for start in range(1, self.articles + 1, batch):
+            chosen = self.rng.choices(feed_ids, cum_weights=self.feed_weights,
+                                      k=min(batch, self.articles - start + 1))
+            for offset, feed_id in enumerate(chosen):
+                i = start + offset
+                published = self.now - timedelta(seconds=self.rng.randint(0, 30 * 86400))
+                yield (i, feed_id, sentence(self.rng, 4, 12), sentence(self.rng, 10, 30),
+                       sentence(self.rng, 80, 300), f'https://feed{feed_id}.example.com/a/{i}',
+                       f'Author {self.rng.randint(1, 500)}', published.isoformat())
+
+    def _subscriptions(self) -> Iterator[Sequence]:
+        feed_ids = range(1, self.feeds + 1)
+        next_id = 1
+        for user_id in range(1, self.users + 1):
+            wanted = self.rng.randint(1, self.subscriptions_per_user)
+            chosen = set()
+            while len(chosen) < wanted:
+                chosen.update(self.rng.choices(feed_ids, cum_weights=self.feed_weights, k=wanted - len(chosen)))
+            for feed_id in chosen:
+                yield (next_id, user_id, feed_id)
+                next_id += 1
+
+    def _interactions(self) -> Iterator[Sequence]:
+        # Recent articles get most of the reads: skew towards high ids
+        for i in range(1, self.interactions + 1):
+            article_id = self.articles - int(self.rng.paretovariate(1.2)) % self.articles
+            yield (i, self.rng.randint(1, self.users), article_id,
+                   self.rng.choice(['read', 'unread']), self.rng.random() < 0.05, self.rng.random() < 0.02)
+
+    def run(self):
+        with db.atomic():
+            self._timed('users', lambda: copy_rows(User, ['id', 'name', 'email', 'password_hash', 'role'], self._users()))
+            self._timed('feeds', lambda: copy_rows(Feed, ['id', 'title', 'url', 'description', 'language'], self._feeds()))
+            self._timed('articles', lambda: copy_rows(
+                Article, ['id', 'feed_id', 'title', 'summary', 'content', 'url', 'author', 'published_at'],
+                self._articles()))
+            self._timed('subscriptions', lambda: copy_rows(Subscription, ['id', 'user_id', 'feed_id'], self._subscriptions()))
+            self._timed('interactions', lambda: copy_rows(
+                UserInteraction, ['id', 'user_id', 'article_id', 'status', 'is_favorite', 'is_saved'],
+                self._interactions()))
+            # Ids were written explicitly, move the sequences past them
+            for model in (User, Feed, Article, Subscription, UserInteraction):
+                table = model._meta.table_name
+                db.execute_sql(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM \"{table}\"), 1))"
+                )
+        db.execute_sql('ANALYZE')
+
+
+def reset_tables():
+    tables = ', '.join(f'"{model._meta.table_name}"' for model in MODELS)
+    db.execute_sql(f'TRUNCATE {tables} RESTART IDENTITY CASCADE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic load-test dataset')
+    parser.add_argument('--reset', action='store_true',
+                        help='Truncate all application tables first; without it the tables must be empty')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--feeds', type=int, default=2000)
+    parser.add_argument('--articles', type=int, default=1000000)
+    parser.add_argument('--subscriptions-per-user', type=int, default=30)
+    parser.add_argument('--interactions', type=int, default=2000000)
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent for feed popularity')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    db.connect(reuse_if_open=True)
+    create_tables()
+    if args.reset:
+        reset_tables()
+    elif User.select().exists() or Feed.select().exists():
+        # Ids are generated sequentially, so rows already present would collide
+        parser.error('application tables are not empty, pass --reset to truncate them')
+    DatasetGenerator(
+        users=args.users,
+        feeds=args.feeds,
+        articles=args.articles,
+        subscriptions_per_user=args.subscriptions_per_user,
+        interactions=args.interactions,
+        zipf_s=args.zipf,
+        seed=args.seed,
+    ).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Closed-loop HTTP load test for the API.
+
+Each worker thread logs in as one generated user and then issues a weighted
+mix of requests until the duration elapses. Results are reported per endpoint
+as throughput and p50/p95/p99 latency.
+
+    python -m loadtest.load_test --base-url http://localhost:5000 --concurrency 32 --duration 60
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+# Must match loadtest.generate_dataset.LOADTEST_PASSWORD; not imported to keep the client free of peewee
+LOADTEST_PASSWORD = 'password'
+# Names accepted in --mix, each a Worker action
+ACTIONS = ('subscriptions', 'notifications', 'login', 'register_feed')
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, elapsed: float, status: Optional[int], ok: bool):
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            if status is not None:
+                self.statuses[endpoint][status] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Worker(threading.Thread):
+    def __init__(self, base_url: str, user_index: int, recorder: Recorder, deadline: float,
+                 mix: List[Tuple[str, float]], seed: int):
+        super().__init__(daemon=True)
+        self.base_url = base_url.rstrip('/')
+        self.email = f'user{user_index}@example.com'
+        self.recorder = recorder
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.names = [name for name, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.session = requests.Session()
+        self.token = None
+        self.etags: Dict[str, str] = {}
+
+    def _call(self, endpoint: str, method: str, path: str, ok_statuses=(200,), **kwargs) -> Optional[requests.Response]:
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+        except requests.RequestException:
+            self.recorder.record(endpoint, time.perf_counter() - start, None, False)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, response.status_code,
+                             response.status_code in ok_statuses)
+        return response
+
+    def login(self):
+        response = self._call('POST /login', 'POST', '/login',
+                              json={'email': self.email, 'password': LOADTEST_PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.token = response.json().get('access_token')
+
+    def get_cached(self, endpoint: str, path: str):
+        headers = {'Authorization': f'Bearer {self.token}'}
+        if path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        response = self._call(endpoint, 'GET', path, ok_statuses=(200, 304), headers=headers)
+        if response is not None and response.headers.get('ETag'):
+            self.etags[path] = response.headers['ETag']
+
+    def register_feed(self):
+        url = f'https://loadtest.example.com/{uuid.uuid4().hex}/rss'
+        self._call('POST /register_feed', 'POST', '/register_feed', ok_statuses=(201,),
+                   json={'title': 'Load test feed', 'url': url, 'language': 'en'})
+
+    def run(self):
+        self.login()
+        actions: Dict[str, Callable[[], None]] = {
+            'login': self.login,
+            'subscriptions': lambda: self.get_cached('GET /api/subscriptions', '/api/subscriptions'),
+            'notifications': lambda: self.get_cached('GET /api/notifications', '/api/notifications'),
+            'register_feed': self.register_feed,
+        }
+        while time.monotonic() < self.deadline:
+            action = self.rng.choices(self.names, weights=self.weights)[0]
+            actions[action]()
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """argparse type for name=weight pairs, names restricted to ACTIONS"""
+    mix = []
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"invalid action {name!r} (choose from {', '.join(ACTIONS)})")
+        try:
+            mix.append((name, float(weight)))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid weight for {name!r}: {weight!r}")
+    return mix
+
+
+def report(recorder: Recorder, duration: float) -> Dict[str, Dict]:
+    summary = {}
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        summary[endpoint] = {
+            'requests': len(values),
+            'errors': recorder.errors[endpoint],
+            'rps': len(values) / duration,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'statuses': dict(recorder.statuses[endpoint]),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API load test')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+    parser.add_argument('--users', type=int, default=10000, help='Number of generated users to draw from')
+    parser.add_argument('--mix', type=parse_mix, default='subscriptions=70,notifications=20,login=5,register_feed=5',
+                        help=f"Weighted action mix, e.g. subscriptions=70,login=30; actions: {', '.join(ACTIONS)}")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Write the summary to this file')
+    args = parser.parse_args()
+
+    mix = args.mix
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    start = time.monotonic()
+    deadline = start + args.duration
+    workers = [
+        Worker(args.base_url, rng.randint(1, args.users), recorder, deadline, mix, seed=args.seed + i)
+        for i in range(args.concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - start
+
+    summary = report(recorder, elapsed)
+    print(f"\n=== Load Test Results ({args.concurrency} workers, {elapsed:.1f}s) ===")
+    print(f"{'endpoint':<28}{'reqs':>8}{'err':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, row in summary.items():
+        print(f"{endpoint:<28}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+    total = sum(row['requests'] for row in summary.values())
+    print(f"\nTotal throughput: {total / elapsed:.1f} req/s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
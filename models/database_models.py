@@ -73,3 +73,31 @@ class Setting(BaseModel):
     theme = EnumField(choices=['light', 'dark'], default='light')
     language = CharField(max_length=50, default='en')
     notifications_enabled = BooleanField(default=True)
+
+class FeedEvent(BaseModel):
+    """Per-feed event log, read by subscribers of large feeds (fan-out-on-read)"""
+    id = AutoField()
+    feed = ForeignKeyField(Feed, backref='events', on_delete='CASCADE')
+    message = TextField()
+    created_at = DateTimeField(constraints=[SQL('DEFAULT CURRENT_TIMESTAMP')], index=True)
+
+class NotificationCursor(BaseModel):
+    """Marks how far a user has read the per-feed event logs"""
+    id = AutoField()
+    user = ForeignKeyField(User, backref='notification_cursor', on_delete='CASCADE', unique=True)
+    read_until = DateTimeField(constraints=[SQL('DEFAULT CURRENT_TIMESTAMP')])
+
+class SummaryCache(BaseModel):
+    """Generated summaries keyed by a hash of the summarizer version and article text"""
+    id = AutoField()
+    content_hash = CharField(max_length=64, unique=True)
+    summary = TextField()
+    model = CharField(max_length=100)
+    created_at = DateTimeField(constraints=[SQL('DEFAULT CURRENT_TIMESTAMP')])
+
+MODELS = [User, Feed, Article, Category, Subscription, UserInteraction,
+          Notification, Setting, FeedEvent, NotificationCursor, SummaryCache]
+
+def create_tables():
+    """Create any missing application tables"""
+    db.create_tables(MODELS, safe=True)
@@ -0,0 +1,263 @@
+import argparse
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def _fsync_dir(directory: str):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit-length vectors, scored by inner product.
+
+    A k-means coarse quantizer splits the space into nlist cells; a query
+    scans only the nprobe closest cells. Vectors are stored per cell as
+    contiguous float16 blocks so a probe is one sequential read of a
+    memory-mapped file. Inserts go to in-memory per-cell buffers and
+    deletions to a tombstone set until the next save compacts them. Each
+    save writes a new generation of segment files and then switches
+    meta.json to it, so readers never see a half-written segment.
+    """
+
+    def __init__(self, dim: int, nlist: int = 1024, nprobe: int = 16):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        # Compacted, memory-mapped segment
+        self.vectors = np.zeros((0, dim), dtype=np.float16)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(nlist + 1, dtype=np.int64)
+        # Mutations since the last save
+        # Per cell, one (ids, float16 vectors) block per add() batch that reached it
+        self.pending_ids: List[List[np.ndarray]] = [[] for _ in range(nlist)]
+        self.pending_vectors: List[List[np.ndarray]] = [[] for _ in range(nlist)]
+        self.tombstones = set()
+        # Segment-wide mask of rows not tombstoned, rebuilt lazily after remove()
+        self._alive: Optional[np.ndarray] = None
+        self.generation = 0
+
+    def __len__(self) -> int:
+        pending = sum(len(block) for blocks in self.pending_ids for block in blocks)
+        return len(self.ids) + pending - len(self.tombstones)
+
+    def train(self, sample: np.ndarray, iterations: int = 20, seed: int = 0):
+        """Spherical k-means on a sample of the data"""
+        sample = np.asarray(sample, dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        nlist = min(self.nlist, len(sample))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)
+            empty = counts == 0
+            # Reseed empty cells from random points so no cell stays dead
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        self.centroids = centroids
+        if nlist != self.nlist:
+            self.nlist = nlist
+            self.offsets = np.zeros(nlist + 1, dtype=np.int64)
+            self.pending_ids = [[] for _ in range(nlist)]
+            self.pending_vectors = [[] for _ in range(nlist)]
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray, batch_size: int = 65536):
+        """Insert new vectors; to update an id, remove it first"""
+        if self.centroids is None:
+            raise ValueError("Index must be trained before adding vectors")
+        ids = np.asarray(ids, dtype=np.int64)
+        for start in range(0, len(ids), batch_size):
+            # Converted per batch, so a float16 memmap input is never copied whole
+            batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            batch_ids = ids[start:start + batch_size]
+            cells = np.argmax(batch @ self.centroids.T, axis=1)
+            order = np.argsort(cells, kind='stable')
+            bounds = np.flatnonzero(np.diff(cells[order])) + 1
+            for rows in np.split(order, bounds):
+                if len(rows):
+                    cell = cells[rows[0]]
+                    self.pending_ids[cell].append(batch_ids[rows])
+                    self.pending_vectors[cell].append(batch[rows].astype(np.float16))
+
+    def remove(self, ids):
+        ids = np.asarray(list(ids), dtype=np.int64)
+        # Tombstones only cover the compacted segment; pending inserts are dropped directly
+        self.tombstones.update(ids[np.isin(ids, self.ids)].tolist())
+        self._alive = None
+        for cell in range(self.nlist):
+            for block, (block_ids, block_vectors) in enumerate(zip(self.pending_ids[cell], self.pending_vectors[cell])):
+                keep = ~np.isin(block_ids, ids)
+                if not keep.all():
+                    self.pending_ids[cell][block] = block_ids[keep]
+                    self.pending_vectors[cell][block] = block_vectors[keep]
+
+    def _cell(self, cell: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.offsets[cell], self.offsets[cell + 1]
+        ids, vectors = self.ids[start:end], self.vectors[start:end]
+        if self.tombstones and len(ids):
+            if self._alive is None:
+                self._alive = ~np.isin(self.ids, np.fromiter(self.tombstones, dtype=np.int64))
+            alive = self._alive[start:end]
+            ids, vectors = ids[alive], vectors[alive]
+        if self.pending_ids[cell]:
+            ids = np.concatenate([ids] + self.pending_ids[cell])
+            vectors = np.concatenate([vectors] + self.pending_vectors[cell])
+        return ids, vectors
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, scores) of the k most similar vectors, best first"""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cells = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        candidate_ids, candidate_scores = [], []
+        for cell in cells:
+            ids, vectors = self._cell(cell)
+            if len(ids) == 0:
+                continue
+            candidate_ids.append(ids)
+            candidate_scores.append(vectors.astype(np.float32) @ query)
+        if not candidate_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores)
+        return ids[order], scores[order]
+
+    @staticmethod
+    def _segment_files(generation: int) -> Dict[str, str]:
+        # Generation 0 is the unsuffixed layout written before generations existed
+        suffix = f'.{generation}' if generation else ''
+        return {name: f'{name}{suffix}.{ext}' for name, ext in
+                (('ids', 'npy'), ('offsets', 'npy'), ('centroids', 'npy'), ('vectors', 'f16'))}
+
+    def save(self, directory: str):
+        """Compact pending inserts and tombstones into a fresh on-disk segment"""
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, 'meta.json')
+        previous = 0
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                previous = json.load(f).get('generation', 0)
+        generation = previous + 1
+        files = self._segment_files(generation)
+        all_ids, offsets = [], [0]
+        with open(os.path.join(directory, files['vectors']), 'wb') as f:
+            for cell in range(self.nlist):
+                ids, vectors = self._cell(cell)
+                f.write(np.ascontiguousarray(vectors, dtype=np.float16).tobytes())
+                all_ids.append(ids)
+                offsets.append(offsets[-1] + len(ids))
+            f.flush()
+            os.fsync(f.fileno())
+
+        arrays = {
+            'ids': np.concatenate(all_ids) if all_ids else np.zeros(0, dtype=np.int64),
+            'offsets': np.asarray(offsets, dtype=np.int64),
+            'centroids': self.centroids,
+        }
+        for name, array in arrays.items():
+            with open(os.path.join(directory, files[name]), 'wb') as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+        # The new files' directory entries must be durable before meta.json can point at them
+        _fsync_dir(directory)
+
+        # Switching meta.json is the commit point; the new generation's files are all on disk
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'dim': self.dim, 'nlist': self.nlist, 'nprobe': self.nprobe, 'generation': generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, meta_path)
+        _fsync_dir(directory)
+        # Open memmaps of the old generation stay valid after unlinking
+        for name in self._segment_files(previous).values():
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+
+        loaded = IVFIndex.load(directory)
+        self.__dict__.update(loaded.__dict__)
+
+    @classmethod
+    def load(cls, directory: str) -> 'IVFIndex':
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        index = cls(meta['dim'], meta['nlist'], meta['nprobe'])
+        index.generation = meta.get('generation', 0)
+        files = cls._segment_files(index.generation)
+        index.centroids = np.load(os.path.join(directory, files['centroids']))
+        index.ids = np.load(os.path.join(directory, files['ids']), mmap_mode='r')
+        index.offsets = np.load(os.path.join(directory, files['offsets']))
+        rows = int(index.offsets[-1])
+        if rows:
+            index.vectors = np.memmap(os.path.join(directory, files['vectors']), dtype=np.float16,
+                                      mode='r', shape=(rows, index.dim))
+        return index
+
+
+def build_from_store(store: EmbeddingStore, nlist: Optional[int] = None, sample_size: int = 100000) -> IVFIndex:
+    """Train and fill an index whose ids are embedding-store rows"""
+    matrix = store.matrix
+    if len(matrix) == 0:
+        # Nothing to train on: one empty cell, so search and save still work
+        index = IVFIndex(store.dim, nlist=1)
+        index.centroids = np.zeros((1, store.dim), dtype=np.float32)
+        return index
+    nlist = nlist or max(1, int(4 * np.sqrt(len(matrix))))
+    index = IVFIndex(store.dim, nlist=nlist)
+    rng = np.random.default_rng(0)
+    sample = matrix[np.sort(rng.choice(len(matrix), min(sample_size, len(matrix)), replace=False))]
+    index.train(np.asarray(sample, dtype=np.float32))
+    index.add(np.arange(len(matrix)), matrix)
+    return index
+
+
+def related_rows(store: EmbeddingStore, index: IVFIndex, item_id: str, k: int = 10) -> List[Tuple[int, float]]:
+    """Store rows most similar to an embedded item, excluding the item itself"""
+    row = store.row_of(item_id)
+    if row is None:
+        return []
+    ids, scores = index.search(store.matrix[row], k=k + 1)
+    return [(int(i), float(score)) for i, score in zip(ids, scores) if i != row][:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the related-article index from the embedding store')
+    parser.add_argument('--store', default='embeddings', help='Embedding store directory')
+    parser.add_argument('--index', default='ann_index', help='Index output directory')
+    parser.add_argument('--nlist', type=int, default=0, help='Number of cells, defaults to 4*sqrt(N)')
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    index = build_from_store(store, nlist=args.nlist or None)
+    index.save(args.index)
+    logger.info(f"Indexed {len(index)} vectors in {index.nlist} cells")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex
+
+
+def clustered_data(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors drawn around random topic centres, like article embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall/latency of IVFIndex against exact search')
+    parser.add_argument('--n', type=int, default=200000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    data = clustered_data(args.n, args.dim, clusters=max(10, args.n // 2000))
+    queries = data[np.random.default_rng(1).choice(args.n, args.queries, replace=False)]
+    exact_matrix = data.astype(np.float16)
+
+    start = time.perf_counter()
+    truth = []
+    for q in queries:
+        scores = exact_matrix.astype(np.float32) @ q
+        truth.append(set(np.argpartition(-scores, args.k - 1)[:args.k].tolist()))
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+    print(f"exact       : {exact_ms:8.2f} ms/query  recall@{args.k} 1.000")
+
+    index = IVFIndex(args.dim, nlist=int(4 * np.sqrt(args.n)))
+    start = time.perf_counter()
+    index.train(data[:min(args.n, 100000)])
+    index.add(np.arange(args.n), data)
+    directory = tempfile.mkdtemp()
+    index.save(directory)
+    print(f"build       : {time.perf_counter() - start:8.2f} s ({index.nlist} cells)")
+
+    for nprobe in (1, 4, 16, 64):
+        hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            ids, _ = index.search(q, k=args.k, nprobe=nprobe)
+            hits += len(expected.intersection(ids.tolist()))
+        ms = (time.perf_counter() - start) / args.queries * 1000
+        print(f"nprobe={nprobe:<4}: {ms:8.2f} ms/query  recall@{args.k} {hits / (args.k * args.queries):.3f}")
+
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import re
+import time
+import unicodedata
+
+import pandas as pd
+
+from bench_text_cleaner import synthetic_frame
+from normalizer import normalize_series
+
+
+def legacy_normalize(series: pd.Series) -> pd.Series:
+    """The pre-normalizer TextCleaner path: two re.sub per document, then a newline replace"""
+    def remove_special_chars(text):
+        if not isinstance(text, str):
+            return ""
+        text = re.sub(r'[^\s\w\.,!?\-áàảãạăắằẳẵặâấầẩẫậéèẻẽẹêếềểễệóòỏõọôốồổỗộơớờởỡợíìỉĩịúùủũụưứừửữựýỳỷỹỵđ]', ' ', text)
+        return re.sub(r'\s+', ' ', text).strip()
+    return series.apply(remove_special_chars).str.replace('\n', ' ')
+
+
+def timed(fn, series: pd.Series, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(series)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput of the text normalizer against the legacy path')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    series = synthetic_frame(args.rows)['text_content']
+    megabytes = series.str.len().sum() * 2 / 1e6
+
+    for label, fn in (('legacy', legacy_normalize), ('normalizer', normalize_series)):
+        elapsed, _ = timed(fn, series, args.repeat)
+        print(f"{label:<11}: {elapsed:6.3f}s  {args.rows / elapsed:10,.0f} docs/s  {megabytes / elapsed:7.1f} MB/s")
+
+    same = (legacy_normalize(series) == normalize_series(series)).all()
+    print(f"identical output on NFC input: {same}")
+
+    nfd = series.map(lambda text: unicodedata.normalize('NFD', text))
+    print(f"NFD input folds to NFC output: {(normalize_series(nfd) == normalize_series(series)).all()}, "
+          f"legacy: {(legacy_normalize(nfd) == legacy_normalize(series)).all()}")
+
+
+if __name__ == "__main__":
+    main()
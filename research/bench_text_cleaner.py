@@ -0,0 +1,57 @@
+import argparse
+import os
+import random
+import time
+
+import pandas as pd
+
+from text_cleaner import TextCleaner
+
+BOILERPLATE = [
+    "Đăng ký nhận bản tin để cập nhật tin tức mới nhất.",
+    "Bản quyền thuộc về tòa soạn, cấm sao chép dưới mọi hình thức.",
+    "Theo dõi chúng tôi trên mạng xã hội!",
+    "Xem thêm các bài viết liên quan bên dưới.",
+]
+WORDS = "thị trường công nghệ kinh tế chính phủ doanh nghiệp người dân dữ liệu xu hướng phát triển".split()
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Articles made of unique sentences plus a few boilerplate lines each"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(rows):
+        body = " ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + f" {rng.randint(0, 10**6)}."
+            for _ in range(rng.randint(5, 25))
+        )
+        texts.append(body + "\n" + " ".join(rng.sample(BOILERPLATE, 2)) + " ©®™ ★")
+    return pd.DataFrame({"text_content": texts})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial vs parallel TextCleaner')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    cleaner = TextCleaner(threshold=15)
+
+    start = time.perf_counter()
+    expected = cleaner.clean_dataframe(df)
+    serial = time.perf_counter() - start
+    print(f"serial      : {serial:7.2f}s")
+
+    workers = 1
+    while workers <= args.max_workers:
+        start = time.perf_counter()
+        result = cleaner.clean_dataframe_parallel(df, workers=workers)
+        elapsed = time.perf_counter() - start
+        identical = result.equals(expected)
+        print(f"workers={workers:<3}: {elapsed:7.2f}s  speedup {serial / elapsed:5.2f}x  identical={identical}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
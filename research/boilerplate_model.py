@@ -0,0 +1,174 @@
+import argparse
+import gzip
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import pandas as pd
+from nltk.tokenize import sent_tokenize
+
+from sketches import hash64
+from text_cleaner import TextCleaner
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class DomainStats:
+    """
+    Decayed document frequencies of sentence hashes for one site.
+
+    Decay is applied lazily: each entry remembers the document step it was
+    last updated at, so observing a document only touches its own sentences.
+    """
+
+    def __init__(self):
+        self.step = 0
+        self.doc_weight = 0.0
+        self.entries: Dict[int, Tuple[float, int]] = {}
+
+    def weight(self, key: int, decay: float) -> float:
+        entry = self.entries.get(key)
+        if entry is None:
+            return 0.0
+        value, step = entry
+        return value * decay ** (self.step - step)
+
+    def observe(self, keys, decay: float):
+        self.step += 1
+        self.doc_weight = self.doc_weight * decay + 1.0
+        for key in keys:
+            value, step = self.entries.get(key, (0.0, self.step))
+            self.entries[key] = (value * decay ** (self.step - step) + 1.0, self.step)
+
+    def prune(self, decay: float, keep: int):
+        """Drop the lightest entries once the table grows past keep"""
+        if len(self.entries) <= keep:
+            return
+        ranked = sorted(self.entries, key=lambda k: self.weight(k, decay), reverse=True)
+        self.entries = {k: self.entries[k] for k in ranked[:keep]}
+
+
+class BoilerplateModel:
+    def __init__(self, half_life: int = 500, threshold: float = 0.3, min_docs: int = 20,
+                 max_entries_per_domain: int = 50000):
+        """
+        Initialize a per-domain boilerplate model
+
+        Args:
+            half_life (int): Documents from the same domain after which an observation counts half
+            threshold (float): Share of a domain's recent documents a sentence must appear in to be boilerplate
+            min_docs (int): Decayed documents a domain needs before anything is removed from it
+            max_entries_per_domain (int): Sentence hashes kept per domain
+        """
+        self.half_life = half_life
+        self.decay = 0.5 ** (1.0 / half_life)
+        self.threshold = threshold
+        self.min_docs = min_docs
+        self.max_entries_per_domain = max_entries_per_domain
+        self.domains: Dict[str, DomainStats] = {}
+
+    @staticmethod
+    def domain_of(url: str) -> str:
+        host = urlparse(url).hostname or ''
+        return host[4:] if host.startswith('www.') else host
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        """Same normalisation and splitting as TextCleaner.clean_dataframe"""
+        return [s for s in sent_tokenize(TextCleaner.remove_special_chars(text)) if s]
+
+    def is_boilerplate(self, stats: DomainStats, key: int) -> bool:
+        if stats.doc_weight < self.min_docs:
+            return False
+        return stats.weight(key, self.decay) >= self.threshold * stats.doc_weight
+
+    def clean(self, url: Optional[str], text: str, update: bool = True) -> str:
+        """
+        Remove the domain's boilerplate sentences from one article
+
+        Runs in time linear in the article length. With update=True the
+        article is also added to the domain statistics. Articles without a
+        usable url are only normalised, so they never pool into one domain.
+        """
+        domain = self.domain_of(url) if isinstance(url, str) else ''
+        if not domain:
+            return ' '.join(self.split_sentences(text))
+        stats = self.domains.get(domain)
+        if stats is None:
+            stats = self.domains[domain] = DomainStats()
+
+        sentences = self.split_sentences(text)
+        keys = [hash64(s) for s in sentences]
+        if update:
+            stats.observe(set(keys), self.decay)
+            # Amortised: pruning sorts the table, so only do it once it is well over budget
+            if len(stats.entries) > self.max_entries_per_domain * 2:
+                stats.prune(self.decay, self.max_entries_per_domain)
+
+        return ' '.join(s for s, key in zip(sentences, keys) if not self.is_boilerplate(stats, key))
+
+    def save(self, path: str):
+        data = {
+            'half_life': self.half_life,
+            'threshold': self.threshold,
+            'min_docs': self.min_docs,
+            'max_entries_per_domain': self.max_entries_per_domain,
+            'domains': {
+                domain: {
+                    'step': stats.step,
+                    'doc_weight': stats.doc_weight,
+                    'entries': [[key, value, step] for key, (value, step) in stats.entries.items()],
+                }
+                for domain, stats in self.domains.items()
+            },
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'BoilerplateModel':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        model = cls(data['half_life'], data['threshold'], data['min_docs'], data['max_entries_per_domain'])
+        for domain, raw in data['domains'].items():
+            stats = DomainStats()
+            stats.step = raw['step']
+            stats.doc_weight = raw['doc_weight']
+            stats.entries = {key: (value, step) for key, value, step in raw['entries']}
+            model.domains[domain] = stats
+        return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clean articles with a per-domain boilerplate model')
+    parser.add_argument('--input', default='link_spider_results.csv', help='Input CSV with url and text_content')
+    parser.add_argument('--output', default='cleaned_link_spider_results.csv', help='Output CSV file')
+    parser.add_argument('--model', default='boilerplate_model.json.gz', help='Model file, created if missing')
+    parser.add_argument('--chunksize', type=int, default=10000)
+    args = parser.parse_args()
+
+    try:
+        model = BoilerplateModel.load(args.model)
+        logger.info(f"Loaded boilerplate model for {len(model.domains)} domains")
+    except FileNotFoundError:
+        model = BoilerplateModel()
+
+    # Articles are processed in crawl order, exactly as they would be at ingest time
+    for i, chunk in enumerate(pd.read_csv(args.input, chunksize=args.chunksize)):
+        chunk['text_content'] = [
+            model.clean(url, text if isinstance(text, str) else '')
+            for url, text in zip(chunk['url'], chunk['text_content'])
+        ]
+        chunk.to_csv(args.output, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+    model.save(args.model)
+    logger.info(f"Saved boilerplate model to {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+def content_hash(text: str) -> str:
+    """Key embeddings by content so re-crawled or re-cleaned duplicates are free"""
+    normalized = ' '.join(text.split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Append-only float16 matrix on disk with a content-hash and id index.
+
+    vectors.f16 holds raw rows; index.jsonl holds one line per row
+    ({"row", "hash"}) or per id alias ({"id", "hash"}). Rows are written
+    before their index line, so a crash can only leave unindexed trailing
+    rows, which are ignored and overwritten on the next append, or a torn
+    last index line, which is cut off on open.
+    """
+
+    def __init__(self, directory: str, dim: int = 384):
+        self.directory = directory
+        self.dim = dim
+        self.vectors_path = os.path.join(directory, 'vectors.f16')
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self.row_by_hash: Dict[str, int] = {}
+        self.hash_by_id: Dict[str, str] = {}
+        self._matrix: Optional[np.memmap] = None
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        valid_bytes = 0
+        with open(self.index_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line) if line.strip() else None
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+                if entry is None:
+                    continue
+                if 'row' in entry:
+                    self.row_by_hash[entry['hash']] = entry['row']
+                else:
+                    self.hash_by_id[entry['id']] = entry['hash']
+        if valid_bytes < os.path.getsize(self.index_path):
+            logger.warning(f"Dropping a torn trailing line from {self.index_path}")
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+    def _append_index(self, lines: List[str]):
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __len__(self) -> int:
+        return len(self.row_by_hash)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Read-only memory-mapped view of every indexed row"""
+        rows = len(self)
+        if rows == 0:
+            return np.zeros((0, self.dim), dtype=np.float16)
+        if self._matrix is None or self._matrix.shape[0] != rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float16, mode='r', shape=(rows, self.dim))
+        return self._matrix
+
+    def has(self, digest: str) -> bool:
+        return digest in self.row_by_hash
+
+    def row_of(self, item_id: str) -> Optional[int]:
+        digest = self.hash_by_id.get(item_id)
+        return self.row_by_hash.get(digest) if digest is not None else None
+
+    def get(self, item_id: str) -> Optional[np.ndarray]:
+        row = self.row_of(item_id)
+        return None if row is None else np.asarray(self.matrix[row], dtype=np.float32)
+
+    def append(self, hashes: Sequence[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float16)
+        if vectors.shape != (len(hashes), self.dim):
+            raise ValueError(f"Expected vectors of shape ({len(hashes)}, {self.dim}), got {vectors.shape}")
+        # Row numbers come from len(self), which counts distinct hashes
+        if len(set(hashes)) != len(hashes) or any(digest in self.row_by_hash for digest in hashes):
+            raise ValueError("Hashes must be distinct and not already stored")
+        start = len(self)
+        with open(self.vectors_path, 'ab') as f:
+            # Discard rows left behind by an interrupted append
+            f.truncate(start * self.dim * 2)
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._append_index([json.dumps({'row': start + offset, 'hash': digest}) + '\n'
+                            for offset, digest in enumerate(hashes)])
+        for offset, digest in enumerate(hashes):
+            self.row_by_hash[digest] = start + offset
+
+    def alias(self, pairs: Iterable[Tuple[str, str]]):
+        """Point item ids at content hashes"""
+        lines = []
+        for item_id, digest in pairs:
+            if self.hash_by_id.get(item_id) != digest:
+                self.hash_by_id[item_id] = digest
+                lines.append(json.dumps({'id': item_id, 'hash': digest}) + '\n')
+        if lines:
+            self._append_index(lines)
+
+
+class EmbeddingService:
+    def __init__(self, store: EmbeddingStore, model_name: str = DEFAULT_MODEL,
+                 batch_size: int = 64, device: str = 'cpu', model=None):
+        self.store = store
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self._model = model
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def embed(self, items: Iterable[Tuple[str, str]]) -> int:
+        """
+        Make sure every (id, text) pair has an embedding
+
+        Texts whose content hash is already stored are never re-encoded. The
+        rest are deduplicated, sorted by length and encoded in batches so each
+        batch pads to similar lengths.
+
+        Returns:
+            int: Number of texts actually encoded
+        """
+        pending: Dict[str, str] = {}
+        aliases = []
+        for item_id, text in items:
+            text = text if isinstance(text, str) else ''
+            digest = content_hash(text)
+            aliases.append((item_id, digest))
+            if not self.store.has(digest) and digest not in pending:
+                pending[digest] = text
+
+        ordered = sorted(pending.items(), key=lambda kv: len(kv[1]))
+        for start in range(0, len(ordered), self.batch_size):
+            batch = ordered[start:start + self.batch_size]
+            vectors = self.model.encode(
+                [text for _, text in batch],
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+            self.store.append([digest for digest, _ in batch], vectors)
+
+        self.store.alias(aliases)
+        return len(ordered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Embed cleaned articles into the on-disk embedding store')
+    parser.add_argument('--input', default='cleaned_link_spider_results.csv', help='CSV with url and text_content')
+    parser.add_argument('--store', default='embeddings', help='Embedding store directory')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--chunksize', type=int, default=10000)
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    service = EmbeddingService(store, batch_size=args.batch_size)
+    encoded = 0
+    skipped = 0
+    for chunk in pd.read_csv(args.input, chunksize=args.chunksize, dtype={'url': str}):
+        missing = chunk['url'].isna() | (chunk['url'].str.strip() == '')
+        skipped += int(missing.sum())
+        chunk = chunk[~missing]
+        encoded += service.embed(zip(chunk['url'].str.strip(), chunk['text_content']))
+    if skipped:
+        logger.warning(f"Skipped {skipped} rows without a url")
+    logger.info(f"Encoded {encoded} new texts, store holds {len(store)} vectors")
+
+
+if __name__ == "__main__":
+    main()
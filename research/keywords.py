@@ -0,0 +1,140 @@
+import argparse
+import json
+import logging
+import os
+from collections import Counter
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sketches import hash64
+from trend_engine import extract_terms
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def article_terms(text: str) -> List[str]:
+    """Words and bigrams only; entities duplicate them and would double-count"""
+    return [t[2:] for t in extract_terms(text if isinstance(text, str) else '') if t[0] in 'wb']
+
+
+class KeywordExtractor:
+    """
+    TF-IDF keywords with persistent document frequencies.
+
+    Terms are hashed into a fixed number of buckets, so the document
+    frequency table is one uint32 array whatever the vocabulary size, and
+    updating it for a new article only touches that article's terms.
+    """
+
+    def __init__(self, n_features: int = 1 << 20):
+        self.n_features = n_features
+        self.df = np.zeros(n_features, dtype=np.uint32)
+        self.n_docs = 0
+
+    def _index(self, terms: Sequence[str]) -> np.ndarray:
+        return np.fromiter((hash64(t) % self.n_features for t in terms), dtype=np.int64, count=len(terms))
+
+    def _idf(self, indexes: np.ndarray) -> np.ndarray:
+        return np.log((1.0 + self.n_docs) / (1.0 + self.df[indexes])) + 1.0
+
+    def update(self, text: str):
+        indexes = np.unique(self._index(article_terms(text)))
+        self.df[indexes] += 1
+        self.n_docs += 1
+
+    def keywords(self, text: str, k: int = 10, update: bool = True) -> List[Tuple[str, float]]:
+        """Top-k keywords of one article, optionally counting it towards DF first"""
+        counts = Counter(article_terms(text))
+        if update:
+            indexes = self._index(list(counts))
+            self.df[indexes] += 1
+            self.n_docs += 1
+        if not counts:
+            return []
+        terms = list(counts)
+        tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(terms)))
+        scores = tf * self._idf(self._index(terms))
+        top = np.argsort(-scores)[:k]
+        return [(terms[i], round(float(scores[i]), 4)) for i in top]
+
+    def _batch_pairs(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[List[str]]]:
+        """Unique (doc, feature) pairs of a batch with their term counts"""
+        docs_terms = [article_terms(text) for text in texts]
+        lengths = np.fromiter((len(t) for t in docs_terms), dtype=np.int64, count=len(docs_terms))
+        flat = [term for terms in docs_terms for term in terms]
+        doc_ids = np.repeat(np.arange(len(docs_terms), dtype=np.int64), lengths)
+        keys = doc_ids * self.n_features + self._index(flat)
+        unique_keys, first, tf = np.unique(keys, return_index=True, return_counts=True)
+        return unique_keys // self.n_features, unique_keys % self.n_features, tf, [flat[i] for i in first]
+
+    def update_batch(self, texts: Sequence[str]):
+        _, features, _, _ = self._batch_pairs(texts)
+        self.df += np.bincount(features, minlength=self.n_features).astype(np.uint32)
+        self.n_docs += len(texts)
+
+    def keywords_batch(self, texts: Sequence[str], k: int = 10) -> List[List[Tuple[str, float]]]:
+        """Vectorised top-k for a batch against the current DF (no DF update)"""
+        docs, features, tf, names = self._batch_pairs(texts)
+        scores = (1.0 + np.log(tf)) * self._idf(features)
+        # Sort by doc, then by descending score, and keep the first k of each doc
+        order = np.lexsort((-scores, docs))
+        docs, scores = docs[order], scores[order]
+        starts = np.searchsorted(docs, np.arange(len(texts)))
+        rank = np.arange(len(docs)) - starts[docs]
+        result: List[List[Tuple[str, float]]] = [[] for _ in texts]
+        for position in np.nonzero(rank < k)[0]:
+            result[docs[position]].append((names[order[position]], round(float(scores[position]), 4)))
+        return result
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'df.npy'), self.df)
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'n_features': self.n_features, 'n_docs': self.n_docs}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> 'KeywordExtractor':
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        extractor = cls(meta['n_features'])
+        extractor.df = np.load(os.path.join(directory, 'df.npy'))
+        extractor.n_docs = meta['n_docs']
+        return extractor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill document frequencies and per-article keywords')
+    parser.add_argument('--input', default='cleaned_link_spider_results.csv', help='CSV with url and text_content')
+    parser.add_argument('--output', default='article_keywords.csv', help='Output CSV of url, keywords')
+    parser.add_argument('--state', default='keyword_df', help='Directory the DF table is written to, replacing any existing one')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--chunksize', type=int, default=5000)
+    args = parser.parse_args()
+
+    # The backfill recounts the whole input, so an existing table is replaced rather
+    # than added to; loading it would count every article twice on a re-run
+    extractor = KeywordExtractor()
+
+    # Two passes so every article is scored against the DF of the whole backfill
+    for chunk in pd.read_csv(args.input, chunksize=args.chunksize, usecols=['text_content']):
+        extractor.update_batch(chunk['text_content'].tolist())
+    extractor.save(args.state)
+    logger.info(f"Document frequencies cover {extractor.n_docs} articles")
+
+    for i, chunk in enumerate(pd.read_csv(args.input, chunksize=args.chunksize, usecols=['url', 'text_content'])):
+        keywords = extractor.keywords_batch(chunk['text_content'].tolist(), k=args.top_k)
+        out = pd.DataFrame({
+            'url': chunk['url'],
+            'keywords': ['; '.join(term for term, _ in kws) for kws in keywords],
+        })
+        out.to_csv(args.output, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import re
+import unicodedata
+from typing import Iterable, List
+
+import pandas as pd
+
+# Invisible characters that would otherwise split a word in two
+_INVISIBLE = '\u200b\u200c\u200d\u2060\ufeff\u00ad'
+_DELETE_TABLE = str.maketrans('', '', _INVISIBLE)
+
+# \w already covers every precomposed Vietnamese letter (upper and lower case),
+# so after NFC the old explicit diacritic class is redundant. Only real junk is
+# matched here; whitespace is collapsed by str.split, which is far cheaper than
+# a regex substitution per space.
+_JUNK_RE = re.compile(r'[^\w\s.,!?\-]+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    NFC-fold, drop invisible characters and collapse junk/whitespace runs
+
+    Args:
+        text (str): Input text
+
+    Returns:
+        str: Normalized text, "" for non-string input
+    """
+    if not isinstance(text, str):
+        return ""
+    if not text.isascii():
+        text = unicodedata.normalize('NFC', text)
+        # translate() walks every character, so only pay for it when needed
+        if any(ch in text for ch in _INVISIBLE):
+            text = text.translate(_DELETE_TABLE)
+    return ' '.join(_JUNK_RE.sub(' ', text).split())
+
+
+def normalize_many(texts: Iterable) -> List[str]:
+    return [normalize_text(text) for text in texts]
+
+
+def normalize_series(series: pd.Series) -> pd.Series:
+    """One pass over a text column, keeping its index"""
+    return pd.Series(normalize_many(series.tolist()), index=series.index, name=series.name, dtype=object)
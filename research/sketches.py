@@ -0,0 +1,85 @@
+import hashlib
+from typing import Iterable
+
+import numpy as np
+
+
+def hash64(text: str) -> int:
+    """Stable 64-bit hash of a string (unlike hash(), identical across processes and runs)"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class CountMinSketch:
+    """
+    Count-min sketch over 64-bit keys.
+
+    Memory is fixed at depth * width counters. Estimates never undercount;
+    they overcount by at most 2N/width with probability 1 - (1/2)^depth.
+    """
+
+    def __init__(self, width: int = 1 << 22, depth: int = 4, dtype=np.uint32):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=dtype)
+        self._rows = np.arange(depth, dtype=np.uint64)
+
+    def _indexes(self, keys: np.ndarray) -> np.ndarray:
+        # Double hashing: index_i = h1 + i * h2, derived from the two 32-bit halves
+        keys = keys.astype(np.uint64, copy=False)
+        h1 = keys & np.uint64(0xFFFFFFFF)
+        h2 = (keys >> np.uint64(32)) | np.uint64(1)
+        return ((h1[None, :] + self._rows[:, None] * h2[None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def add_many(self, keys: Iterable[int], counts=None):
+        keys = np.fromiter(keys, dtype=np.uint64) if not isinstance(keys, np.ndarray) else keys
+        if keys.size == 0:
+            return
+        counts = np.ones(keys.size, dtype=self.table.dtype) if counts is None else np.asarray(counts, dtype=self.table.dtype)
+        indexes = self._indexes(keys)
+        for row in range(self.depth):
+            np.add.at(self.table[row], indexes[row], counts)
+
+    def add(self, key: int, count: int = 1):
+        self.add_many(np.array([key], dtype=np.uint64), [count])
+
+    def estimate_many(self, keys: Iterable[int]) -> np.ndarray:
+        keys = np.fromiter(keys, dtype=np.uint64) if not isinstance(keys, np.ndarray) else keys
+        if keys.size == 0:
+            return np.zeros(0, dtype=self.table.dtype)
+        indexes = self._indexes(keys)
+        return self.table[np.arange(self.depth)[:, None], indexes].min(axis=0)
+
+    def estimate(self, key: int) -> int:
+        return int(self.estimate_many(np.array([key], dtype=np.uint64))[0])
+
+    def merge(self, other: 'CountMinSketch'):
+        if other.table.shape != self.table.shape:
+            raise ValueError("Cannot merge sketches of different dimensions")
+        self.table += other.table
+
+
+class HeavyHitters:
+    """
+    Misra-Gries style top-k counter with bounded memory.
+
+    Keeps at most 2 * capacity keys; when full it is pruned back to the
+    capacity heaviest, so any key with more than N / capacity occurrences
+    is guaranteed to survive.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, key, count: int = 1):
+        self.counts[key] = self.counts.get(key, 0) + count
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)
+        floor = ranked[self.capacity][1]
+        self.counts = {k: c - floor for k, c in ranked[:self.capacity] if c > floor}
+
+    def keys(self):
+        return self.counts.keys()
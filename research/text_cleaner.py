@@ -1,11 +1,15 @@
-
-import re
+import os
+import argparse
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from nltk.tokenize import sent_tokenize
 from collections import Counter
 import logging
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Tuple, FrozenSet
 import nltk
+from sketches import CountMinSketch, hash64
+from normalizer import normalize_series, normalize_text
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +18,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Read every column as text so chunks parse the same way as a whole-file read;
+# only empty cells are missing, words like "NA" or "null" stay as they are
+CSV_READ_OPTIONS = {'dtype': str, 'keep_default_na': False, 'na_values': ['']}
+
 class TextCleaner:
     def __init__(self, threshold: int = 15):
         """
@@ -39,18 +47,153 @@ class TextCleaner:
         """
         Remove special characters and normalize whitespace
         
+        Text is NFC-normalized first so composed and decomposed Vietnamese
+        diacritics produce the same sentences.
+        
         Args:
             text (str): Input text
             
         Returns:
             str: Cleaned text
         """
-        if not isinstance(text, str):
-            return ""
-            
-        # Keep Vietnamese characters and basic punctuation
-        text = re.sub(r'[^\s\w\.,!?\-áàảãạăắằẳẵặâấầẩẫậéèẻẽẹêếềểễệóòỏõọôốồổỗộơớờởỡợíìỉĩịúùủũụưứừửữựýỳỷỹỵđ]', ' ', text)
-        return re.sub(r'\s+', ' ', text).strip()
+        return normalize_text(text)
+
+    def normalize_column(self, series: pd.Series) -> pd.Series:
+        """Apply the per-document cleaning used before sentence splitting"""
+        return normalize_series(series)
+
+    def count_sentences_streaming(self, input_file: str, text_column: str = 'text_content',
+                                  chunksize: int = 10000,
+                                  sketch: CountMinSketch = None) -> Union[Counter, CountMinSketch]:
+        """
+        First pass of streaming cleaning: count sentence hashes chunk by chunk
+
+        Args:
+            input_file (str): CSV file to read
+            text_column (str): Name of the column containing text to clean
+            chunksize (int): Rows per chunk
+            sketch (CountMinSketch): Count into this sketch for bounded memory,
+                otherwise an exact Counter of 64-bit hashes is used
+
+        Returns:
+            Union[Counter, CountMinSketch]: Sentence hash counts
+        """
+        counts = sketch if sketch is not None else Counter()
+        for chunk in pd.read_csv(input_file, chunksize=chunksize, usecols=[text_column], **CSV_READ_OPTIONS):
+            text = self.normalize_column(chunk[text_column])
+            hashes = [hash64(s) for sentences in text.apply(sent_tokenize) for s in sentences if s]
+            if isinstance(counts, CountMinSketch):
+                counts.add_many(hashes)
+            else:
+                counts.update(hashes)
+        return counts
+
+    def filter_chunk(self, chunk: pd.DataFrame, counts: Union[Counter, CountMinSketch],
+                     text_column: str = 'text_content') -> pd.DataFrame:
+        """Second pass of streaming cleaning: drop repetitive sentences from one chunk"""
+        chunk = chunk.copy()
+        text = self.normalize_column(chunk[text_column])
+        sentences = text.apply(sent_tokenize)
+
+        if isinstance(counts, CountMinSketch):
+            flat = [hash64(s) for doc in sentences for s in doc]
+            estimates = iter(counts.estimate_many(flat).tolist())
+            chunk[text_column] = [
+                ' '.join(s for s in doc if next(estimates) < self.threshold) for doc in sentences
+            ]
+        else:
+            chunk[text_column] = [
+                ' '.join(s for s in doc if counts[hash64(s)] < self.threshold) for doc in sentences
+            ]
+        return chunk
+
+    def clean_csv_streaming(self, input_file: str, output_file: str,
+                            text_column: str = 'text_content',
+                            chunksize: int = 10000,
+                            sketch: CountMinSketch = None) -> int:
+        """
+        Clean a CSV that does not fit in memory, in two passes over the file
+
+        Produces the same output as clean_dataframe when no sketch is given.
+        With a sketch, counts may be overestimated so a few extra sentences
+        near the threshold can be dropped.
+
+        Args:
+            input_file (str): CSV file to read
+            output_file (str): CSV file to write
+            text_column (str): Name of the column containing text to clean
+            chunksize (int): Rows per chunk
+            sketch (CountMinSketch): Optional sketch for bounded-memory counting
+
+        Returns:
+            int: Number of rows written
+        """
+        try:
+            logger.info(f"Counting sentences in {input_file}")
+            counts = self.count_sentences_streaming(input_file, text_column, chunksize, sketch)
+
+            logger.info(f"Filtering sentences into {output_file}")
+            rows = 0
+            for i, chunk in enumerate(pd.read_csv(input_file, chunksize=chunksize, **CSV_READ_OPTIONS)):
+                cleaned = self.filter_chunk(chunk, counts, text_column)
+                cleaned.to_csv(output_file, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+                rows += len(cleaned)
+
+            logger.info(f"Streaming text cleaning completed, {rows} rows written")
+            return rows
+
+        except Exception as e:
+            logger.error(f"Error during streaming text cleaning: {str(e)}")
+            raise
+
+    def clean_dataframe_parallel(self, df: pd.DataFrame, text_column: str = 'text_content',
+                                 workers: int = None, shards: int = None) -> pd.DataFrame:
+        """
+        Clean text data in a DataFrame using a process pool
+
+        The frame is split into shards. Workers tokenize their shard and return
+        sentence-hash counts, which are merged to find repetitive sentences;
+        the filtering phase then runs on the same pool. Output is identical to
+        clean_dataframe barring a 64-bit hash collision.
+
+        Args:
+            df (pd.DataFrame): Input DataFrame
+            text_column (str): Name of the column containing text to clean
+            workers (int): Number of worker processes, defaults to the CPU count
+            shards (int): Number of shards, defaults to four per worker
+
+        Returns:
+            pd.DataFrame: Cleaned DataFrame
+        """
+        try:
+            workers = workers or os.cpu_count() or 1
+            shards = max(1, min(shards or workers * 4, len(df)))
+            logger.info(f"Starting parallel text cleaning with {workers} workers and {shards} shards")
+
+            texts = df[text_column]
+            bounds = [len(df) * i // shards for i in range(shards + 1)]
+            shard_texts = [texts.iloc[bounds[i]:bounds[i + 1]] for i in range(shards)]
+
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                tokenized = list(pool.map(_tokenize_shard, shard_texts))
+
+                sentence_counts = Counter()
+                for _, counts in tokenized:
+                    sentence_counts.update(counts)
+                repetitive = frozenset(h for h, count in sentence_counts.items() if count >= self.threshold)
+
+                filtered = pool.map(_filter_shard, [(sentences, repetitive) for sentences, _ in tokenized])
+                cleaned_texts = list(chain.from_iterable(filtered))
+
+            df_cleaned = df.copy()
+            df_cleaned[text_column] = cleaned_texts
+
+            logger.info("Parallel text cleaning completed successfully")
+            return df_cleaned
+
+        except Exception as e:
+            logger.error(f"Error during parallel text cleaning: {str(e)}")
+            raise
 
     def clean_dataframe(self, df: pd.DataFrame, text_column: str = 'text_content') -> pd.DataFrame:
         """
@@ -70,8 +213,7 @@ class TextCleaner:
             df_cleaned = df.copy()
             
             # Basic text cleaning
-            df_cleaned[text_column] = df_cleaned[text_column].apply(self.remove_special_chars)
-            df_cleaned[text_column] = df_cleaned[text_column].str.replace('\n', ' ')
+            df_cleaned[text_column] = self.normalize_column(df_cleaned[text_column])
             
             # Tokenize sentences
             df_cleaned['sentences'] = df_cleaned[text_column].apply(sent_tokenize)
@@ -98,21 +240,53 @@ class TextCleaner:
             logger.error(f"Error during text cleaning: {str(e)}")
             raise
 
+def _tokenize_shard(texts: pd.Series) -> Tuple[List[List[str]], Counter]:
+    """Process pool worker: normalize and split one shard, count its sentence hashes"""
+    normalized = normalize_series(texts)
+    sentences = normalized.apply(sent_tokenize).tolist()
+    counts = Counter(hash64(s) for doc in sentences for s in doc if s)
+    return sentences, counts
+
+
+def _filter_shard(args: Tuple[List[List[str]], FrozenSet[int]]) -> List[str]:
+    """Process pool worker: drop repetitive sentences from one tokenized shard"""
+    sentences, repetitive = args
+    return [' '.join(s for s in doc if hash64(s) not in repetitive) for doc in sentences]
+
+
 def main():
     """Main function to demonstrate usage"""
+    parser = argparse.ArgumentParser(description='Remove repetitive sentences from crawled text')
+    parser.add_argument('--input', default='link_spider_results.csv', help='Input CSV file')
+    parser.add_argument('--output', default='cleaned_link_spider_results.csv', help='Output CSV file')
+    parser.add_argument('--threshold', type=int, default=15, help='Occurrences that make a sentence repetitive')
+    parser.add_argument('--streaming', action='store_true', help='Process the file in chunks (two passes)')
+    parser.add_argument('--chunksize', type=int, default=10000, help='Rows per chunk in streaming mode')
+    parser.add_argument('--sketch-width', type=int, default=0,
+                        help='Count with a count-min sketch of this width instead of exact hashes')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Clean in memory with this many worker processes')
+    args = parser.parse_args()
+
     try:
-        # Example usage
-        input_file = "link_spider_results.csv"
-        output_file = "cleaned_link_spider_results.csv"
-        
-        logger.info(f"Reading input file: {input_file}")
-        df = pd.read_csv(input_file)
-        
-        cleaner = TextCleaner(threshold=15)
-        df_cleaned = cleaner.clean_dataframe(df)
-        
-        logger.info(f"Saving cleaned data to: {output_file}")
-        df_cleaned.to_csv(output_file, index=False)
+        input_file = args.input
+        output_file = args.output
+        cleaner = TextCleaner(threshold=args.threshold)
+
+        if args.streaming:
+            sketch = CountMinSketch(width=args.sketch_width) if args.sketch_width else None
+            cleaner.clean_csv_streaming(input_file, output_file, chunksize=args.chunksize, sketch=sketch)
+        else:
+            logger.info(f"Reading input file: {input_file}")
+            df = pd.read_csv(input_file, **CSV_READ_OPTIONS)
+
+            if args.workers:
+                df_cleaned = cleaner.clean_dataframe_parallel(df, workers=args.workers)
+            else:
+                df_cleaned = cleaner.clean_dataframe(df)
+
+            logger.info(f"Saving cleaned data to: {output_file}")
+            df_cleaned.to_csv(output_file, index=False)
         
         logger.info("Process completed successfully")
         
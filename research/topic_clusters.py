@@ -0,0 +1,284 @@
+import argparse
+import csv
+import logging
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class OnlineClusterer:
+    """
+    Streaming topic clustering of unit-length embeddings.
+
+    Each cluster is summarised by a running mean direction, a decayed weight,
+    a mean cosine distance of its members (spread) and a small reservoir of
+    member vectors. Assigning an article is one matrix-vector product over at
+    most max_clusters centroids, independent of corpus size. Every
+    maintenance_every assignments, near-duplicate clusters are merged,
+    spread-out ones are split with 2-means on their reservoir, and clusters
+    whose weight has decayed away are dropped. Ids absorbed by a merge are
+    recorded in merged_into so earlier assignments can be followed with
+    resolve().
+    """
+
+    def __init__(self, dim: int, max_clusters: int = 1000, assign_threshold: float = 0.55,
+                 merge_threshold: float = 0.85, split_spread: float = 0.5, min_split_weight: float = 50.0,
+                 min_weight: float = 0.5, half_life: int = 50000, reservoir_size: int = 32,
+                 maintenance_every: int = 1000, seed: int = 0):
+        self.dim = dim
+        self.max_clusters = max_clusters
+        self.assign_threshold = assign_threshold
+        self.merge_threshold = merge_threshold
+        self.split_spread = split_spread
+        self.min_split_weight = min_split_weight
+        self.min_weight = min_weight
+        self.decay = 0.5 ** (1.0 / half_life)
+        self.reservoir_size = reservoir_size
+        self.maintenance_every = maintenance_every
+        self.rng = np.random.default_rng(seed)
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.spreads = np.zeros(0, dtype=np.float64)
+        self.seen = np.zeros(0, dtype=np.int64)
+        self.reservoirs = np.zeros((0, reservoir_size, dim), dtype=np.float16)
+        self.next_id = 0
+        self.steps = 0
+        self.merged_into: Dict[int, int] = {}
+        # First store row not yet assigned, maintained by the caller and saved with the state
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _new_cluster(self, vector: np.ndarray, weight: float = 1.0) -> int:
+        cluster_id = self.next_id
+        self.next_id += 1
+        reservoir = np.zeros((1, self.reservoir_size, self.dim), dtype=np.float16)
+        reservoir[0, 0] = vector
+        self.ids = np.append(self.ids, cluster_id)
+        self.centroids = np.vstack([self.centroids, vector[None, :]])
+        self.weights = np.append(self.weights, weight)
+        self.spreads = np.append(self.spreads, 0.0)
+        self.seen = np.append(self.seen, 1)
+        self.reservoirs = np.concatenate([self.reservoirs, reservoir])
+        return cluster_id
+
+    def _keep(self, mask: np.ndarray):
+        self.ids = self.ids[mask]
+        self.centroids = self.centroids[mask]
+        self.weights = self.weights[mask]
+        self.spreads = self.spreads[mask]
+        self.seen = self.seen[mask]
+        self.reservoirs = self.reservoirs[mask]
+
+    def assign(self, vector: np.ndarray) -> int:
+        """Assign one embedding to a topic, returns the topic id"""
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        self.steps += 1
+        # Ages every topic by one step; bounded by max_clusters, not by the corpus
+        self.weights *= self.decay
+
+        if len(self.ids):
+            sims = self.centroids @ vector
+            best = int(np.argmax(sims))
+            similarity = float(sims[best])
+        else:
+            best, similarity = -1, -1.0
+
+        if best >= 0 and (similarity >= self.assign_threshold or len(self.ids) >= self.max_clusters):
+            weight = self.weights[best] + 1.0
+            rate = 1.0 / weight
+            centroid = (1 - rate) * self.centroids[best] + rate * vector
+            self.centroids[best] = centroid / max(float(np.linalg.norm(centroid)), 1e-12)
+            self.spreads[best] += rate * ((1.0 - similarity) - self.spreads[best])
+            self.weights[best] = weight
+            # Reservoir sampling keeps a uniform sample of members for splits
+            self.seen[best] += 1
+            slot = self.seen[best] - 1 if self.seen[best] <= self.reservoir_size else self.rng.integers(0, self.seen[best])
+            if slot < self.reservoir_size:
+                self.reservoirs[best, slot] = vector
+            cluster_id = int(self.ids[best])
+        else:
+            cluster_id = self._new_cluster(vector)
+
+        if self.steps % self.maintenance_every == 0:
+            self.maintain()
+        return cluster_id
+
+    def maintain(self):
+        self._drop_faded()
+        self._merge()
+        self._split()
+
+    def resolve(self, topic_id: int) -> int:
+        """The live topic a possibly merged-away id now belongs to"""
+        while topic_id in self.merged_into:
+            topic_id = self.merged_into[topic_id]
+        return topic_id
+
+    def _drop_faded(self):
+        self._keep(self.weights >= self.min_weight)
+
+    def _merge(self):
+        if len(self.ids) < 2:
+            return
+        sims = self.centroids @ self.centroids.T
+        np.fill_diagonal(sims, -1.0)
+        absorbed = np.zeros(len(self.ids), dtype=bool)
+        # Heaviest clusters absorb their near-duplicates so topic ids stay stable
+        for i in np.argsort(-self.weights):
+            if absorbed[i]:
+                continue
+            for j in np.nonzero((sims[i] >= self.merge_threshold) & ~absorbed)[0]:
+                if j == i:
+                    continue
+                total = self.weights[i] + self.weights[j]
+                centroid = (self.weights[i] * self.centroids[i] + self.weights[j] * self.centroids[j]) / total
+                self.centroids[i] = centroid / max(float(np.linalg.norm(centroid)), 1e-12)
+                self.spreads[i] = (self.weights[i] * self.spreads[i] + self.weights[j] * self.spreads[j]) / total
+                self.weights[i] = total
+                self.seen[i] += self.seen[j]
+                absorbed[j] = True
+                self.merged_into[int(self.ids[j])] = int(self.ids[i])
+                logger.info(f"Merged topic {self.ids[j]} into {self.ids[i]}")
+        self._keep(~absorbed)
+
+    def _split(self):
+        candidates = np.nonzero((self.spreads > self.split_spread) & (self.weights >= self.min_split_weight))[0]
+        for i in candidates:
+            if len(self.ids) >= self.max_clusters:
+                break
+            members = self.reservoirs[i, :min(int(self.seen[i]), self.reservoir_size)].astype(np.float32)
+            if len(members) < 4:
+                continue
+            centres = members[self.rng.choice(len(members), 2, replace=False)]
+            for _ in range(10):
+                labels = np.argmax(members @ centres.T, axis=1)
+                if labels.min() == labels.max():
+                    break
+                centres = np.stack([members[labels == c].mean(axis=0) for c in (0, 1)])
+                centres /= np.maximum(np.linalg.norm(centres, axis=1, keepdims=True), 1e-12)
+            if labels.min() == labels.max():
+                continue
+            share = float((labels == 1).mean())
+            weight = self.weights[i]
+            # The original id keeps the larger half
+            keep, spawn = (0, 1) if share <= 0.5 else (1, 0)
+            self.centroids[i] = centres[keep]
+            self.weights[i] = weight * (1 - min(share, 1 - share))
+            self.spreads[i] = float(np.mean(1.0 - members[labels == keep] @ centres[keep]))
+            self.reservoirs[i] = 0
+            kept = members[labels == keep]
+            self.reservoirs[i, :len(kept)] = kept
+            self.seen[i] = len(kept)
+            new_id = self._new_cluster(centres[spawn], weight=weight * min(share, 1 - share))
+            spawned = members[labels == spawn]
+            self.reservoirs[-1, :len(spawned)] = spawned
+            self.seen[-1] = len(spawned)
+            self.spreads[-1] = float(np.mean(1.0 - spawned @ centres[spawn]))
+            logger.info(f"Split topic {self.ids[i]} into {self.ids[i]} and {new_id}")
+
+    def summaries(self) -> List[Dict]:
+        order = np.argsort(-self.weights)
+        return [{'topic': int(self.ids[i]), 'weight': float(self.weights[i]), 'spread': float(self.spreads[i])}
+                for i in order]
+
+    def save(self, path: str):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, ids=self.ids, centroids=self.centroids, weights=self.weights, spreads=self.spreads,
+                 seen=self.seen, reservoirs=self.reservoirs,
+                 merged=np.array(sorted(self.merged_into.items()), dtype=np.int64).reshape(-1, 2),
+                 state=np.array([self.next_id, self.steps, self.cursor], dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'OnlineClusterer':
+        data = np.load(path)
+        clusterer = cls(dim=data['centroids'].shape[1], reservoir_size=data['reservoirs'].shape[1], **kwargs)
+        clusterer.ids = data['ids']
+        clusterer.centroids = data['centroids']
+        clusterer.weights = data['weights']
+        clusterer.spreads = data['spreads']
+        clusterer.seen = data['seen']
+        clusterer.reservoirs = data['reservoirs']
+        state = [int(x) for x in data['state']]
+        clusterer.next_id, clusterer.steps = state[:2]
+        # Files written before the cursor was stored only had next_id and steps
+        clusterer.cursor = state[2] if len(state) > 2 else 0
+        if 'merged' in data:
+            clusterer.merged_into = {int(old): int(new) for old, new in data['merged']}
+        return clusterer
+
+
+def truncate_assignments(path: str, rows: int):
+    """Drop CSV rows written after the last saved state, keeping the header and the first `rows`"""
+    with open(path, 'r', newline='') as f:
+        lines = f.readlines()
+    if len(lines) <= rows + 1:
+        if len(lines) < rows + 1:
+            logger.warning(f"{path} has {max(len(lines) - 1, 0)} rows but the state is at row {rows}")
+        return
+    logger.info(f"Discarding {len(lines) - rows - 1} assignments written after the last checkpoint")
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        f.writelines(lines[:rows + 1])
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Assign newly embedded articles to topics')
+    parser.add_argument('--store', default='embeddings', help='Embedding store directory')
+    parser.add_argument('--state', default='topics.npz', help='Clusterer state file')
+    parser.add_argument('--assignments', default='topic_assignments.csv', help='Row -> topic CSV, appended to')
+    parser.add_argument('--checkpoint-every', type=int, default=10000,
+                        help='Rows between flushing the CSV and saving the state')
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if os.path.exists(args.state):
+        clusterer = OnlineClusterer.load(args.state)
+    else:
+        clusterer = OnlineClusterer(store.dim)
+
+    # The state records the resume row; CSV rows past it were assigned by a run
+    # that died before checkpointing and are reassigned from the saved state
+    start = clusterer.cursor
+    if os.path.exists(args.assignments):
+        truncate_assignments(args.assignments, start)
+
+    def checkpoint(f, row: int):
+        # CSV first: a crash between the two leaves extra rows, which the next run discards
+        f.flush()
+        os.fsync(f.fileno())
+        clusterer.cursor = row
+        clusterer.save(args.state)
+
+    matrix = store.matrix
+    new_file = not os.path.exists(args.assignments) or os.path.getsize(args.assignments) == 0
+    with open(args.assignments, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(['row', 'topic'])
+        for row in range(start, len(matrix)):
+            writer.writerow([row, clusterer.assign(matrix[row])])
+            if (row + 1 - start) % args.checkpoint_every == 0:
+                checkpoint(f, row + 1)
+        checkpoint(f, len(matrix))
+
+    logger.info(f"Assigned {len(matrix) - start} articles, {len(clusterer)} topics")
+
+
+if __name__ == "__main__":
+    main()
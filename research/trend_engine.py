@@ -0,0 +1,341 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sketches import CountMinSketch, HeavyHitters, hash64
+from text_cleaner import TextCleaner
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+MIN_TERM_LENGTH = 3
+# Ids below the follower's high-water mark re-checked for late commits
+ID_WINDOW = 10000
+
+
+def extract_terms(text: str) -> List[str]:
+    """Unigrams, bigrams and capitalised multi-word entities, prefixed by kind"""
+    text = TextCleaner.remove_special_chars(text)
+    tokens = WORD_RE.findall(text)
+    terms = []
+
+    words = [t.lower() for t in tokens]
+    for i, word in enumerate(words):
+        if len(word) >= MIN_TERM_LENGTH and not word.isdigit():
+            terms.append(f'w:{word}')
+        if i and not word.isdigit() and not words[i - 1].isdigit():
+            terms.append(f'b:{words[i - 1]} {word}')
+
+    # Runs of two or more capitalised tokens: "Hà Nội", "Open AI"
+    run = []
+    for token in tokens + ['']:
+        if token[:1].isupper():
+            run.append(token)
+            continue
+        if len(run) >= 2:
+            terms.append(f'e:{" ".join(run)}')
+        run = []
+    return terms
+
+
+class Bucket:
+    def __init__(self, start: float, width: int, depth: int, capacity: int):
+        self.start = start
+        self.sketch = CountMinSketch(width=width, depth=depth)
+        self.heavy: Dict[str, HeavyHitters] = {}
+        self.capacity = capacity
+
+    def add(self, scope: str, terms: Iterable[str]):
+        heavy = self.heavy.get(scope)
+        if heavy is None:
+            heavy = self.heavy[scope] = HeavyHitters(self.capacity)
+        keys = []
+        for term in terms:
+            heavy.add(term)
+            keys.append(hash64(f'{scope}|{term}'))
+        self.sketch.add_many(keys)
+
+
+class TrendEngine:
+    """
+    Sliding-window burst detection over a stream of articles.
+
+    Counts live in one count-min sketch per time bucket, so memory is fixed
+    by the sketch size and window length. Candidate terms come from bounded
+    heavy-hitter tables per scope (all, language, feed, category). A term's
+    burst score compares its window count with a decayed per-bucket
+    baseline that absorbs each bucket as it leaves the window, so history is
+    never rescanned.
+
+    Event times are clamped to at most max_future_seconds past the clock,
+    so a mis-dated article cannot push the window into the future and make
+    every later article look too old to count.
+    """
+
+    def __init__(self, bucket_seconds: int = 300, window_buckets: int = 12,
+                 baseline_half_life_buckets: int = 288, width: int = 1 << 18, depth: int = 4,
+                 heavy_hitters: int = 2000, max_future_seconds: float = 300.0):
+        self.max_future_seconds = max_future_seconds
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.width = width
+        self.depth = depth
+        self.heavy_hitters = heavy_hitters
+        self.decay = 0.5 ** (1.0 / baseline_half_life_buckets)
+        self.baseline = CountMinSketch(width=width, depth=depth, dtype=np.float32)
+        self.baseline_buckets = 0
+        self.buckets: deque = deque()
+
+    def _bucket_for(self, timestamp: float) -> Optional[Bucket]:
+        start = timestamp - timestamp % self.bucket_seconds
+        if self.buckets and start - self.buckets[-1].start > self.window_buckets * self.bucket_seconds:
+            # Long gap: retire the whole window, then decay the baseline for the empty buckets at once
+            skipped = int((start - self.buckets[-1].start) // self.bucket_seconds) - len(self.buckets)
+            while self.buckets:
+                self._retire(self.buckets.popleft())
+            self.baseline.table *= self.decay ** max(skipped, 0)
+            self.baseline_buckets += max(skipped, 0)
+        if not self.buckets:
+            self.buckets.append(Bucket(start, self.width, self.depth, self.heavy_hitters))
+        while start > self.buckets[-1].start:
+            self.buckets.append(Bucket(self.buckets[-1].start + self.bucket_seconds,
+                                       self.width, self.depth, self.heavy_hitters))
+            if len(self.buckets) > self.window_buckets:
+                self._retire(self.buckets.popleft())
+        for bucket in reversed(self.buckets):
+            if bucket.start == start:
+                return bucket
+        # Older than the window: too late to count
+        return None
+
+    def _retire(self, bucket: Bucket):
+        self.baseline.table *= self.decay
+        self.baseline.table += (1 - self.decay) * bucket.sketch.table
+        self.baseline_buckets += 1
+
+    def observe(self, text: str, timestamp: float, scopes: Iterable[str] = ()):
+        bucket = self._bucket_for(min(timestamp, time.time() + self.max_future_seconds))
+        if bucket is None:
+            return
+        terms = extract_terms(text)
+        for scope in ['all', *scopes]:
+            bucket.add(scope, terms)
+
+    def top(self, scope: str = 'all', n: int = 20, kind: Optional[str] = None,
+            min_count: int = 5) -> List[Dict]:
+        candidates = set()
+        for bucket in self.buckets:
+            heavy = bucket.heavy.get(scope)
+            if heavy is not None:
+                candidates.update(heavy.keys())
+        if kind:
+            candidates = {term for term in candidates if term.startswith(kind + ':')}
+        if not candidates:
+            return []
+
+        terms = sorted(candidates)
+        keys = np.array([hash64(f'{scope}|{term}') for term in terms], dtype=np.uint64)
+        window = np.zeros(len(terms), dtype=np.float64)
+        for bucket in self.buckets:
+            window += bucket.sketch.estimate_many(keys)
+        # Until a baseline exists everything looks new; fall back to raw counts
+        expected = (self.baseline.estimate_many(keys).astype(np.float64) * len(self.buckets)
+                    if self.baseline_buckets else np.zeros(len(terms)))
+        scores = (window - expected) / np.sqrt(expected + 1.0)
+
+        ranked = []
+        for term, count, base, score in zip(terms, window, expected, scores):
+            if count >= min_count and score > 0:
+                ranked.append({
+                    'term': term[2:],
+                    'kind': {'w': 'word', 'b': 'bigram', 'e': 'entity'}[term[0]],
+                    'count': int(count),
+                    'expected': round(float(base), 2),
+                    'score': round(float(score), 3),
+                })
+        ranked.sort(key=lambda item: item['score'], reverse=True)
+        return ranked[:n]
+
+    def scopes(self) -> List[str]:
+        found = set()
+        for bucket in self.buckets:
+            found.update(bucket.heavy.keys())
+        return sorted(found)
+
+    def write_snapshot(self, path: str, n: int = 50):
+        """Atomically write the current top trends of every scope for the API to serve"""
+        snapshot = {
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'window_seconds': self.bucket_seconds * self.window_buckets,
+            'scopes': {scope: self.top(scope, n=n) for scope in self.scopes()},
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def save_state(self, path: str, cursor: int = 0, seen: Iterable[int] = ()):
+        """Atomically persist the window, baseline and the caller's resume cursor and seen ids in one file"""
+        tmp_path = path + '.tmp.npz'
+        sketches = (np.stack([bucket.sketch.table for bucket in self.buckets]) if self.buckets
+                    else np.zeros((0, self.depth, self.width), dtype=np.uint32))
+        heavy = [{scope: h.counts for scope, h in bucket.heavy.items()} for bucket in self.buckets]
+        np.savez(tmp_path, baseline=self.baseline.table, sketches=sketches,
+                 starts=np.array([bucket.start for bucket in self.buckets], dtype=np.float64),
+                 heavy=np.array(json.dumps(heavy, ensure_ascii=False)),
+                 state=np.array([self.baseline_buckets, cursor], dtype=np.int64),
+                 seen=np.array(sorted(seen), dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_state(cls, path: str, **kwargs) -> Tuple['TrendEngine', int, Optional[Set[int]]]:
+        """
+        Engine, cursor and seen ids saved by save_state; kwargs must match the
+        saving engine's sketch sizes. Seen is None for files written before
+        seen ids were stored.
+        """
+        data = np.load(path)
+        engine = cls(**kwargs)
+        if data['baseline'].shape != engine.baseline.table.shape:
+            raise ValueError(f"{path} was saved with sketch shape {data['baseline'].shape}")
+        engine.baseline.table = data['baseline']
+        engine.baseline_buckets, cursor = (int(x) for x in data['state'])
+        for start, table, heavy in zip(data['starts'], data['sketches'], json.loads(str(data['heavy']))):
+            bucket = Bucket(float(start), engine.width, engine.depth, engine.heavy_hitters)
+            bucket.sketch.table = table
+            for scope, counts in heavy.items():
+                bucket.heavy[scope] = HeavyHitters(engine.heavy_hitters)
+                bucket.heavy[scope].counts = counts
+            engine.buckets.append(bucket)
+        seen = {int(x) for x in data['seen']} if 'seen' in data else None
+        return engine, cursor, seen
+
+
+def article_scopes(language: Optional[str], feed_id: Optional[int], category_ids: Iterable[int] = ()) -> List[str]:
+    scopes = []
+    if language:
+        scopes.append(f'lang:{language}')
+    if feed_id is not None:
+        scopes.append(f'feed:{feed_id}')
+    scopes.extend(f'category:{c}' for c in category_ids)
+    return scopes
+
+
+def follow_database(engine: TrendEngine, snapshot_path: str, interval: int,
+                    state_path: str, last_id: int = 0, seen: Optional[Set[int]] = None,
+                    id_window: int = ID_WINDOW):
+    """
+    Poll new Article rows by id and refresh the snapshot after each batch.
+
+    Ids are allocated before commit, so parallel ingest transactions can
+    commit a lower id after a higher one was already read. Each poll
+    therefore re-checks the last id_window ids below the high-water mark
+    against a bounded set of ids already observed and picks up late
+    commits. The engine state, the last id and the seen set are saved
+    together after every batch, so a restart resumes without replaying
+    or skipping articles.
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from models.database_models import Article, Feed, Subscription
+
+    if seen is None:
+        # No record of what was observed: trust the cursor for everything below it
+        seen = {article_id for (article_id,) in Article
+                .select(Article.id)
+                .where((Article.id > last_id - id_window) & (Article.id <= last_id))
+                .tuples()}
+    columns = (Article.id, Article.content, Article.summary, Article.published_at,
+               Article.fetched_at, Article.feed, Feed.language)
+    while True:
+        floor = last_id - id_window
+        # Ids only: cheap on the primary key index even when nothing is missing
+        recent = [article_id for (article_id,) in Article
+                  .select(Article.id)
+                  .where((Article.id > floor) & (Article.id <= last_id))
+                  .tuples()]
+        late = [article_id for article_id in recent if article_id not in seen]
+        rows = list(Article.select(*columns).join(Feed).where(Article.id.in_(late)).tuples()) if late else []
+        fresh = list(Article
+                     .select(*columns)
+                     .join(Feed)
+                     .where(Article.id > last_id)
+                     .order_by(Article.id)
+                     .limit(5000)
+                     .tuples())
+        rows += fresh
+
+        feed_ids = {row[5] for row in rows}
+        categories: Dict[int, set] = {}
+        if feed_ids:
+            query = (Subscription
+                     .select(Subscription.feed, Subscription.category)
+                     .where(Subscription.feed.in_(feed_ids) & Subscription.category.is_null(False))
+                     .tuples())
+            for feed_id, category_id in query:
+                categories.setdefault(feed_id, set()).add(category_id)
+
+        for article_id, content, summary, published_at, fetched_at, feed_id, language in rows:
+            moment = published_at or fetched_at
+            engine.observe(content or summary or '', moment.timestamp() if moment else time.time(),
+                           article_scopes(language, feed_id, categories.get(feed_id, ())))
+            seen.add(article_id)
+            last_id = max(last_id, article_id)
+
+        if rows:
+            # Ids below the window are never re-checked, so they need not be remembered
+            seen = {article_id for article_id in seen if article_id > last_id - id_window}
+            engine.save_state(state_path, last_id, seen)
+            engine.write_snapshot(snapshot_path)
+            logger.info(f"Processed {len(rows)} articles ({len(late)} committed late) up to id {last_id}")
+        if len(fresh) < 5000:
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming trend detection over ingested articles')
+    parser.add_argument('--input', help='Replay a cleaned CSV (url, text_content, published_date) instead of polling')
+    parser.add_argument('--snapshot', default='trends.json', help='Snapshot file served by /api/trends')
+    parser.add_argument('--interval', type=int, default=60, help='Seconds between database polls')
+    parser.add_argument('--state', default='trend_state.npz', help='Engine state and resume point when polling')
+    parser.add_argument('--bucket-seconds', type=int, default=300)
+    parser.add_argument('--window-buckets', type=int, default=12)
+    args = parser.parse_args()
+
+    settings = {'bucket_seconds': args.bucket_seconds, 'window_buckets': args.window_buckets}
+    if not args.input:
+        if os.path.exists(args.state):
+            engine, last_id, seen = TrendEngine.load_state(args.state, **settings)
+            logger.info(f"Resuming after article {last_id}")
+        else:
+            engine, last_id, seen = TrendEngine(**settings), 0, set()
+        follow_database(engine, args.snapshot, args.interval, args.state, last_id, seen)
+        return
+
+    engine = TrendEngine(**settings)
+
+    for chunk in pd.read_csv(args.input, chunksize=10000):
+        dates = chunk['published_date'] if 'published_date' in chunk else pd.Series([None] * len(chunk))
+        published = pd.to_datetime(dates, errors='coerce', utc=True)
+        for text, moment in zip(chunk['text_content'], published):
+            timestamp = moment.timestamp() if not pd.isna(moment) else time.time()
+            engine.observe(text if isinstance(text, str) else '', timestamp)
+    engine.write_snapshot(args.snapshot)
+    logger.info(f"Wrote trends for {len(engine.scopes())} scopes to {args.snapshot}")
+
+
+if __name__ == "__main__":
+    main()
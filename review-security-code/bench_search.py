@@ -0,0 +1,104 @@
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from bulk_indexer import BulkIndexer
+from code_chunks import chunk_code
+from local_search import connect
+
+INDEX_NAME = 'bench_security_code_samples'
+
+
+def load_corpus(path: str, docs: int) -> List[Dict]:
+    """The generated samples, repeated with shuffled descriptions up to `docs` documents"""
+    with open(path, 'r', encoding='utf-8') as f:
+        # security_code_generator.py writes JSONL
+        samples = [json.loads(line) for line in f] if path.endswith('.jsonl') else json.load(f)
+    rng = random.Random(0)
+    corpus = []
+    while len(corpus) < docs:
+        for sample in samples:
+            if len(corpus) >= docs:
+                break
+            words = sample['description'].split()
+            rng.shuffle(words)
+            corpus.append(dict(sample, id=f"{sample['id']}-{len(corpus)}", description=' '.join(words)))
+    return corpus
+
+
+def queries(corpus: List[Dict], count: int) -> List[Dict]:
+    """Code-chunk queries shaped like the reviewer's check_security_risks"""
+    rng = random.Random(1)
+    chunks = [chunk.text[:2000] for sample in corpus[:200] for chunk in chunk_code(sample.get('generated_code') or '')]
+    chunks = chunks or [sample['description'] for sample in corpus[:200]]
+    return [
+        {
+            'query': {'multi_match': {'query': rng.choice(chunks),
+                                      'fields': ['description', 'generated_code', 'metadata.tags'],
+                                      'type': 'best_fields'}},
+            'size': 10,
+        }
+        for _ in range(count)
+    ]
+
+
+def run(client, corpus: List[Dict], bodies: List[Dict]) -> Dict:
+    if client.indices.exists(index=INDEX_NAME):
+        client.indices.delete(index=INDEX_NAME)
+    client.indices.create(index=INDEX_NAME)
+    indexer = BulkIndexer(client, INDEX_NAME, workers=1)
+    start = time.perf_counter()
+    with indexer.bulk_load_settings():
+        indexer.index(corpus, op_type='index')
+    # Includes the final refresh, which is where the local index is built
+    index_seconds = time.perf_counter() - start
+
+    latencies, hits = [], []
+    for body in bodies:
+        start = time.perf_counter()
+        response = client.search(index=INDEX_NAME, body=body)
+        latencies.append(time.perf_counter() - start)
+        hits.append([hit['_id'] for hit in response['hits']['hits']])
+    return {
+        'index_seconds': index_seconds,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'hits': hits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Embedded BM25 index against Elasticsearch on security sample search')
+    parser.add_argument('--samples', default='security_code_samples.json', help='Samples as JSON or JSONL')
+    parser.add_argument('--docs', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--es-url', help='Elasticsearch to compare against; local only when omitted')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.samples, args.docs)
+    bodies = queries(corpus, args.queries)
+    directory = tempfile.mkdtemp(prefix='bench-search-')
+    try:
+        results = {'local': run(connect(f'local:{directory}'), corpus, bodies)}
+        if args.es_url:
+            results['elasticsearch'] = run(connect(args.es_url), corpus, bodies)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for label, result in results.items():
+        print(f"{label:<14}: indexed {len(corpus)} docs in {result['index_seconds']:6.2f}s, "
+              f"query p50 {result['p50_ms']:7.2f} ms, p95 {result['p95_ms']:7.2f} ms")
+    if 'elasticsearch' in results:
+        overlap = [len(set(a) & set(b)) / max(len(b), 1)
+                   for a, b in zip(results['local']['hits'], results['elasticsearch']['hits'])]
+        print(f"top-10 overlap with Elasticsearch: {np.mean(overlap):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Error messages kept in the returned stats; the counts cover every failure
+MAX_ERRORS = 10
+
+
+def _status(error: Exception) -> Optional[int]:
+    """HTTP status of an Elasticsearch client error, for both 7.x and 8.x clients"""
+    status = getattr(error, 'status_code', None)
+    if not isinstance(status, int):
+        status = getattr(getattr(error, 'meta', None), 'status', None)
+    return status if isinstance(status, int) else None
+
+
+class BulkIndexer:
+    """
+    Chunked _bulk ingestion with a bounded number of requests in flight.
+
+    Documents are cut into chunks by count and by serialized size and sent
+    by up to `workers` threads; at most 2 * workers chunks are buffered, so
+    memory stays flat for any input size. Items rejected with 429 (and
+    whole requests answered with 429) are retried with jittered
+    exponential backoff. With op_type='create', documents whose id already
+    exists come back as 409 and are counted as skipped, which replaces an
+    exists() round-trip per document.
+    """
+
+    def __init__(self, es, index_name: str, chunk_size: int = 1000,
+                 max_chunk_bytes: int = 10 * 1024 * 1024, workers: int = 4,
+                 max_retries: int = 6, report_every: float = 5.0):
+        self.es = es
+        self.index_name = index_name
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.workers = workers
+        self.max_retries = max_retries
+        self.report_every = report_every
+        self._lock = threading.Lock()
+
+    def _chunks(self, docs: Iterable[Dict], op_type: str, id_field: str) -> Iterator[List[Tuple[str, str]]]:
+        chunk, size = [], 0
+        for doc in docs:
+            action = json.dumps({op_type: {'_index': self.index_name, '_id': str(doc[id_field])}})
+            source = json.dumps(doc, ensure_ascii=False, default=str)
+            line_bytes = len(action) + len(source.encode('utf-8')) + 2
+            if chunk and (len(chunk) >= self.chunk_size or size + line_bytes > self.max_chunk_bytes):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append((action, source))
+            size += line_bytes
+        if chunk:
+            yield chunk
+
+    def _record(self, stats: Dict, errors: List[str], created: int = 0, skipped: int = 0,
+                failed: int = 0, sent_bytes: int = 0):
+        with self._lock:
+            stats['created'] += created
+            stats['skipped'] += skipped
+            stats['failed'] += failed
+            stats['bytes'] += sent_bytes
+            stats['errors'].extend(errors[:MAX_ERRORS - len(stats['errors'])])
+
+    def _send(self, chunk: List[Tuple[str, str]], stats: Dict):
+        attempt = 0
+        try:
+            while chunk:
+                body = ''.join(f'{action}\n{source}\n' for action, source in chunk)
+                try:
+                    response = self.es.bulk(body=body)
+                except Exception as e:
+                    if _status(e) != 429 or attempt >= self.max_retries:
+                        self._record(stats, [str(e)], failed=len(chunk))
+                        return
+                    retry = chunk
+                else:
+                    retry, errors = [], []
+                    created = skipped = failed = 0
+                    items = response['items']
+                    for (action, source), item in zip(chunk, items):
+                        result = next(iter(item.values()))
+                        status = result.get('status', 500)
+                        if status < 300:
+                            created += 1
+                        elif status == 409:
+                            skipped += 1
+                        elif status == 429 and attempt < self.max_retries:
+                            retry.append((action, source))
+                        else:
+                            failed += 1
+                            errors.append(json.dumps(result.get('error')))
+                    if len(items) != len(chunk):
+                        failed += len(chunk) - len(items)
+                        errors.append(f"Bulk response had {len(items)} items for {len(chunk)} actions")
+                    self._record(stats, errors, created, skipped, failed, len(body.encode('utf-8')))
+                chunk = retry
+                if chunk:
+                    attempt += 1
+                    time.sleep(random.uniform(0, min(30.0, 0.5 * 2 ** attempt)))
+        except Exception as e:
+            # A malformed response or a bug here must still show up in the counts
+            logger.exception("Bulk chunk failed")
+            self._record(stats, [repr(e)], failed=len(chunk))
+
+    def index(self, docs: Iterable[Dict], op_type: str = 'create', id_field: str = 'id') -> Dict:
+        """Index a stream of documents, returns counts and throughput"""
+        stats = {'created': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'errors': []}
+        started = last_report = time.perf_counter()
+        in_flight = threading.BoundedSemaphore(self.workers * 2)
+
+        def send(chunk):
+            try:
+                self._send(chunk, stats)
+            finally:
+                in_flight.release()
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for chunk in self._chunks(docs, op_type, id_field):
+                in_flight.acquire()
+                futures.append(pool.submit(send, chunk))
+                # Surface worker errors as they finish instead of holding every future
+                while futures and futures[0].done():
+                    futures.pop(0).result()
+                now = time.perf_counter()
+                if now - last_report >= self.report_every:
+                    last_report = now
+                    done = stats['created'] + stats['skipped'] + stats['failed']
+                    logger.info(f"Indexed {done} documents, {done / (now - started):,.0f} docs/s")
+        for future in futures:
+            future.result()
+
+        stats['seconds'] = time.perf_counter() - started
+        total = stats['created'] + stats['skipped'] + stats['failed']
+        stats['docs_per_second'] = total / stats['seconds'] if stats['seconds'] else 0.0
+        stats['mb_per_second'] = stats['bytes'] / 1e6 / stats['seconds'] if stats['seconds'] else 0.0
+        logger.info(f"Bulk load done: {stats['created']} created, {stats['skipped']} skipped, "
+                    f"{stats['failed']} failed in {stats['seconds']:.1f}s "
+                    f"({stats['docs_per_second']:,.0f} docs/s, {stats['mb_per_second']:.1f} MB/s)")
+        return stats
+
+    @contextmanager
+    def bulk_load_settings(self):
+        """Disable refresh for the duration of a load, then restore it and refresh once"""
+        settings = self.es.indices.get_settings(index=self.index_name)
+        previous = settings[self.index_name]['settings']['index'].get('refresh_interval')
+        self.es.indices.put_settings(index=self.index_name, body={'index': {'refresh_interval': '-1'}})
+        try:
+            yield
+        finally:
+            # None restores the cluster default
+            self.es.indices.put_settings(index=self.index_name, body={'index': {'refresh_interval': previous}})
+            self.es.indices.refresh(index=self.index_name)
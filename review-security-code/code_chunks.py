@@ -0,0 +1,100 @@
+import ast
+from dataclasses import dataclass
+from typing import List, Tuple
+
+
+@dataclass
+class CodeChunk:
+    start_line: int  # 1-based, inclusive
+    end_line: int
+    text: str
+
+
+def python_scopes(code: str) -> List[Tuple[int, int]]:
+    """Line spans of every function and class, decorators included"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+    spans = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            spans.append((start, node.end_lineno))
+    return spans
+
+
+def _outermost_functions(code: str) -> List[Tuple[int, int]]:
+    """Functions and methods not nested in another function, in file order"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+    spans = []
+
+    def visit(node):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                spans.append((start, child.end_lineno))
+            elif isinstance(child, ast.ClassDef):
+                visit(child)
+
+    visit(tree)
+    return sorted(spans)
+
+
+def _paragraphs(lines: List[str], start: int, end: int) -> List[Tuple[int, int]]:
+    """Blank-line separated blocks of lines[start-1:end]"""
+    blocks, block_start = [], None
+    for number in range(start, end + 1):
+        if lines[number - 1].strip():
+            if block_start is None:
+                block_start = number
+        elif block_start is not None:
+            blocks.append((block_start, number - 1))
+            block_start = None
+    if block_start is not None:
+        blocks.append((block_start, end))
+    return blocks
+
+
+def chunk_code(code: str, max_lines: int = 60) -> List[CodeChunk]:
+    """
+    Split code into function- or block-sized chunks of at most max_lines.
+
+    Python that parses is cut at function and method boundaries, with the
+    code between them grouped by blank lines. Anything else is grouped by
+    blank lines only. Consecutive small blocks are packed together up to
+    max_lines; longer blocks are cut into max_lines windows.
+    """
+    lines = code.splitlines()
+    if not lines:
+        return []
+
+    spans, position = [], 1
+    for start, end in _outermost_functions(code):
+        if start < position:
+            continue
+        spans.extend(_paragraphs(lines, position, start - 1))
+        spans.append((start, end))
+        position = end + 1
+    spans.extend(_paragraphs(lines, position, len(lines)))
+
+    # Pack small neighbours together, split oversized spans
+    packed: List[Tuple[int, int]] = []
+    for start, end in spans:
+        while end - start + 1 > max_lines:
+            packed.append((start, start + max_lines - 1))
+            start += max_lines
+        if packed and end - packed[-1][0] + 1 <= max_lines:
+            packed[-1] = (packed[-1][0], end)
+        else:
+            packed.append((start, end))
+
+    chunks = []
+    for start, end in packed:
+        text = '\n'.join(lines[start - 1:end])
+        if text.strip():
+            chunks.append(CodeChunk(start, end, text))
+    return chunks
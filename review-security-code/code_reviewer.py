@@ -1,9 +1,17 @@
-import torch
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from dataclasses import asdict, dataclass, field
 from elasticsearch import Elasticsearch
 import difflib
+import openai
 from openai import OpenAI
+from code_chunks import chunk_code
+from codebert_scorer import CodeBERTScorer
+from rate_limit import TokenBucket, retry
+from review_cache import ReviewCache
 from transformers import (
     AutoTokenizer, 
     AutoModelForSequenceClassification
@@ -17,12 +25,38 @@ class ReviewResult:
     suggested_refinements: List[str]
     security_risks: List[Dict]
     diff_analysis: Dict
+    timings: Dict[str, float] = field(default_factory=dict)  # Seconds per review stage
+
+# Transient OpenAI failures worth another attempt
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
 
 class CodeReviewer:
-    def __init__(self, es_client: Elasticsearch, openai_client: OpenAI):
+    # Part of the review cache key; bump when prompts or scoring change
+    REVIEW_VERSION = "2:codebert-base:chunked-msearch"
+    # Seconds an index state read is reused before asking the backend again
+    INDEX_STATE_TTL = 30.0
+
+    def __init__(self, es_client: Elasticsearch, openai_client: Optional[OpenAI],
+                 codebert_threads: Optional[int] = None, codebert_batch_size: int = 16,
+                 llm_rate: float = 5.0, llm_burst: int = 10, llm_timeout: float = 60.0, llm_attempts: int = 3,
+                 cache: Optional[ReviewCache] = None, search_url: Optional[str] = None):
         self.es = es_client
-        self.openai = openai_client
+        self.search_url = search_url
+        self.openai = openai_client  # May be None when replaying from the cache
+        self.cache = cache
+        # One bucket per reviewer, so concurrent stages and reviews share the API budget
+        self.llm_bucket = TokenBucket(rate=llm_rate, capacity=llm_burst)
+        self.llm_timeout = llm_timeout
+        self.llm_attempts = llm_attempts
         self.security_index = "security_code_samples"
+        self._index_state: Optional[Dict] = None
+        self._index_state_at = 0.0
+        self._index_state_lock = threading.Lock()
         
         # Initialize CodeBERT model with 2 classes (good/bad)
         self.codebert_tokenizer = AutoTokenizer.from_pretrained("microsoft/codebert-base")
@@ -31,6 +65,51 @@ class CodeReviewer:
             num_labels=2  # Binary classification
         )
         self.codebert_model.eval()
+        self.codebert = CodeBERTScorer(
+            self.codebert_tokenizer,
+            self.codebert_model,
+            batch_size=codebert_batch_size,
+            num_threads=codebert_threads
+        )
+
+    def _cached(self, namespace: str, request: Dict, fn):
+        return fn() if self.cache is None else self.cache.call(namespace, request, fn)
+
+    def index_state(self) -> Dict:
+        """Search backend and security index state, part of every cache key that covers search results
+
+        Regenerating the samples or switching backends changes it, so cached
+        risk matches are not served against a different index. Replay runs
+        use the state recorded by the last online run.
+        """
+        with self._index_state_lock:
+            if self._index_state is None or time.monotonic() - self._index_state_at > self.INDEX_STATE_TTL:
+                def fetch() -> Dict:
+                    stats = self.es.indices.stats(index=self.security_index, metric="docs,indexing")
+                    primaries = stats["_all"]["primaries"]
+                    return {
+                        "uuids": sorted(index.get("uuid", name) for name, index in stats.get("indices", {}).items()),
+                        "docs": primaries["docs"]["count"],
+                        "writes": primaries["indexing"]["index_total"],
+                    }
+                request = {"search_url": self.search_url, "index": self.security_index}
+                state = fetch() if self.cache is None else self.cache.latest("index_state", request, fetch)
+                self._index_state = dict(request, **state)
+                self._index_state_at = time.monotonic()
+            return self._index_state
+
+    def _review_key(self, old_code: str, new_code: str) -> str:
+        # Whole reviews include the risk matches, so they depend on the index too
+        return self.cache.review_key(old_code, new_code, json.dumps([self.REVIEW_VERSION, self.index_state()]))
+
+    def _chat(self, **kwargs) -> str:
+        """Rate-limited, cached chat completion with a per-call timeout and retries; returns the text"""
+        def call():
+            self.llm_bucket.acquire()
+            response = self.openai.chat.completions.create(timeout=self.llm_timeout, **kwargs)
+            return response.choices[0].message.content
+
+        return self._cached("llm", kwargs, lambda: retry(call, attempts=self.llm_attempts, retry_on=RETRYABLE_ERRORS))
 
     def analyze_diff(self, old_code: str, new_code: str) -> Dict:
         """Analyze git diff between old and new code versions"""
@@ -60,7 +139,7 @@ class CodeReviewer:
         Return only the numeric score between 0 and 1.
         """
         
-        response = self.openai.chat.completions.create(
+        content = self._chat(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You analyze code quality and return only a numeric score between 0 and 1."},
@@ -69,7 +148,7 @@ class CodeReviewer:
         )
         
         try:
-            return float(response.choices[0].message.content.strip())
+            return float(content.strip())
         except:
             return 0.5  # Default score if parsing fails
 
@@ -88,7 +167,7 @@ class CodeReviewer:
         Return a list of clear, concise review comments.
         """
         
-        response = self.openai.chat.completions.create(
+        content = self._chat(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are an experienced code reviewer providing specific, actionable feedback."},
@@ -96,7 +175,7 @@ class CodeReviewer:
             ]
         )
         
-        comments = response.choices[0].message.content.strip().split("\n")
+        comments = content.strip().split("\n")
         return [c.strip("- ") for c in comments if c.strip()]
 
     def suggest_refinements(self, code: str) -> List[str]:
@@ -114,7 +193,7 @@ class CodeReviewer:
         Return a list of specific code refinement suggestions.
         """
         
-        response = self.openai.chat.completions.create(
+        content = self._chat(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You suggest specific code improvements and refinements."},
@@ -122,57 +201,70 @@ class CodeReviewer:
             ]
         )
         
-        refinements = response.choices[0].message.content.strip().split("\n")
+        refinements = content.strip().split("\n")
         return [r.strip("- ") for r in refinements if r.strip()]
 
-    def check_security_risks(self, code: str) -> List[Dict]:
-        """Check for potential security risks using the security samples index"""
-        # Search for similar security vulnerabilities
-        response = self.es.search(
-            index=self.security_index,
-            body={
+    def check_security_risks(self, code: str, max_chunks: int = 50, chunk_chars: int = 2000,
+                             hits_per_chunk: int = 5, max_risks: int = 10) -> List[Dict]:
+        """Check for potential security risks using the security samples index
+
+        The code is split into function/block chunks that are all searched in
+        one _msearch round-trip. Hits are merged per sample, keeping the best
+        score and the line ranges of every chunk that matched it.
+        """
+        chunks = chunk_code(code)[:max_chunks]
+        if not chunks:
+            return []
+        
+        searches = []
+        for chunk in chunks:
+            searches.append({"index": self.security_index})
+            searches.append({
+                "size": hits_per_chunk,
+                "_source": ["description", "metadata.type"],
                 "query": {
                     "multi_match": {
-                        "query": code,
+                        "query": chunk.text[:chunk_chars],
                         "fields": ["description", "generated_code"]
                     }
                 }
-            }
-        )
-        
-        risks = []
-        for hit in response["hits"]["hits"]:
-            risks.append({
-                "risk_type": hit["_source"]["metadata"]["type"],
-                "description": hit["_source"]["description"],
-                "similarity_score": hit["_score"]
             })
+        
+        def search() -> List[Dict]:
+            # Search for similar security vulnerabilities, one sub-search per chunk
+            response = self.es.msearch(body=searches)
+            
+            risks: Dict[str, Dict] = {}
+            for chunk, result in zip(chunks, response["responses"]):
+                for hit in result.get("hits", {}).get("hits", []):
+                    risk = risks.get(hit["_id"])
+                    if risk is None:
+                        risk = risks[hit["_id"]] = {
+                            "sample_id": hit["_id"],
+                            "risk_type": hit["_source"]["metadata"]["type"],
+                            "description": hit["_source"]["description"],
+                            "similarity_score": hit["_score"],
+                            "locations": []
+                        }
+                    risk["similarity_score"] = max(risk["similarity_score"], hit["_score"])
+                    risk["locations"].append({
+                        "start_line": chunk.start_line,
+                        "end_line": chunk.end_line,
+                        "score": hit["_score"]
+                    })
             
-        return risks
+            ranked = sorted(risks.values(), key=lambda r: r["similarity_score"], reverse=True)
+            return ranked[:max_risks]
+        
+        return self._cached("search", {"index_state": self.index_state(), "searches": searches}, search)
 
     def analyze_codebert(self, code: str) -> Dict[str, float]:
-        """Analyze code quality using CodeBERT"""
-        inputs = self.codebert_tokenizer(
-            code, 
-            return_tensors="pt",
-            truncation=True,
-            padding=True,
-            max_length=512
-        )
-        
-        with torch.no_grad():
-            outputs = self.codebert_model(**inputs)
-        
-        scores = torch.nn.functional.softmax(outputs.logits, dim=-1)
-        labels = ["Needs Improvement", "Good"]  # Binary classification labels
-        
-        analysis = {labels[i]: float(scores[0][i]) for i in range(len(labels))}
-        
-        # Add a derived "Risk Level" score
-        risk_score = 1 - analysis["Good"]  # Higher risk when code quality is lower
-        analysis["Risk Level"] = risk_score
-        
-        return analysis
+        """Analyze code quality using CodeBERT, over the whole file"""
+        return self.codebert.score_files({"code": code})["code"]
+
+    def analyze_codebert_files(self, files: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+        """Analyze several files in one batched CodeBERT pass, keyed like the input"""
+        return self.codebert.score_files(files)
 
     def synthesize_review_comments(self, 
                                  codebert_scores: Dict[str, float],
@@ -205,7 +297,7 @@ class CodeReviewer:
         Return the improved review comments as a list, one item per line.
         """
         
-        response = self.openai.chat.completions.create(
+        content = self._chat(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You are an expert code reviewer who synthesizes and improves code review feedback."},
@@ -216,36 +308,114 @@ class CodeReviewer:
         )
         
         # Extract and clean up the synthesized comments
-        synthesized = response.choices[0].message.content.strip().split('\n')
+        synthesized = content.strip().split('\n')
         return [comment.strip('- ').strip() for comment in synthesized if comment.strip()]
 
-    def review_code(self, old_code: str, new_code: str) -> ReviewResult:
-        """Perform comprehensive code review"""
+    @staticmethod
+    def _timed(timings: Dict[str, float], stage: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    def _cached_review(self, old_code: str, new_code: str) -> Optional[ReviewResult]:
+        """Earlier review of identical contents (same git blob ids), if cached"""
+        if self.cache is None:
+            return None
+        started = time.perf_counter()
+        cached = self.cache.get_review(self._review_key(old_code, new_code))
+        if cached is None:
+            return None
+        cached["timings"] = {"cache": time.perf_counter() - started}
+        return ReviewResult(**cached)
+
+    def review_code(self, old_code: str, new_code: str, parallel: bool = True,
+                    codebert_scores: Optional[Dict[str, float]] = None) -> ReviewResult:
+        """Perform comprehensive code review
+
+        With parallel=True the independent stages (quality estimate, comments,
+        refinements, security search and CodeBERT) run concurrently, so the
+        review takes about as long as the slowest stage plus the synthesis.
+        Pass codebert_scores when they were computed in a batch beforehand.
+        """
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        
+        cached = self._cached_review(old_code, new_code)
+        if cached is not None:
+            return cached
+        
         # Analyze diff
-        diff_analysis = self.analyze_diff(old_code, new_code)
-        
-        # Get CodeBERT analysis
-        codebert_scores = self.analyze_codebert(new_code)
-        
-        # Get analysis results
-        quality_score = self.estimate_quality(new_code)
-        initial_comments = self.generate_comments(diff_analysis["diff"])
-        refinements = self.suggest_refinements(new_code)
-        security_risks = self.check_security_risks(new_code)
-        
-        # Synthesize and improve the review comments
-        improved_comments = self.synthesize_review_comments(
-            codebert_scores=codebert_scores,
-            comments=initial_comments,
-            refinements=refinements,
-            security_risks=security_risks
-        )
+        diff_analysis = self._timed(timings, "diff", self.analyze_diff, old_code, new_code)
+        
+        stages = {
+            "codebert": (self.analyze_codebert if codebert_scores is None else lambda code: codebert_scores, new_code),
+            "quality": (self.estimate_quality, new_code),
+            "comments": (self.generate_comments, diff_analysis["diff"]),
+            "refinements": (self.suggest_refinements, new_code),
+            "security": (self.check_security_risks, new_code),
+        }
         
-        return ReviewResult(
+        with ThreadPoolExecutor(max_workers=len(stages) if parallel else 1) as pool:
+            futures = {
+                stage: pool.submit(self._timed, timings, stage, fn, arg)
+                for stage, (fn, arg) in stages.items()
+            }
+            
+            # Synthesis needs everything but the quality score, which may still be running
+            improved_comments = self._timed(
+                timings, "synthesis", self.synthesize_review_comments,
+                futures["codebert"].result(),
+                futures["comments"].result(),
+                futures["refinements"].result(),
+                futures["security"].result()
+            )
+            quality_score = futures["quality"].result()
+        
+        timings["total"] = time.perf_counter() - started
+        
+        result = ReviewResult(
             quality_score=quality_score,
-            codebert_scores=codebert_scores,
+            codebert_scores=futures["codebert"].result(),
             suggested_comments=improved_comments,
-            suggested_refinements=refinements, 
-            security_risks=security_risks,
-            diff_analysis=diff_analysis
+            suggested_refinements=futures["refinements"].result(), 
+            security_risks=futures["security"].result(),
+            diff_analysis=diff_analysis,
+            timings=timings
         )
+        if self.cache is not None:
+            self.cache.put_review(self._review_key(old_code, new_code), asdict(result))
+        return result
+
+    def review_files(self, files: Dict[str, Tuple[str, str]], parallel: bool = True,
+                     max_workers: int = 4) -> Dict[str, ReviewResult]:
+        """Review several (old_code, new_code) pairs, keyed by path
+
+        Cached files are answered first, CodeBERT scores the rest in one
+        batched pass, and up to max_workers files are reviewed at once. All
+        model calls still share this reviewer's rate limit.
+        """
+        results: Dict[str, ReviewResult] = {}
+        for path, (old_code, new_code) in files.items():
+            cached = self._cached_review(old_code, new_code)
+            if cached is not None:
+                results[path] = cached
+        pending = {path: pair for path, pair in files.items() if path not in results}
+        if not pending:
+            return results
+        
+        started = time.perf_counter()
+        scores = self.analyze_codebert_files({path: new_code for path, (_, new_code) in pending.items()})
+        codebert_seconds = time.perf_counter() - started
+        
+        with ThreadPoolExecutor(max_workers=max_workers if parallel else 1) as pool:
+            futures = {
+                path: pool.submit(self.review_code, old_code, new_code, parallel, scores[path])
+                for path, (old_code, new_code) in pending.items()
+            }
+            for path, future in futures.items():
+                results[path] = future.result()
+                # The batch covered every file; report its cost rather than the no-op stage
+                results[path].timings["codebert_batch"] = codebert_seconds
+        return results
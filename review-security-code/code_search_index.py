@@ -1,13 +1,13 @@
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict
 import json
 from datetime import datetime
-import elasticsearch
-from elasticsearch import Elasticsearch
 import csv
+from bulk_indexer import BulkIndexer
+from local_search import DEFAULT_SEARCH_URL, connect
 
 class CodeSearchIndex:
-    def __init__(self, es_host: str = "http://localhost:9201"):
-        self.es = Elasticsearch([es_host])
+    def __init__(self, es_host: str = DEFAULT_SEARCH_URL):
+        self.es = connect(es_host)
         self.index_name = "security_code_samples"
         
     def create_index(self):
@@ -32,15 +32,13 @@ class CodeSearchIndex:
             }
             self.es.indices.create(index=self.index_name, body=mapping)
     
-    def index_samples(self, samples: List[Dict]):
-        for sample in samples:
-            # Check if the document already exists
-            if not self.es.exists(index=self.index_name, id=sample['id']):
-                self.es.index(
-                    index=self.index_name,
-                    id=sample['id'],
-                    body=sample
-                )
+    def index_samples(self, samples: Iterable[Dict], workers: int = 4, chunk_size: int = 1000) -> Dict:
+        """Bulk-index samples, skipping ids that already exist; returns load statistics"""
+        indexer = BulkIndexer(self.es, self.index_name, chunk_size=chunk_size, workers=workers)
+        with indexer.bulk_load_settings():
+            # op_type=create rejects existing ids with 409 instead of an exists() call per sample
+            return indexer.index(samples, op_type='create')
+
     def search_code_samples(self, query: str, filters: Dict = None) -> List[Dict]:
         search_body = {
             "query": {
@@ -71,14 +69,13 @@ class CodeSearchIndex:
         
         return [hit["_source"] for hit in results["hits"]["hits"]]
 
-def main():
-    data_csv_file = 'vulnerability_dataset.csv'
-    # Load generated samples
-    samples = []
+def read_samples(data_csv_file: str) -> Iterator[Dict]:
+    """Stream samples from the vulnerability CSV without holding it in memory"""
+    generated_at = datetime.now().isoformat()
     with open(data_csv_file, 'r') as f:
         reader = csv.DictReader(f)
         for row in reader:
-            sample = {
+            yield {
                 "id": row["id"],
                 "description": row["description"],
                 "generated_code": "",  # Assuming generated code is not in the CSV
@@ -88,14 +85,18 @@ def main():
                     "date_published": row["date_published"],
                     "tags": row["tags"].split(';') if row["tags"] else []
                 },
-                "generated_at": datetime.now().isoformat()
+                "generated_at": generated_at
             }
-            samples.append(sample)
+
+def main():
+    data_csv_file = 'vulnerability_dataset.csv'
     
     # Index samples
     searcher = CodeSearchIndex()
     searcher.create_index()
-    searcher.index_samples(samples)
+    stats = searcher.index_samples(read_samples(data_csv_file))
+    print(f"Indexed {stats['created']} new samples ({stats['skipped']} already present, "
+          f"{stats['failed']} failed) at {stats['docs_per_second']:,.0f} docs/s")
     
     # Example search
     results = searcher.search_code_samples(
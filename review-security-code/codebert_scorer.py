@@ -0,0 +1,86 @@
+import torch
+from typing import Dict, List, Optional, Tuple
+
+LABELS = ["Needs Improvement", "Good"]
+
+
+class CodeBERTScorer:
+    """
+    Batched CodeBERT scoring of whole files.
+
+    Every file is tokenized once and cut into overlapping windows that fit
+    the model, so code past the first 512 tokens is scored too. Windows of
+    all files are sorted by length and packed into batches padded only to
+    their longest member, and one pass of the model covers every file of a
+    change. Window probabilities are averaged per file, weighted by the
+    number of tokens in each window.
+    """
+
+    def __init__(self, tokenizer, model, max_length: int = 512, overlap: int = 128,
+                 batch_size: int = 16, num_threads: Optional[int] = None):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.window = max_length - 2  # room for <s> and </s>
+        self.step = self.window - overlap
+        self.batch_size = batch_size
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+    def _windows(self, ids: List[int]) -> List[Tuple[int, int]]:
+        """(start, end) token spans covering ids, consecutive spans overlapping"""
+        if len(ids) <= self.window:
+            return [(0, len(ids))]
+        spans = [(start, start + self.window) for start in range(0, len(ids) - self.window + 1, self.step)]
+        if spans[-1][1] < len(ids):
+            spans.append((len(ids) - self.window, len(ids)))
+        return spans
+
+    def _batches(self, windows: List[List[int]]):
+        """Yield (indexes, input_ids, attention_mask), grouping windows of similar length"""
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+        pad_id = self.tokenizer.pad_token_id
+        for start in range(0, len(order), self.batch_size):
+            indexes = order[start:start + self.batch_size]
+            width = max(len(windows[i]) for i in indexes)
+            input_ids = torch.full((len(indexes), width), pad_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(indexes), width), dtype=torch.long)
+            for row, i in enumerate(indexes):
+                input_ids[row, :len(windows[i])] = torch.tensor(windows[i], dtype=torch.long)
+                attention_mask[row, :len(windows[i])] = 1
+            yield indexes, input_ids, attention_mask
+
+    def score_files(self, files: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+        """Score every file in one batched pass, returns per-file label scores"""
+        names = list(files)
+        if not names:
+            return {}
+        # add_special_tokens=False: the windows get their own <s> ... </s>
+        encoded = self.tokenizer([files[name] for name in names], add_special_tokens=False,
+                                 return_attention_mask=False, verbose=False)["input_ids"]
+
+        windows, owners, weights = [], [], []
+        for file_index, ids in enumerate(encoded):
+            for start, end in self._windows(ids):
+                windows.append([self.tokenizer.cls_token_id] + ids[start:end] + [self.tokenizer.sep_token_id])
+                owners.append(file_index)
+                weights.append(max(end - start, 1))
+
+        probabilities = torch.empty((len(windows), len(LABELS)))
+        with torch.inference_mode():
+            for indexes, input_ids, attention_mask in self._batches(windows):
+                logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+                probabilities[indexes] = torch.softmax(logits.float(), dim=-1)
+
+        owners = torch.tensor(owners)
+        weights = torch.tensor(weights, dtype=torch.float32)
+        results = {}
+        for file_index, name in enumerate(names):
+            mask = owners == file_index
+            file_weights = weights[mask] / weights[mask].sum()
+            mean = (probabilities[mask] * file_weights[:, None]).sum(dim=0)
+            analysis = {label: float(mean[i]) for i, label in enumerate(LABELS)}
+            analysis["Risk Level"] = 1 - analysis["Good"]
+            # A file-wide mean can hide one bad region; keep the worst window too
+            analysis["Peak Risk"] = float(1 - probabilities[mask][:, LABELS.index("Good")].min())
+            results[name] = analysis
+        return results
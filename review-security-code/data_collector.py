@@ -1,6 +1,8 @@
+import argparse
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import logging
 import os
 from typing import Dict, List, Optional
@@ -10,13 +12,41 @@ import time
 import zipfile
 from io import BytesIO
 import xml.etree.ElementTree as ET
+from nvd_store import NvdStore
+from rate_limit import TokenBucket, retry
+
+NVD_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+NVD_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.000"
+NVD_PAGE_SIZE = 2000  # Largest resultsPerPage the API accepts
+NVD_MAX_RANGE_DAYS = 120  # Longest lastMod date range the API accepts
+# Requests allowed per rolling 30 seconds, with and without an API key
+NVD_REQUESTS_PER_30S = {True: 50, False: 5}
+NVD_WATERMARK = 'nvd_last_mod_end'
+# Re-read this much before the watermark: NVD can index a change late with an
+# earlier lastModified, and upserts make the overlap free of duplicates
+NVD_SYNC_OVERLAP = timedelta(days=1)
+DEFAULT_NVD_STORE = os.path.join(os.path.dirname(__file__), '..', 'data', 'nvd.sqlite3')
+
+
+class NvdRateLimited(Exception):
+    """NVD answered 403, which it uses for exceeded rate limits as well as bad keys"""
+
+
+class NvdUnavailable(Exception):
+    """NVD answered 429 or a 5xx status"""
+
 
 class VulnerabilityDataCollector:
-    def __init__(self):
+    def __init__(self, nvd_store_path: str = DEFAULT_NVD_STORE, nvd_workers: int = 4):
         self.nvd_api_key = os.getenv('NVD_API_KEY')
         self.feedly_api_key = os.getenv('FEEDLY_API_KEY')
         self.session = self._create_session()
         self.logging_setup()
+        self.nvd_store = NvdStore(nvd_store_path)
+        self.nvd_workers = nvd_workers
+        # Capacity 1 spaces requests evenly, so no 30 second window ever exceeds the limit
+        limit = NVD_REQUESTS_PER_30S[bool(self.nvd_api_key)]
+        self.nvd_bucket = TokenBucket(rate=limit / 30, capacity=1)
 
     def _create_session(self):
         session = requests.Session()
@@ -38,47 +68,94 @@ class VulnerabilityDataCollector:
 
     def validate_date(self, days_back: int) -> str:
         """Validate and return proper date format for NVD API"""
-        today = datetime.now()
+        # NVD reads timestamps without an offset as UTC
+        today = datetime.now(timezone.utc)
         if days_back > 365:  # NVD typically limits historical data
             days_back = 365
         start_date = (today - timedelta(days=days_back))
-        return start_date.strftime("%Y-%m-%dT%H:%M:%S.000")
+        return start_date.strftime(NVD_DATE_FORMAT)
 
-    def collect_nvd_data(self, days_back: int = 30) -> List[Dict]:
-        """Collect vulnerability data from NVD with proper date handling"""
-        start_date = self.validate_date(days_back)
-        base_url = "https://services.nvd.nist.gov/rest/json/cves/2.0"
-        
-        params = {
-            "pubStartDate": start_date,
-            "resultsPerPage": 2000
-        }
-        
+    def _fetch_nvd_page(self, params: Dict, start_index: int) -> Dict:
+        """One rate-limited page of NVD results, retried on rate limiting and connection errors"""
         headers = {
             "apiKey": self.nvd_api_key
         } if self.nvd_api_key else {}
 
-        try:
-            # Add rate limiting
-            time.sleep(6)  # NVD rate limit is 5 requests per 30 seconds
+        def call():
+            self.nvd_bucket.acquire()
             response = self.session.get(
-                base_url,
-                params=params,
+                NVD_URL,
+                params=dict(params, startIndex=start_index, resultsPerPage=NVD_PAGE_SIZE),
                 headers=headers,
-                timeout=30
+                timeout=60
             )
-            
             if response.status_code == 403:
-                logging.error("NVD API key invalid or rate limit exceeded")
-                return []
-            
+                raise NvdRateLimited(f"NVD API key invalid or rate limit exceeded at startIndex {start_index}")
+            if response.status_code == 429 or response.status_code >= 500:
+                raise NvdUnavailable(f"NVD answered {response.status_code} at startIndex {start_index}")
             response.raise_for_status()
-            data = response.json()
-            return data.get('vulnerabilities', [])
-            
-        except requests.exceptions.RequestException as e:
+            return response.json()
+
+        # RetryError: the session's own retries on 429/5xx ran out
+        return retry(call, attempts=5, base_delay=6.0, max_delay=60.0,
+                     retry_on=(NvdRateLimited, NvdUnavailable, requests.exceptions.RetryError,
+                               requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    def _sync_nvd_window(self, start: datetime, end: datetime) -> int:
+        """Upsert every CVE modified in [start, end]; returns how many records were fetched"""
+        params = {
+            "lastModStartDate": start.strftime(NVD_DATE_FORMAT),
+            "lastModEndDate": end.strftime(NVD_DATE_FORMAT)
+        }
+        first = self._fetch_nvd_page(params, 0)
+        total = first.get('totalResults', 0)
+        fetched = self.nvd_store.upsert(first.get('vulnerabilities', []))
+
+        # The end date is fixed, so records modified mid-sync fall outside this
+        # window instead of shifting pages; the next sync picks them up
+        with ThreadPoolExecutor(max_workers=self.nvd_workers) as pool:
+            pages = pool.map(lambda index: self._fetch_nvd_page(params, index),
+                             range(NVD_PAGE_SIZE, total, NVD_PAGE_SIZE))
+            for page in pages:
+                fetched += self.nvd_store.upsert(page.get('vulnerabilities', []))
+
+        logging.info(f"NVD {params['lastModStartDate']} .. {params['lastModEndDate']}: "
+                     f"{fetched}/{total} records")
+        return fetched
+
+    def sync_nvd(self, days_back: int = 30) -> int:
+        """
+        Fetch CVEs modified since the last sync into the local store.
+
+        The first sync covers the last days_back days; later ones start
+        NVD_SYNC_OVERLAP before the watermark. The watermark moves forward
+        after each completed date window, so an interrupted sync resumes
+        from the last window it finished.
+        """
+        watermark = self.nvd_store.get_state(NVD_WATERMARK)
+        if watermark:
+            start = datetime.strptime(watermark, NVD_DATE_FORMAT) - NVD_SYNC_OVERLAP
+        else:
+            start = datetime.strptime(self.validate_date(days_back), NVD_DATE_FORMAT)
+        end = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        fetched = 0
+        while start < end:
+            window_end = min(start + timedelta(days=NVD_MAX_RANGE_DAYS), end)
+            fetched += self._sync_nvd_window(start, window_end)
+            self.nvd_store.set_state(NVD_WATERMARK, window_end.strftime(NVD_DATE_FORMAT))
+            start = window_end
+        logging.info(f"NVD sync fetched {fetched} records, store holds {len(self.nvd_store)} CVEs")
+        return fetched
+
+    def collect_nvd_data(self, days_back: int = 30) -> List[Dict]:
+        """Sync NVD changes, then return stored CVEs published in the last days_back days"""
+        try:
+            self.sync_nvd(days_back)
+        except (requests.exceptions.RequestException, NvdRateLimited, NvdUnavailable) as e:
+            # The store still holds everything earlier syncs fetched
             logging.error(f"Error collecting NVD data: {str(e)}")
-            return []
+        return self.nvd_store.vulnerabilities(published_since=self.validate_date(days_back))
 
     def collect_exploitdb_data(self) -> List[Dict]:
         """Collect exploit data from Exploit-DB with updated URL"""
@@ -264,7 +341,16 @@ class VulnerabilityDataCollector:
             logging.error(f"Error saving data: {e}")
 
 def main():
-    collector = VulnerabilityDataCollector()
+    parser = argparse.ArgumentParser(description='Collect vulnerability data')
+    parser.add_argument('--nvd-only', action='store_true', help='Only sync NVD changes into the local store')
+    parser.add_argument('--days-back', type=int, default=30, help='Window of the first NVD sync')
+    parser.add_argument('--nvd-store', default=DEFAULT_NVD_STORE, help='SQLite file of synced NVD records')
+    args = parser.parse_args()
+
+    collector = VulnerabilityDataCollector(args.nvd_store)
+    if args.nvd_only:
+        collector.sync_nvd(args.days_back)
+        return
     df = collector.merge_data()
     collector.save_data(df)
 
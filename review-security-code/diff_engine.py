@@ -0,0 +1,246 @@
+import os
+import re
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from code_chunks import python_scopes
+
+# git's id for the empty tree, the "parent" of a root commit
+EMPTY_TREE = '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+HUNK_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$')
+
+# Lines of surrounding code kept when no enclosing function is found
+CONTEXT_LINES = 10
+# Enclosing functions longer than this fall back to the line window
+MAX_SCOPE_LINES = 200
+EXCERPT_SEPARATOR = '\n...\n'
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_lines: int
+    new_start: int
+    new_lines: int
+    header: str  # git's function-name guess from the @@ line
+
+    @property
+    def old_begin(self) -> int:
+        # With zero lines git reports the line *before* the hunk
+        return self.old_start if self.old_lines else self.old_start + 1
+
+    @property
+    def new_begin(self) -> int:
+        return self.new_start if self.new_lines else self.new_start + 1
+
+
+@dataclass
+class FileChange:
+    path: str
+    old_path: Optional[str] = None
+    hunks: List[Hunk] = field(default_factory=list)
+    old_code: str = ''
+    new_code: str = ''
+    deleted: bool = False
+    binary: bool = False
+
+    @property
+    def lines_added(self) -> int:
+        return sum(h.new_lines for h in self.hunks)
+
+    @property
+    def lines_removed(self) -> int:
+        return sum(h.old_lines for h in self.hunks)
+
+    @property
+    def reviewable(self) -> bool:
+        return bool(self.hunks) and not self.deleted and not self.binary
+
+
+def _git(repo_path: str, *args: str) -> str:
+    result = subprocess.run(['git', '-c', 'core.quotepath=off', *args], cwd=repo_path,
+                            check=True, capture_output=True)
+    return result.stdout.decode('utf-8', errors='replace')
+
+
+def resolve_revisions(repo_path: str, commit: Optional[str] = None,
+                      rev_range: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """(old, new) revisions to compare; new is None for the working tree"""
+    if rev_range:
+        old, _, new = rev_range.partition('..')
+        return old or 'HEAD', new or 'HEAD'
+    if commit:
+        try:
+            return _git(repo_path, 'rev-parse', '--verify', '--quiet', f'{commit}^').strip(), commit
+        except subprocess.CalledProcessError:
+            return EMPTY_TREE, commit
+    return 'HEAD', None
+
+
+def parse_diff(text: str) -> List[FileChange]:
+    """Files and hunk ranges of `git diff -U0` output"""
+    changes: List[FileChange] = []
+    current: Optional[FileChange] = None
+    for line in text.splitlines():
+        if line.startswith('diff --git '):
+            current = FileChange(path=line.split(' b/', 1)[-1])
+            changes.append(current)
+        elif current is None:
+            continue
+        elif line.startswith('rename from '):
+            current.old_path = line[len('rename from '):]
+        elif line.startswith('rename to '):
+            current.path = line[len('rename to '):]
+        elif line.startswith('--- '):
+            current.old_path = None if line[4:] == '/dev/null' else line[4:].split('a/', 1)[-1]
+        elif line.startswith('+++ '):
+            if line[4:] == '/dev/null':
+                current.deleted = True
+            else:
+                current.path = line[4:].split('b/', 1)[-1]
+        elif line.startswith('Binary files '):
+            current.binary = True
+        else:
+            match = HUNK_RE.match(line)
+            if match:
+                old_start, old_lines, new_start, new_lines, header = match.groups()
+                current.hunks.append(Hunk(
+                    int(old_start), 1 if old_lines is None else int(old_lines),
+                    int(new_start), 1 if new_lines is None else int(new_lines),
+                    header.strip()
+                ))
+    return changes
+
+
+def collect_changes(repo_path: str, commit: Optional[str] = None,
+                    rev_range: Optional[str] = None) -> List[FileChange]:
+    """Every changed file between two revisions, or between HEAD and the working tree"""
+    old_rev, new_rev = resolve_revisions(repo_path, commit, rev_range)
+    revisions = [old_rev] + ([new_rev] if new_rev else [])
+    changes = parse_diff(_git(repo_path, 'diff', '--no-color', '--no-ext-diff', '-M', '-U0', *revisions))
+
+    for change in changes:
+        if not change.reviewable:
+            continue
+        if change.old_path:
+            change.old_code = _git(repo_path, 'show', f'{old_rev}:{change.old_path}')
+        if new_rev:
+            change.new_code = _git(repo_path, 'show', f'{new_rev}:{change.path}')
+        else:
+            with open(os.path.join(repo_path, change.path), 'r', encoding='utf-8', errors='replace') as f:
+                change.new_code = f.read()
+    return changes
+
+
+def _enclosing(spans: List[Tuple[int, int]], start: int, end: int) -> Optional[Tuple[int, int]]:
+    """Innermost scope covering [start, end] that is short enough to send whole"""
+    covering = [(a, b) for a, b in spans if a <= start and end <= b and b - a < MAX_SCOPE_LINES]
+    return min(covering, key=lambda span: span[1] - span[0]) if covering else None
+
+
+def _merge(regions: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(regions):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def new_regions(change: FileChange) -> List[Tuple[int, int]]:
+    """1-based line ranges of the new file to review: each hunk widened to its enclosing function"""
+    total = len(change.new_code.splitlines())
+    spans = python_scopes(change.new_code) if change.path.endswith('.py') else []
+    regions = []
+    for hunk in change.hunks:
+        start = min(max(hunk.new_begin, 1), max(total, 1))
+        end = max(start, hunk.new_begin + hunk.new_lines - 1)
+        scope = _enclosing(spans, start, end)
+        regions.append(scope or (max(1, start - CONTEXT_LINES), min(total, end + CONTEXT_LINES)))
+    return _merge(regions)
+
+
+def _to_old_line(hunks: List[Hunk], line: int, is_end: bool) -> int:
+    """Map a new-file line to the old file; lines inside a hunk map to the hunk's old edge"""
+    offset = 0
+    for hunk in hunks:
+        if hunk.new_begin <= line < hunk.new_begin + hunk.new_lines:
+            return hunk.old_begin + hunk.old_lines - 1 if is_end else hunk.old_begin
+        if line == hunk.new_begin and not hunk.new_lines and not is_end:
+            # A region starting right after a pure deletion includes the deleted lines
+            return hunk.old_begin
+        if line < hunk.new_begin:
+            break
+        offset = (hunk.old_begin + hunk.old_lines) - (hunk.new_begin + hunk.new_lines)
+    return line + offset
+
+
+def hunk_excerpts(change: FileChange) -> Tuple[str, str]:
+    """Old and new text of only the changed regions, so prompts scale with the change"""
+    old_lines = change.old_code.splitlines(keepends=True)
+    new_lines = change.new_code.splitlines(keepends=True)
+    old_parts, new_parts = [], []
+    for start, end in new_regions(change):
+        old_start = _to_old_line(change.hunks, start, is_end=False)
+        old_end = _to_old_line(change.hunks, end, is_end=True)
+        old_parts.append(''.join(old_lines[old_start - 1:old_end]))
+        new_parts.append(''.join(new_lines[start - 1:end]))
+    return EXCERPT_SEPARATOR.join(old_parts), EXCERPT_SEPARATOR.join(new_parts)
+
+
+def excerpt_line_map(change: FileChange) -> List[int]:
+    """New-file line number of each line of the new excerpt from hunk_excerpts, 0 on separator lines"""
+    new_lines = change.new_code.splitlines(keepends=True)
+    parts = [(start, new_lines[start - 1:end]) for start, end in new_regions(change)]
+    joined = EXCERPT_SEPARATOR.join(''.join(lines) for _, lines in parts)
+    mapping = [0] * (joined.count('\n') + 1)
+    base = 0
+    for i, (start, lines) in enumerate(parts):
+        if i:
+            # The separator closes the previous line (or adds an empty one) and then "..."
+            base += EXCERPT_SEPARATOR.count('\n')
+        for offset in range(len(lines)):
+            mapping[base + offset] = start + offset
+        base += sum(line.endswith('\n') for line in lines)
+    return mapping
+
+
+def to_file_lines(results: Dict[str, Dict], changes: List[FileChange]):
+    """Rewrite security risk locations, reported against the excerpts, as new-file line numbers"""
+    by_path = {change.path: change for change in changes}
+    for path, result in results.items():
+        mapping = excerpt_line_map(by_path[path])
+        for risk in result['security_risks']:
+            for location in risk.get('locations', []):
+                lines = mapping[location['start_line'] - 1:location['end_line']]
+                # A chunk may begin or end on a separator; keep the file lines it covers
+                covered = [line for line in lines if line]
+                if covered:
+                    location['start_line'], location['end_line'] = covered[0], covered[-1]
+
+
+def merge_report(results: Dict[str, Dict], changes: List[FileChange]) -> Dict:
+    """Combine per-file review results into one report for the whole change"""
+    by_path = {change.path: change for change in changes}
+    weights = {path: max(by_path[path].lines_added + by_path[path].lines_removed, 1) for path in results}
+    total_weight = sum(weights.values()) or 1
+
+    risks: Dict[object, Dict] = {}
+    for path, result in results.items():
+        for risk in result['security_risks']:
+            key = risk.get('sample_id') or (risk['risk_type'], risk['description'])
+            if key not in risks or risk['similarity_score'] > risks[key]['similarity_score']:
+                risks[key] = dict(risk, path=path)
+
+    return {
+        'files': results,
+        # Larger changes weigh more in the overall score
+        'quality_score': sum(r['quality_score'] * weights[p] for p, r in results.items()) / total_weight,
+        'risk_level': max((r['codebert_scores'].get('Risk Level', 0.0) for r in results.values()), default=0.0),
+        'security_risks': sorted(risks.values(), key=lambda r: r['similarity_score'], reverse=True),
+        'lines_added': sum(c.lines_added for c in changes),
+        'lines_removed': sum(c.lines_removed for c in changes),
+        'skipped': [c.path for c in changes if not c.reviewable],
+    }
@@ -0,0 +1,566 @@
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Set to local:<directory> to use the embedded index instead of Elasticsearch
+DEFAULT_SEARCH_URL = os.environ.get('SECURITY_SEARCH_URL', 'http://localhost:9201')
+
+WORD_RE = re.compile(r'\w+')
+CAMEL_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_tokens(word: str) -> Tuple[str, ...]:
+    tokens = [word.lower()] if len(word) > 1 else []
+    parts = [part.lower() for piece in word.split('_') for part in CAMEL_RE.findall(piece)]
+    if len(parts) > 1:
+        tokens.extend(part for part in parts if len(part) > 1)
+    return tuple(tokens)
+
+
+def tokenize(text) -> List[str]:
+    """
+    Code-aware tokens: every identifier lowercased, plus its snake_case and
+    camelCase parts, so `execSQLQuery` also matches `sql` and `query`.
+    """
+    if isinstance(text, (list, tuple)):
+        text = ' '.join(map(str, text))
+    elif not isinstance(text, str):
+        text = '' if text is None else str(text)
+    tokens = []
+    for word in WORD_RE.findall(text):
+        # Identifiers repeat heavily in code, so splitting is cached per word
+        tokens.extend(_word_tokens(word))
+    return tokens
+
+
+def _get_path(doc: Dict, path: str):
+    value = doc
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def encode_varints(values: np.ndarray) -> np.ndarray:
+    """LEB128 encoding of non-negative integers, vectorized"""
+    values = values.astype(np.uint64)
+    nbytes = np.maximum(1, (np.floor(np.log2(np.maximum(values, 1))).astype(np.int64) // 7) + 1)
+    nbytes[values == 0] = 1
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.zeros(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max(initial=1))):
+        has = nbytes > k
+        byte = (values[has] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[has] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[has] + k] = (byte | more).astype(np.uint8)
+    return out
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    data = np.asarray(data, dtype=np.uint8)
+    ends = data < 0x80
+    if ends.all():
+        # Every value fits one byte, as in postings of common terms
+        return data.astype(np.int64)
+    group = np.concatenate([[0], np.cumsum(ends)[:-1]])
+    group_starts = np.flatnonzero(np.concatenate([[True], ends[:-1]]))
+    shift = (np.arange(len(data)) - group_starts[group]) * 7
+    # float64 weights are exact for doc-id deltas far beyond any index size here
+    return np.bincount(group, weights=(data & 0x7F).astype(np.float64) * np.exp2(shift),
+                       minlength=len(group_starts)).astype(np.int64)
+
+
+class BM25Index:
+    """
+    Immutable BM25 index over JSON documents.
+
+    Each text field has its own vocabulary and postings: doc ids are
+    delta-encoded as varints in one byte file, term frequencies sit in a
+    parallel uint16 file, and both are memory-mapped on load so a query
+    only touches the postings of its terms. Keyword fields keep exact-value
+    doc lists for term filters. Multi-field queries score each field and
+    take the best, like Elasticsearch's best_fields multi_match.
+    """
+
+    TEXT_FIELDS = ('description', 'generated_code', 'metadata.tags')
+    KEYWORD_FIELDS = ('metadata.type', 'metadata.platform', 'metadata.tags')
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.id_to_doc: Dict[str, int] = {}
+        self.sources: List[Dict] = []
+        self.fields: Dict[str, Dict] = {}
+        self.keywords: Dict[str, Dict[str, np.ndarray]] = {}
+        # Identity of the index and writes folded into it, reported by indices.stats
+        self.uuid = uuid.uuid4().hex
+        self.writes = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, Dict]], **kwargs) -> 'BM25Index':
+        index = cls(**kwargs)
+        token_counts = {field: [] for field in cls.TEXT_FIELDS}
+        keywords = {field: {} for field in cls.KEYWORD_FIELDS}
+        for doc_id, source in docs:
+            doc = len(index.ids)
+            index.ids.append(doc_id)
+            index.sources.append(source)
+            for field in cls.TEXT_FIELDS:
+                token_counts[field].append(Counter(tokenize(_get_path(source, field))))
+            for field in cls.KEYWORD_FIELDS:
+                value = _get_path(source, field)
+                for item in value if isinstance(value, list) else [value]:
+                    if item is not None:
+                        keywords[field].setdefault(str(item), []).append(doc)
+        index.id_to_doc = {doc_id: doc for doc, doc_id in enumerate(index.ids)}
+        index.keywords = {field: {value: np.asarray(docs, dtype=np.int64) for value, docs in values.items()}
+                          for field, values in keywords.items()}
+        for field, counts in token_counts.items():
+            index.fields[field] = cls._build_field(counts)
+        return index
+
+    @staticmethod
+    def _build_field(counts: List[Counter]) -> Dict:
+        vocab_ids: Dict[str, int] = {}
+        term_ids, doc_ids, tfs = [], [], []
+        for doc, counter in enumerate(counts):
+            for term, tf in counter.items():
+                term_ids.append(vocab_ids.setdefault(term, len(vocab_ids)))
+                doc_ids.append(doc)
+                tfs.append(min(tf, 65535))
+        lengths = np.asarray([sum(c.values()) for c in counts], dtype=np.float32)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids, doc_ids = term_ids[order], doc_ids[order]
+        tfs = np.asarray(tfs, dtype=np.uint16)[order]
+
+        first = np.ones(len(term_ids), dtype=bool)
+        first[1:] = term_ids[1:] != term_ids[:-1]
+        deltas = doc_ids.copy()
+        deltas[~first] = doc_ids[~first] - doc_ids[np.flatnonzero(~first) - 1]
+        postings = encode_varints(deltas)
+
+        # Byte and posting offsets of each term's run
+        varint_sizes = np.maximum(1, (np.floor(np.log2(np.maximum(deltas, 1))).astype(np.int64) // 7) + 1)
+        byte_offsets = np.concatenate([[0], np.cumsum(varint_sizes)])
+        starts = np.flatnonzero(first)
+        ends = np.concatenate([starts[1:], [len(term_ids)]])
+        terms = {term_id: term for term, term_id in vocab_ids.items()}
+        vocab = {
+            terms[int(term_ids[s])]: (int(byte_offsets[s]), int(byte_offsets[e]), int(s), int(e - s))
+            for s, e in zip(starts, ends)
+        }
+        return {
+            'vocab': vocab,
+            'postings': postings,
+            'tfs': tfs,
+            'lengths': lengths,
+            'avgdl': float(lengths.mean()) if len(lengths) else 0.0,
+        }
+
+    def save(self, directory: str):
+        """Write to a sibling directory, then swap it in"""
+        tmp_dir = directory.rstrip('/') + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        with open(os.path.join(tmp_dir, 'docs.jsonl'), 'w', encoding='utf-8') as f:
+            for doc_id, source in zip(self.ids, self.sources):
+                f.write(json.dumps({'_id': doc_id, '_source': source}, ensure_ascii=False) + '\n')
+        for field, data in self.fields.items():
+            data['postings'].tofile(os.path.join(tmp_dir, f'{field}.postings'))
+            np.asarray(data['tfs'], dtype=np.uint16).tofile(os.path.join(tmp_dir, f'{field}.tfs'))
+            np.save(os.path.join(tmp_dir, f'{field}.lengths.npy'), data['lengths'])
+            with open(os.path.join(tmp_dir, f'{field}.vocab.json'), 'w', encoding='utf-8') as f:
+                json.dump(data['vocab'], f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, 'keywords.json'), 'w', encoding='utf-8') as f:
+            json.dump({field: {value: docs.tolist() for value, docs in values.items()}
+                       for field, values in self.keywords.items()}, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({'k1': self.k1, 'b': self.b, 'docs': len(self.ids), 'uuid': self.uuid, 'writes': self.writes,
+                       'avgdl': {field: data['avgdl'] for field, data in self.fields.items()}}, f)
+
+        old_dir = directory.rstrip('/') + '.old'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str) -> 'BM25Index':
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        index = cls(k1=meta['k1'], b=meta['b'])
+        index.uuid = meta.get('uuid', index.uuid)
+        index.writes = meta.get('writes', 0)
+        with open(os.path.join(directory, 'docs.jsonl'), 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                index.ids.append(record['_id'])
+                index.sources.append(record['_source'])
+        index.id_to_doc = {doc_id: doc for doc, doc_id in enumerate(index.ids)}
+        for field in cls.TEXT_FIELDS:
+            with open(os.path.join(directory, f'{field}.vocab.json'), 'r', encoding='utf-8') as f:
+                vocab = {term: tuple(entry) for term, entry in json.load(f).items()}
+            postings_path = os.path.join(directory, f'{field}.postings')
+            tfs_path = os.path.join(directory, f'{field}.tfs')
+            index.fields[field] = {
+                'vocab': vocab,
+                # np.memmap cannot map empty files
+                'postings': np.memmap(postings_path, dtype=np.uint8, mode='r')
+                if os.path.getsize(postings_path) else np.zeros(0, dtype=np.uint8),
+                'tfs': np.memmap(tfs_path, dtype=np.uint16, mode='r')
+                if os.path.getsize(tfs_path) else np.zeros(0, dtype=np.uint16),
+                'lengths': np.load(os.path.join(directory, f'{field}.lengths.npy')),
+                'avgdl': meta['avgdl'][field],
+            }
+        with open(os.path.join(directory, 'keywords.json'), 'r', encoding='utf-8') as f:
+            index.keywords = {field: {value: np.asarray(docs, dtype=np.int64) for value, docs in values.items()}
+                              for field, values in json.load(f).items()}
+        return index
+
+    def score_field(self, field: str, tokens: List[str]) -> np.ndarray:
+        data = self.fields[field]
+        n = len(self.ids)
+        entries = [data['vocab'][term] for term in set(tokens) if term in data['vocab']]
+        if not entries or not data['avgdl']:
+            return np.zeros(n, dtype=np.float32)
+
+        # Decode every query term's postings in one pass, then restart the
+        # delta sums at each term boundary
+        postings, tfs = data['postings'], data['tfs']
+        deltas = decode_varints(np.concatenate([postings[start:end] for start, end, _, _ in entries]))
+        dfs = np.asarray([df for _, _, _, df in entries], dtype=np.int64)
+        firsts = np.cumsum(dfs) - dfs
+        sums = np.cumsum(deltas)
+        docs = sums - np.repeat(sums[firsts] - deltas[firsts], dfs)
+        tf = np.concatenate([tfs[start:start + df] for _, _, start, df in entries]).astype(np.float32)
+        idf = np.repeat(np.log1p((n - dfs + 0.5) / (dfs + 0.5)), dfs)
+
+        norm = self.k1 * (1 - self.b + self.b * data['lengths'][docs] / data['avgdl'])
+        contributions = idf * tf * (self.k1 + 1) / (tf + norm)
+        return np.bincount(docs, weights=contributions, minlength=n).astype(np.float32)
+
+    def evaluate(self, query: Dict) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(matching mask, scores or None for unscored) of an Elasticsearch-style query"""
+        n = len(self.ids)
+        (kind, spec), = query.items()
+        if kind == 'match_all':
+            return np.ones(n, dtype=bool), None
+        if kind in ('multi_match', 'match'):
+            if kind == 'match':
+                (field, spec), = spec.items()
+                spec = spec if isinstance(spec, dict) else {'query': spec}
+                fields = [field]
+            else:
+                fields = spec.get('fields') or list(self.TEXT_FIELDS)
+            tokens = tokenize(spec['query'])
+            scores = np.zeros(n, dtype=np.float32)
+            for field in fields:
+                field = field.split('^')[0]
+                if field in self.fields:
+                    np.maximum(scores, self.score_field(field, tokens), out=scores)
+            return scores > 0, scores
+        if kind in ('term', 'terms'):
+            (field, values), = spec.items()
+            if kind == 'term':
+                values = [values['value'] if isinstance(values, dict) else values]
+            field = field[:-len('.keyword')] if field.endswith('.keyword') else field
+            mask = np.zeros(n, dtype=bool)
+            for value in values:
+                if field in ('_id', 'id'):
+                    doc = self.id_to_doc.get(str(value))
+                    if doc is not None:
+                        mask[doc] = True
+                elif field in self.keywords:
+                    mask[self.keywords[field].get(str(value), np.zeros(0, dtype=np.int64))] = True
+                else:
+                    raise ValueError(f"Field is not filterable: {field}")
+            return mask, None
+        if kind == 'bool':
+            mask = np.ones(n, dtype=bool)
+            scores = None
+            for clause in _as_list(spec.get('must')):
+                clause_mask, clause_scores = self.evaluate(clause)
+                mask &= clause_mask
+                if clause_scores is not None:
+                    scores = clause_scores if scores is None else scores + clause_scores
+            for clause in _as_list(spec.get('filter')):
+                mask &= self.evaluate(clause)[0]
+            for clause in _as_list(spec.get('must_not')):
+                mask &= ~self.evaluate(clause)[0]
+            should = _as_list(spec.get('should'))
+            if should:
+                any_should = np.zeros(n, dtype=bool)
+                for clause in should:
+                    clause_mask, clause_scores = self.evaluate(clause)
+                    any_should |= clause_mask
+                    if clause_scores is not None:
+                        scores = clause_scores if scores is None else scores + clause_scores
+                if not spec.get('must') and not spec.get('filter'):
+                    mask &= any_should
+            return mask, scores
+        raise ValueError(f"Unsupported query type: {kind}")
+
+    def search(self, query: Optional[Dict] = None, size: int = 10) -> Dict:
+        """Top hits in the shape of an Elasticsearch search response"""
+        mask, scores = self.evaluate(query or {'match_all': {}})
+        candidates = np.flatnonzero(mask)
+        if scores is None:
+            top = candidates[:size]
+            top_scores = np.ones(len(top), dtype=np.float32)
+        else:
+            candidate_scores = scores[candidates]
+            if len(candidates) > size:
+                keep = np.argpartition(-candidate_scores, size - 1)[:size] if size else np.zeros(0, dtype=np.int64)
+                candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+            order = np.argsort(-candidate_scores, kind='stable')
+            top, top_scores = candidates[order], candidate_scores[order]
+        return {
+            'hits': {
+                'total': {'value': int(mask.sum()), 'relation': 'eq'},
+                'hits': [{'_id': self.ids[doc], '_score': float(score), '_source': self.sources[doc]}
+                         for doc, score in zip(top, top_scores)],
+            }
+        }
+
+
+def _as_list(value) -> List:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class _LocalIndex:
+    """
+    One index: the persisted BM25 segment plus writes not yet refreshed into it.
+
+    Pending writes are appended to a translog inside the index directory
+    before they are acknowledged and replayed on open, so they survive a
+    restart without a rebuild per write. Saving a refreshed segment swaps
+    the whole directory, which drops the translog with it.
+    """
+
+    TRANSLOG = 'translog.jsonl'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.translog_path = os.path.join(directory, self.TRANSLOG)
+        self.segment = BM25Index.load(directory) if os.path.exists(os.path.join(directory, 'meta.json')) \
+            else BM25Index.build([])
+        self.pending: Dict[str, Dict] = {}
+        # Acknowledged writes not yet in the segment, repeats of an id included
+        self.pending_writes = 0
+        self.refresh_interval: Optional[str] = None
+        self.lock = threading.RLock()
+        if os.path.exists(self.translog_path):
+            self._replay()
+
+    def _replay(self):
+        valid_bytes = 0
+        with open(self.translog_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.pending[record['_id']] = record['_source']
+                self.pending_writes += 1
+                valid_bytes += len(line)
+        # Drop a line torn by an interrupted write, it was never acknowledged
+        with open(self.translog_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+
+    def log(self, docs: List[Tuple[str, Dict]]):
+        """Make writes already placed in pending durable"""
+        if not docs:
+            return
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.translog_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps({'_id': doc_id, '_source': source}, ensure_ascii=False) + '\n'
+                                for doc_id, source in docs))
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending_writes += len(docs)
+
+    def stats(self) -> Dict:
+        """Document count and total writes, in the shape of Elasticsearch's index stats"""
+        with self.lock:
+            added = sum(1 for doc_id in self.pending if doc_id not in self.segment.id_to_doc)
+            return {'docs': {'count': len(self.segment) + added},
+                    'indexing': {'index_total': self.segment.writes + self.pending_writes}}
+
+    def searchable(self) -> BM25Index:
+        """The segment to search, refreshing first unless refresh is disabled"""
+        if self.pending and self.refresh_interval != '-1':
+            self.refresh()
+        return self.segment
+
+    def has(self, doc_id: str) -> bool:
+        return doc_id in self.pending or doc_id in self.segment.id_to_doc
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        if doc_id in self.pending:
+            return self.pending[doc_id]
+        doc = self.segment.id_to_doc.get(doc_id)
+        return None if doc is None else self.segment.sources[doc]
+
+    def refresh(self):
+        with self.lock:
+            if not self.pending and os.path.exists(os.path.join(self.directory, 'meta.json')):
+                return
+            pending, self.pending = self.pending, {}
+            writes, self.pending_writes = self.pending_writes, 0
+
+            def documents() -> Iterator[Tuple[str, Dict]]:
+                for doc_id, source in zip(self.segment.ids, self.segment.sources):
+                    if doc_id not in pending:
+                        yield doc_id, source
+                yield from pending.items()
+
+            segment = BM25Index.build(documents(), k1=self.segment.k1, b=self.segment.b)
+            segment.uuid = self.segment.uuid
+            segment.writes = self.segment.writes + writes
+            segment.save(self.directory)
+            self.segment = BM25Index.load(self.directory)
+
+
+class _Indices:
+    def __init__(self, client: 'LocalSearchClient'):
+        self.client = client
+
+    def exists(self, index: str) -> bool:
+        directory = os.path.join(self.client.directory, index)
+        return any(os.path.exists(os.path.join(directory, name)) for name in ('meta.json', _LocalIndex.TRANSLOG))
+
+    def create(self, index: str, body: Optional[Dict] = None):
+        # Mappings are fixed by BM25Index; an empty segment marks the index as existing
+        self.client._index(index).refresh()
+
+    def delete(self, index: str):
+        with self.client._lock:
+            self.client._indexes.pop(index, None)
+        shutil.rmtree(os.path.join(self.client.directory, index), ignore_errors=True)
+
+    def get_settings(self, index: str) -> Dict:
+        interval = self.client._index(index).refresh_interval
+        return {index: {'settings': {'index': {} if interval is None else {'refresh_interval': interval}}}}
+
+    def put_settings(self, index: str, body: Dict):
+        local = self.client._index(index)
+        local.refresh_interval = body.get('index', {}).get('refresh_interval')
+
+    def refresh(self, index: str):
+        self.client._index(index).refresh()
+
+    def stats(self, index: str, metric: Optional[str] = None) -> Dict:
+        local = self.client._index(index)
+        primaries = local.stats()
+        return {'_all': {'primaries': primaries},
+                'indices': {index: {'uuid': local.segment.uuid, 'primaries': primaries}}}
+
+
+class LocalSearchClient:
+    """
+    In-process stand-in for the subset of the Elasticsearch client used by
+    the review tools: indices.*, index, exists, get, bulk, search and
+    msearch. Writes are durable once acknowledged and become searchable on
+    refresh. Refresh happens lazily, on the first search after a write, so
+    a run of writes costs one rebuild; with refresh_interval set to -1, as
+    during a bulk load, only an explicit refresh does it.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.indices = _Indices(self)
+        self._indexes: Dict[str, _LocalIndex] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, name: str) -> _LocalIndex:
+        with self._lock:
+            if name not in self._indexes:
+                self._indexes[name] = _LocalIndex(os.path.join(self.directory, name))
+            return self._indexes[name]
+
+    def index(self, index: str, id, body: Dict, op_type: str = 'index') -> Dict:
+        local = self._index(index)
+        doc_id = str(id)
+        with local.lock:
+            if op_type == 'create' and local.has(doc_id):
+                raise ValueError(f"Document {doc_id} already exists")
+            result = 'updated' if local.has(doc_id) else 'created'
+            local.pending[doc_id] = body
+        local.log([(doc_id, body)])
+        return {'_id': doc_id, 'result': result}
+
+    def exists(self, index: str, id) -> bool:
+        return self._index(index).has(str(id))
+
+    def get(self, index: str, id) -> Dict:
+        source = self._index(index).get(str(id))
+        if source is None:
+            raise KeyError(f"Document {id} not found in {index}")
+        return {'_index': index, '_id': str(id), 'found': True, '_source': source}
+
+    def bulk(self, body, index: Optional[str] = None) -> Dict:
+        lines = body.splitlines() if isinstance(body, str) else body
+        lines = [json.loads(line) if isinstance(line, str) else line for line in lines if line]
+        items = []
+        written: Dict[_LocalIndex, List[Tuple[str, Dict]]] = {}
+        for action_line, source in zip(lines[::2], lines[1::2]):
+            (op_type, action), = action_line.items()
+            local = self._index(action.get('_index', index))
+            doc_id = str(action['_id'])
+            with local.lock:
+                if op_type == 'create' and local.has(doc_id):
+                    items.append({op_type: {'_id': doc_id, 'status': 409,
+                                            'error': {'type': 'version_conflict_engine_exception'}}})
+                    continue
+                status = 200 if local.has(doc_id) else 201
+                local.pending[doc_id] = source
+            items.append({op_type: {'_id': doc_id, 'status': status}})
+            written.setdefault(local, []).append((doc_id, source))
+        for local, docs in written.items():
+            local.log(docs)
+        return {'errors': any(next(iter(i.values()))['status'] >= 300 for i in items), 'items': items}
+
+    def search(self, index: str, body: Optional[Dict] = None, size: Optional[int] = None) -> Dict:
+        body = body or {}
+        return self._index(index).searchable().search(body.get('query'), size=size or body.get('size', 10))
+
+    def msearch(self, body, index: Optional[str] = None) -> Dict:
+        responses = []
+        for header, search_body in zip(body[::2], body[1::2]):
+            try:
+                responses.append(self.search(header.get('index', index), search_body))
+            except ValueError as e:
+                responses.append({'error': {'reason': str(e)}})
+        return {'responses': responses}
+
+
+def connect(url: str = DEFAULT_SEARCH_URL):
+    """Elasticsearch client for http(s) URLs, the embedded index for local:<directory>"""
+    if url.startswith('local:'):
+        return LocalSearchClient(url[len('local:'):])
+    from elasticsearch import Elasticsearch
+    return Elasticsearch([url])
@@ -0,0 +1,75 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+class NvdStore:
+    """
+    Local SQLite copy of NVD CVE records keyed by CVE id, plus sync state.
+
+    Upserts keep whichever version of a record has the later lastModified,
+    so re-fetching an overlapping window or replaying a page is harmless.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS cves ('
+                'id TEXT PRIMARY KEY, published TEXT, last_modified TEXT, data TEXT NOT NULL)'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS cves_published ON cves (published)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)')
+
+    def upsert(self, vulnerabilities: Iterable[Dict]) -> int:
+        """Insert or update NVD `vulnerabilities` entries, returns how many were given"""
+        rows = [
+            (v['cve']['id'], v['cve'].get('published'), v['cve'].get('lastModified'), json.dumps(v))
+            for v in vulnerabilities
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO cves (id, published, last_modified, data) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET published = excluded.published, '
+                'last_modified = excluded.last_modified, data = excluded.data '
+                'WHERE cves.last_modified IS NULL OR excluded.last_modified >= cves.last_modified',
+                rows
+            )
+        return len(rows)
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str):
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO sync_state (key, value) VALUES (?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                (key, value)
+            )
+
+    def vulnerabilities(self, published_since: Optional[str] = None) -> List[Dict]:
+        """Stored records, optionally only those published at or after an NVD timestamp"""
+        query, params = 'SELECT data FROM cves', ()
+        if published_since:
+            query, params = query + ' WHERE published >= ?', (published_since,)
+        with self._lock:
+            rows = self.conn.execute(query + ' ORDER BY id', params).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM cves').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -1,11 +1,11 @@
-from elasticsearch import Elasticsearch
 import argparse
 from typing import Dict, List, Optional
 import json
+from local_search import DEFAULT_SEARCH_URL, connect
 
 class SecurityCodeSearcher:
-    def __init__(self, es_host: str = "http://localhost:9201"):
-        self.es = Elasticsearch([es_host])
+    def __init__(self, es_host: str = DEFAULT_SEARCH_URL):
+        self.es = connect(es_host)
         self.index_name = "security_code_samples"
 
     def get_sample_by_id(self, sample_id: str) -> Optional[Dict]:
@@ -38,9 +38,11 @@ def main():
     parser.add_argument('--id', help='Sample ID for get action')
     parser.add_argument('--tag', help='Tag to search for')
     parser.add_argument('--size', type=int, default=100, help='Number of results for list action')
+    parser.add_argument('--es-url', default=DEFAULT_SEARCH_URL,
+                        help='Elasticsearch URL, or local:<directory> for the embedded index')
     
     args = parser.parse_args()
-    searcher = SecurityCodeSearcher()
+    searcher = SecurityCodeSearcher(args.es_url)
 
     if args.action == 'get' and args.id:
         result = searcher.get_sample_by_id(args.id)
@@ -0,0 +1,47 @@
+import random
+import threading
+import time
+from typing import Callable, Tuple, Type, TypeVar
+
+T = TypeVar('T')
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: on average `rate` acquisitions per second,
+    with bursts of up to `capacity`. Shared by every thread of a process
+    that talks to the same rate-limited API.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then take them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry(fn: Callable[[], T], attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+          retry_on: Tuple[Type[BaseException], ...] = (Exception,)) -> T:
+    """Call fn, retrying on retry_on with jittered exponential backoff"""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except retry_on:
+            if attempt == attempts - 1:
+                raise
+            # Full jitter keeps parallel callers from retrying in lockstep
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+MODES = ('readwrite', 'record', 'replay')
+
+
+class CacheMiss(Exception):
+    """Raised in replay mode when a call has no recorded answer"""
+
+
+def git_blob_sha(text: str) -> str:
+    """The object id git gives this content, so unchanged files match across commits and rebases"""
+    data = text.encode('utf-8')
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def request_hash(request: Dict) -> str:
+    return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """
+    JSON values in one file per key, bounded in total size.
+
+    A read refreshes the file's mtime, so evicting the oldest mtimes first
+    gives least-recently-used eviction without a separate index.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry['size'] for entry in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _entries(self):
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    yield {'path': entry.path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return value
+
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += len(data) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Trim to 90% so eviction does not run again on the very next write
+        target = self.max_bytes * 0.9
+        for entry in sorted(self._entries(), key=lambda e: e['mtime']):
+            if self._size <= target:
+                break
+            try:
+                os.remove(entry['path'])
+            except FileNotFoundError:
+                continue
+            self._size -= entry['size']
+
+
+class ReviewCache:
+    """
+    Content-addressed cache for code reviews.
+
+    Whole review results are keyed by the git blob ids of the old and new
+    file plus the reviewer version; raw model and search responses are
+    keyed by a hash of the full request. In 'readwrite' mode hits are
+    served and misses recorded, 'record' always calls out and overwrites,
+    and 'replay' never touches the network and raises CacheMiss instead.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, mode: str = 'readwrite'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.store = DiskCache(directory, max_bytes)
+        self.mode = mode
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == 'replay'
+
+    def review_key(self, old_code: str, new_code: str, version: str) -> str:
+        return 'r' + request_hash({'old': git_blob_sha(old_code), 'new': git_blob_sha(new_code), 'version': version})
+
+    def get_review(self, key: str) -> Optional[Dict]:
+        return None if self.mode == 'record' else self.store.get(key)
+
+    def put_review(self, key: str, result: Dict):
+        if self.mode != 'replay':
+            self.store.put(key, result)
+
+    def latest(self, namespace: str, request: Dict, fn: Callable[[], Any]) -> Any:
+        """Always call fn and record its value, except in replay, which answers with the last recorded one"""
+        key = namespace[0] + request_hash(dict(request, namespace=namespace))
+        if self.mode == 'replay':
+            hit = self.store.get(key)
+            if hit is None:
+                raise CacheMiss(f"No recorded {namespace} state for {key}")
+            return hit['value']
+        value = fn()
+        self.store.put(key, {'value': value, 'recorded_at': time.time()})
+        return value
+
+    def call(self, namespace: str, request: Dict, fn: Callable[[], Any]) -> Any:
+        """Answer a JSON-serializable request from the cache, calling fn on a miss"""
+        key = namespace[0] + request_hash(dict(request, namespace=namespace))
+        if self.mode != 'record':
+            hit = self.store.get(key)
+            if hit is not None:
+                return hit['value']
+        if self.mode == 'replay':
+            raise CacheMiss(f"No recorded {namespace} response for {key}")
+        value = fn()
+        self.store.put(key, {'value': value, 'recorded_at': time.time()})
+        return value
@@ -1,114 +1,118 @@
 import argparse
 import os
-import git
-from elasticsearch import Elasticsearch
-from openai import OpenAI
-from code_reviewer import CodeReviewer
-from typing import Optional, Tuple
+from dataclasses import asdict
+from typing import Dict, Tuple
+from diff_engine import collect_changes, hunk_excerpts, merge_report, to_file_lines
+from review_daemon import DAEMON_OPTIONS, DEFAULT_SOCKET, DaemonUnavailable, add_cache_arguments, daemon_config, request
 
-def load_git_diff(repo_path: str, commit_hash: Optional[str] = None) -> Tuple[str, str]:
-    """Load git diff from repository"""
-    repo = git.Repo(repo_path)
+# Heavy imports (torch, transformers, clients) are deferred so --help,
+# argument errors and daemon-backed reviews start instantly
+
+def review_in_process(args, files: Dict[str, Tuple[str, str]]) -> Dict[str, Dict]:
+    """Load the models in this process; used when no daemon is running"""
+    from local_search import DEFAULT_SEARCH_URL
+    from review_daemon import build_reviewer
+
+    reviewer = build_reviewer(args.openai_key, args.es_url or DEFAULT_SEARCH_URL, args.codebert_threads,
+                              args.cache_dir, args.cache_mode, args.cache_max_mb)
+    results = reviewer.review_files(files, parallel=not args.sequential, max_workers=args.workers)
+    return {path: asdict(result) for path, result in results.items()}
+
+def print_review(result: Dict):
+    print(f"\nQuality Score: {result['quality_score']:.2f}")
     
-    if commit_hash:
-        # Get specific commit
-        commit = repo.commit(commit_hash)
-        parent = commit.parents[0] if commit.parents else None
-        
-        if parent:
-            # Get changes between parent and current commit
-            diffs = parent.diff(commit)
-            if not diffs:
-                raise ValueError("No changes found in commit")
-            
-            # Get the first changed file
-            diff = diffs[0]
-            # Get old version
-            old_blob = parent.tree[diff.a_path] if diff.a_path else None
-            old_code = old_blob.data_stream.read().decode('utf-8') if old_blob else ""
-            
-            # Get new version
-            new_blob = commit.tree[diff.b_path] if diff.b_path else None
-            new_code = new_blob.data_stream.read().decode('utf-8') if new_blob else ""
-        else:
-            # First commit - compare with empty string
-            diffs = commit.diff(git.NULL_TREE)
-            if not diffs:
-                raise ValueError("No changes found in first commit")
-            
-            diff = diffs[0]
-            old_code = ""
-            new_blob = commit.tree[diff.b_path]
-            new_code = new_blob.data_stream.read().decode('utf-8')
-    else:
-        # Get working directory changes
-        diff_index = repo.index.diff(None)
+    print("\nCodeBERT Analysis:")
+    for label, score in result['codebert_scores'].items():
+        print(f"- {label}: {score:.2f}")
+    
+    print("\nReview Comments:")
+    for comment in result['suggested_comments']:
+        print(f"- {comment}")
         
-        if not diff_index:
-            raise ValueError("No changes found in working directory")
+    print("\nSuggested Refinements:")
+    for refinement in result['suggested_refinements']:
+        print(f"- {refinement}")
         
-        # Get the first changed file
-        change = diff_index[0]
-        if change.a_blob:
-            old_code = change.a_blob.data_stream.read().decode('utf-8')
-        else:
-            old_code = ""
+    print("\nSecurity Risks:")
+    for risk in result['security_risks']:
+        print(f"- Type: {risk['risk_type']}")
+        print(f"  Description: {risk['description']}")
+        print(f"  Similarity Score: {risk['similarity_score']:.2f}")
+        for location in risk.get('locations', []):
+            print(f"  Matched lines {location['start_line']}-{location['end_line']} ({location['score']:.2f})")
         
-        # Read current version from disk
-        with open(os.path.join(repo_path, change.b_path), 'r') as f:
-            new_code = f.read()
-            
-    return old_code, new_code
+    print("\nDiff Analysis:")
+    print(f"Lines Added: {result['diff_analysis']['lines_added']}")
+    print(f"Lines Removed: {result['diff_analysis']['lines_removed']}")
+    
+    if result.get('timings'):
+        print("\nTimings:")
+        for stage, seconds in result['timings'].items():
+            print(f"- {stage}: {seconds:.2f}s")
+
+def print_report(report: Dict):
+    print("\n=== Code Review Results ===")
+    print(f"\nFiles Reviewed: {len(report['files'])}")
+    print(f"Overall Quality Score: {report['quality_score']:.2f}")
+    print(f"Highest Risk Level: {report['risk_level']:.2f}")
+    print(f"Lines Added: {report['lines_added']}")
+    print(f"Lines Removed: {report['lines_removed']}")
+    if report['skipped']:
+        print(f"Skipped (deleted or binary): {', '.join(report['skipped'])}")
+    
+    print("\nSecurity Risks (all files):")
+    for risk in report['security_risks']:
+        print(f"- {risk['path']}: {risk['risk_type']} ({risk['similarity_score']:.2f})")
+    
+    for path, result in report['files'].items():
+        print(f"\n=== {path} ===")
+        print_review(result)
 
 def main():
     parser = argparse.ArgumentParser(description='Code Review Tool')
     parser.add_argument('--path', required=True, help='Path to the git repository')
     parser.add_argument('--commit', help='Specific commit hash to review')
+    parser.add_argument('--range', help='Commit range to review, e.g. main..feature')
+    parser.add_argument('--workers', type=int, default=4, help='Files reviewed in parallel')
     parser.add_argument('--es-host', default='localhost', help='Elasticsearch host')
     parser.add_argument('--es-port', default=9200, type=int, help='Elasticsearch port')
-    parser.add_argument('--openai-key', required=True, help='OpenAI API key')
+    parser.add_argument('--es-url', help='Elasticsearch URL, or local:<directory> for the embedded index '
+                                         '(default: $SECURITY_SEARCH_URL or http://localhost:9201)')
+    parser.add_argument('--openai-key', default=os.environ.get('OPENAI_API_KEY'),
+                        help='OpenAI API key, only needed without a review daemon')
+    parser.add_argument('--codebert-threads', type=int, help='Torch CPU threads for CodeBERT scoring')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Review daemon socket (see review_daemon.py)')
+    parser.add_argument('--sequential', action='store_true', help='Run review stages one after another')
+    parser.add_argument('--no-daemon', action='store_true', help='Always load the models in this process')
+    add_cache_arguments(parser)
     
     args = parser.parse_args()
-    
-    # Initialize clients
-    es_client = Elasticsearch(['http://localhost:9201'])
-    openai_client = OpenAI(api_key=args.openai_key)
-    
-    # Initialize reviewer
-    reviewer = CodeReviewer(es_client, openai_client)
+    # Parsed again without defaults: only options given explicitly must match a running daemon
+    parser.set_defaults(**{name: None for name in DAEMON_OPTIONS})
+    explicit = daemon_config(vars(parser.parse_args()))
     
     try:
-        # Load git diff
-        old_code, new_code = load_git_diff(args.path, args.commit)
-        
-        # Perform review
-        result = reviewer.review_code(old_code, new_code)
-        
-        # Print results
-        print("\n=== Code Review Results ===")
-        print(f"\nQuality Score: {result.quality_score:.2f}")
+        # Changed hunks of every file, widened to their enclosing functions;
+        # without --commit/--range the working tree is compared with HEAD
+        changes = collect_changes(args.path, args.commit, args.range)
+        files = {change.path: hunk_excerpts(change) for change in changes if change.reviewable}
+        if not files:
+            raise ValueError("No changes found")
         
-        print("\nCodeBERT Analysis:")
-        for label, score in result.codebert_scores.items():
-            print(f"- {label}: {score:.2f}")
+        # Perform review, on the warm daemon when one is running
+        results = None
+        if not args.no_daemon:
+            try:
+                results = request({'op': 'review_files', 'files': files, 'parallel': not args.sequential,
+                                   'workers': args.workers, 'config': explicit}, args.socket)['results']
+            except DaemonUnavailable:
+                pass
+        if results is None:
+            results = review_in_process(args, files)
+        # Risk locations come back as excerpt lines; report them as lines of the file
+        to_file_lines(results, changes)
         
-        print("\nReview Comments:")
-        for comment in result.suggested_comments:
-            print(f"- {comment}")
-            
-        print("\nSuggested Refinements:")
-        for refinement in result.suggested_refinements:
-            print(f"- {refinement}")
-            
-        print("\nSecurity Risks:")
-        for risk in result.security_risks:
-            print(f"- Type: {risk['risk_type']}")
-            print(f"  Description: {risk['description']}")
-            print(f"  Similarity Score: {risk['similarity_score']:.2f}")
-            
-        print("\nDiff Analysis:")
-        print(f"Lines Added: {result.diff_analysis['lines_added']}")
-        print(f"Lines Removed: {result.diff_analysis['lines_removed']}")
+        print_report(merge_report(results, changes))
         
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -0,0 +1,198 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import tempfile
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+# Nothing heavy at module level: review_command imports this module for the client side
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.environ.get(
+    'REVIEW_SOCKET',
+    os.path.join(tempfile.gettempdir(), f'code-review-{os.getuid()}.sock')
+)
+DEFAULT_CACHE_DIR = os.environ.get(
+    'REVIEW_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'code-review')
+)
+# Options fixed when the daemon starts; requests asking for other values are refused
+DAEMON_OPTIONS = ('es_url', 'openai_key', 'cache_dir', 'cache_mode', 'cache_max_mb', 'codebert_threads')
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+def daemon_config(values: Dict) -> Dict:
+    """Comparable form of the set daemon-level options; the API key is reduced to a hash"""
+    config = {}
+    for name in DAEMON_OPTIONS:
+        value = values.get(name)
+        if value is None:
+            continue
+        if name == 'openai_key':
+            value = hashlib.sha256(value.encode('utf-8')).hexdigest()
+        elif name == 'cache_dir':
+            value = os.path.abspath(os.path.expanduser(value))
+        config[name] = value
+    return config
+
+
+def config_conflicts(requested: Dict, config: Dict) -> List[str]:
+    return sorted(name for name, value in requested.items() if config.get(name) != value)
+
+
+def request(payload: Dict, socket_path: str = DEFAULT_SOCKET, timeout: Optional[float] = 600) -> Dict:
+    """Send one JSON request to the daemon and return its JSON response"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        sock.close()
+        raise DaemonUnavailable(str(e))
+    with sock, sock.makefile('rwb') as stream:
+        stream.write(json.dumps(payload).encode('utf-8') + b'\n')
+        stream.flush()
+        line = stream.readline()
+    if not line:
+        raise DaemonUnavailable("Daemon closed the connection")
+    response = json.loads(line)
+    if not response.get('ok'):
+        raise RuntimeError(response.get('error', 'Review failed'))
+    return response
+
+
+def is_running(socket_path: str = DEFAULT_SOCKET) -> bool:
+    try:
+        request({'op': 'ping'}, socket_path, timeout=2)
+        return True
+    except (DaemonUnavailable, OSError):
+        return False
+
+
+class ReviewHandler(socketserver.StreamRequestHandler):
+    """One newline-terminated JSON request per connection, one JSON line back"""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            payload = json.loads(line)
+            op = payload.get('op', 'review')
+            conflicts = config_conflicts(payload.get('config', {}), self.server.config)
+            if conflicts:
+                options = ', '.join('--' + name.replace('_', '-') for name in conflicts)
+                response = {'ok': False, 'conflict': conflicts,
+                            'error': f'The review daemon runs with different {options}; '
+                                     f'restart it with those options or pass --no-daemon'}
+            elif op == 'ping':
+                response = {'ok': True}
+            elif op == 'review':
+                result = self.server.reviewer.review_code(payload['old_code'], payload['new_code'],
+                                                          parallel=payload.get('parallel', True))
+                response = {'ok': True, 'result': asdict(result)}
+            elif op == 'review_files':
+                files = {path: tuple(pair) for path, pair in payload['files'].items()}
+                results = self.server.reviewer.review_files(files, parallel=payload.get('parallel', True),
+                                                            max_workers=payload.get('workers', 4))
+                response = {'ok': True, 'results': {path: asdict(r) for path, r in results.items()}}
+            else:
+                response = {'ok': False, 'error': f'Unknown op: {op}'}
+        except Exception as e:
+            logger.exception("Review request failed")
+            response = {'ok': False, 'error': str(e)}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class ReviewServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, reviewer, config: Optional[Dict] = None):
+        self.reviewer = reviewer
+        # daemon_config() of the options this daemon was started with
+        self.config = config or {}
+        super().__init__(socket_path, ReviewHandler)
+        # Reviews include source code; keep the socket private to this user
+        os.chmod(socket_path, 0o600)
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Review and LLM response cache directory')
+    parser.add_argument('--cache-mode', default='readwrite', choices=['readwrite', 'record', 'replay', 'off'],
+                        help='replay answers only from the cache and never calls OpenAI or Elasticsearch')
+    parser.add_argument('--cache-max-mb', type=int, default=512, help='Cache size bound, least recently used first out')
+
+
+def build_reviewer(openai_key: Optional[str], es_url: str, codebert_threads: Optional[int] = None,
+                   cache_dir: Optional[str] = None, cache_mode: str = 'readwrite', cache_max_mb: int = 512):
+    from code_reviewer import CodeReviewer
+    from local_search import connect
+    from review_cache import ReviewCache
+
+    cache = None
+    if cache_dir and cache_mode != 'off':
+        cache = ReviewCache(cache_dir, max_bytes=cache_max_mb * 1024 * 1024, mode=cache_mode)
+    if openai_key:
+        from openai import OpenAI
+        openai_client = OpenAI(api_key=openai_key)
+    elif cache is not None and cache.offline:
+        openai_client = None
+    else:
+        raise ValueError("--openai-key or OPENAI_API_KEY is required unless replaying from the cache")
+
+    return CodeReviewer(
+        connect(es_url),
+        openai_client,
+        codebert_threads=codebert_threads,
+        cache=cache,
+        search_url=es_url
+    )
+
+
+def main():
+    from local_search import DEFAULT_SEARCH_URL
+
+    parser = argparse.ArgumentParser(description='Keep the code review models loaded and serve reviews over a Unix socket')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket path')
+    parser.add_argument('--es-url', default=DEFAULT_SEARCH_URL,
+                        help='Elasticsearch URL, or local:<directory> for the embedded index')
+    parser.add_argument('--openai-key', default=os.environ.get('OPENAI_API_KEY'), help='OpenAI API key')
+    parser.add_argument('--codebert-threads', type=int, help='Torch CPU threads for CodeBERT scoring')
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.openai_key and args.cache_mode != 'replay':
+        parser.error('--openai-key or OPENAI_API_KEY is required')
+    if is_running(args.socket):
+        parser.error(f'A review daemon is already listening on {args.socket}')
+    if os.path.exists(args.socket):
+        # Left behind by a daemon that did not shut down cleanly
+        os.unlink(args.socket)
+
+    reviewer = build_reviewer(args.openai_key, args.es_url, args.codebert_threads,
+                              args.cache_dir, args.cache_mode, args.cache_max_mb)
+    server = ReviewServer(args.socket, reviewer, daemon_config(vars(args)))
+    logger.info(f"Review daemon listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
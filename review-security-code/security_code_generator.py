@@ -1,17 +1,117 @@
+import argparse
+import functools
+import logging
+import queue
+import threading
+import time
 import pandas as pd
+import openai
 from openai import OpenAI
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Set
 import os
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
+from bulk_indexer import BulkIndexer
+from local_search import DEFAULT_SEARCH_URL, connect
+from rate_limit import TokenBucket, retry
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL = 'security_code_samples.jsonl'
+
+# Transient OpenAI failures worth another attempt
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def _recover_lines(path: str, parse) -> Set[str]:
+    """Ids from the complete lines of `path`; a torn or unparseable tail is truncated away"""
+    ids: Set[str] = set()
+    valid_bytes = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                ids.add(parse(line))
+            except (ValueError, KeyError, TypeError):
+                break
+            valid_bytes += len(line)
+    # Drop a line torn by an interrupted write so appends start clean
+    with open(path, 'r+b') as f:
+        f.truncate(valid_bytes)
+    return ids
+
+
+def _append_synced(f, text: str):
+    f.write(text)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class GenerationJournal:
+    """
+    Append-only JSONL of generated samples, one line per sample, written
+    as each one finishes. It is both the output and the checkpoint: ids
+    already in it are skipped by the next run. A sidecar `<path>.indexed`
+    lists the ids whose index request succeeded, so a resumed run only
+    re-sends the samples that never made it into the index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.indexed_path = path + '.indexed'
+        self.done: Set[str] = set()
+        self.indexed: Set[str] = set()
+        if os.path.exists(path):
+            self.done = _recover_lines(path, lambda line: str(json.loads(line)['id']))
+        if os.path.exists(self.indexed_path):
+            self.indexed = _recover_lines(self.indexed_path, lambda line: line.decode('utf-8').rstrip('\n'))
+        self._file = open(path, 'a', encoding='utf-8')
+        self._indexed_file = open(self.indexed_path, 'a', encoding='utf-8')
+
+    def entries(self) -> Iterator[Dict]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def unindexed(self) -> Iterator[Dict]:
+        return (entry for entry in self.entries() if str(entry['id']) not in self.indexed)
+
+    def append(self, entry: Dict):
+        _append_synced(self._file, json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+        self.done.add(str(entry['id']))
+
+    def mark_indexed(self, ids: List[str]):
+        _append_synced(self._indexed_file, ''.join(f'{entry_id}\n' for entry_id in ids))
+        self.indexed.update(ids)
+
+    def close(self):
+        self._file.close()
+        self._indexed_file.close()
+
 
 class SecurityCodeGenerator:
-    def __init__(self, api_key: str, es_host: str = "http://localhost:9201"):
+    def __init__(self, api_key: str, es_host: str = DEFAULT_SEARCH_URL, workers: int = 8,
+                 requests_per_minute: float = 500, burst: int = 10, timeout: float = 120.0, attempts: int = 5):
         self.client = OpenAI(api_key=api_key)
-        self.es = Elasticsearch([es_host])
+        self.es = connect(es_host)
         self.index_name = "security_code_samples"
+        self.workers = workers
+        # Shared by all workers, so concurrency fills the allowed rate without exceeding it
+        self.bucket = TokenBucket(rate=requests_per_minute / 60, capacity=burst)
+        self.timeout = timeout
+        self.attempts = attempts
         
     def ensure_index_exists(self):
         if not self.es.indices.exists(index=self.index_name):
@@ -47,74 +147,166 @@ class SecurityCodeGenerator:
         Do not include any text before or after the code.
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4-mini",
-            messages=[
-                {"role": "system", "content": "You are a code generator that returns only code samples with minimal inline comments."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        def call():
+            self.bucket.acquire()
+            response = self.client.chat.completions.create(
+                model="gpt-4-mini",
+                messages=[
+                    {"role": "system", "content": "You are a code generator that returns only code samples with minimal inline comments."},
+                    {"role": "user", "content": prompt}
+                ],
+                timeout=self.timeout
+            )
+            return response.choices[0].message.content
+        return retry(call, attempts=self.attempts, retry_on=RETRYABLE_ERRORS)
+
+    def build_entry(self, row: Dict) -> Dict:
+        return {
+            'id': row['id'],
+            'description': row['description'],
+            'generated_code': self.generate_code_sample(row['description']),
+            'metadata': {
+                'type': row['type'],
+                'platform': row['platform'],
+                'date_published': row['date_published'],
+                'tags': row['tags'].split(',') if isinstance(row['tags'], str) else [],
+            },
+            'generated_at': datetime.now().isoformat()
+        }
     
-    def process_entries(self, df: pd.DataFrame, limit: int = None) -> List[Dict]:
+    def _index_batch(self, indexer: BulkIndexer, journal: GenerationJournal, batch: List[Dict]) -> int:
+        """Index a batch (update if exists or create if not), returns how many are now indexed"""
+        try:
+            result = indexer.index(batch, op_type='index')
+        except Exception as e:
+            logger.error(f"Indexing {len(batch)} samples failed, the next run retries them: {e}")
+            return 0
+        if result['failed']:
+            # Per-document outcomes are not reported, so the whole batch stays pending
+            logger.error(f"{result['failed']} of {len(batch)} samples were not indexed, "
+                         f"the next run retries them: {result['errors']}")
+            return 0
+        journal.mark_indexed([str(entry['id']) for entry in batch])
+        return len(batch)
+
+    def process_entries(self, df: pd.DataFrame, limit: int = None, journal_path: str = DEFAULT_JOURNAL,
+                        flush_every: int = 100) -> Dict:
+        """
+        Generate samples for every row not already in the journal.
+
+        Up to `workers` requests run at once under the shared rate limit.
+        Each finished sample is appended to the journal straight away and
+        handed to a single indexing thread that sends batches of
+        flush_every, so slow index requests never hold up the workers. An
+        interrupted run loses at most the requests in flight, and the next
+        run generates the missing rows and indexes only the journaled
+        samples not yet marked indexed. Returns generated, skipped, failed
+        and indexed counts and the elapsed seconds.
+        """
         self.ensure_index_exists()
-        results = []
-                
+        indexer = BulkIndexer(self.es, self.index_name, workers=1)
+        journal = GenerationJournal(journal_path)
+
         # Apply limit if specified
         if limit:
             df = df.head(limit)
-            
-        for _, row in df.iterrows():
+        rows = [row for row in df.to_dict('records') if str(row['id']) not in journal.done]
+        stats = {'generated': 0, 'skipped': len(df) - len(rows), 'failed': 0, 'indexed': 0}
+        logger.info(f"{len(rows)} samples to generate, {stats['skipped']} already in {journal_path}")
+
+        # A previous run may have stopped before its last batches were indexed
+        pending = list(journal.unindexed())
+        if pending:
+            logger.info(f"Indexing {len(pending)} journaled samples left over from a previous run")
+            for start in range(0, len(pending), flush_every):
+                stats['indexed'] += self._index_batch(indexer, journal, pending[start:start + flush_every])
+
+        lock = threading.Lock()
+        to_index: queue.Queue = queue.Queue()
+        in_flight = threading.BoundedSemaphore(self.workers * 2)
+        started = time.perf_counter()
+
+        def index_worker():
+            # The only thread talking to the index, so batches never overlap
+            batch: List[Dict] = []
+            while True:
+                entry: Optional[Dict] = to_index.get()
+                if entry is not None:
+                    batch.append(entry)
+                if batch and (entry is None or len(batch) >= flush_every):
+                    stats['indexed'] += self._index_batch(indexer, journal, batch)
+                    batch = []
+                if entry is None:
+                    return
+
+        def generate(row: Dict) -> Dict:
             try:
-                code_sample = self.generate_code_sample(row['description'])
-                                
-                entry = {
-                    'id': row['id'],
-                    'description': row['description'],
-                    'generated_code': code_sample,
-                    'metadata': {
-                        'type': row['type'],
-                        'platform': row['platform'],
-                        'date_published': row['date_published'],
-                        'tags': row['tags'].split(',') if isinstance(row['tags'], str) else [],
-                                            },
-                    'generated_at': datetime.now().isoformat()
-                }
-                
-                # Update or create document in Elasticsearch
-                self.es.index(
-                    index=self.index_name,
-                    id=entry['id'],
-                    body=entry,
-                    op_type='index'  # This will update if exists or create if not
-                )
-                
-                results.append(entry)
-                print(f"Updated/created entry {row['id']}")
-                print(f"Successfully indexed entry {row['id']}")
-                
+                return self.build_entry(row)
+            finally:
+                in_flight.release()
+
+        def record(row: Dict, future):
+            if future.cancelled():
+                return
+            try:
+                entry = future.result()
             except Exception as e:
-                print(f"Error processing entry {row['id']}: {str(e)}")
-                
-        return results
+                logger.error(f"Error processing entry {row['id']}: {e}")
+                with lock:
+                    stats['failed'] += 1
+                return
+            with lock:
+                journal.append(entry)
+                stats['generated'] += 1
+                if stats['generated'] % flush_every == 0:
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"Generated {stats['generated']}/{len(rows)} samples, "
+                                f"{stats['generated'] / elapsed * 60:.0f}/min")
+            to_index.put(entry)
+
+        indexing = threading.Thread(target=index_worker, name='sample-indexer', daemon=True)
+        indexing.start()
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            for row in rows:
+                in_flight.acquire()
+                pool.submit(generate, row).add_done_callback(functools.partial(record, row))
+        except BaseException:
+            # On interrupt, drop queued rows but keep what in-flight requests return
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            pool.shutdown(wait=True)
+            to_index.put(None)
+            indexing.join()
+            journal.close()
+
+        stats['seconds'] = time.perf_counter() - started
+        logger.info(f"Generated {stats['generated']} samples ({stats['skipped']} skipped, "
+                    f"{stats['failed']} failed, {stats['indexed']} indexed) in {stats['seconds']:.1f}s")
+        return stats
 
 def main():
     from dotenv import dotenv_values
     config = dotenv_values('../.env')
-    print('config:', config)
     api_key = config.get('OPENAI_API_KEY')
     csv_path = config.get('SECURITY_CSV_PATH')
-    print('api_key:', api_key, 'csv_path:', csv_path)
-    if not api_key or not csv_path:
+
+    parser = argparse.ArgumentParser(description='Generate and index security code samples')
+    parser.add_argument('--csv', default=csv_path, help='Security CSV (default: SECURITY_CSV_PATH)')
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL, help='JSONL output, also used to resume')
+    parser.add_argument('--limit', type=int, help='Only the first N rows of the CSV')
+    parser.add_argument('--workers', type=int, default=8, help='Requests in flight')
+    parser.add_argument('--rpm', type=float, default=500, help='OpenAI requests per minute allowed')
+    parser.add_argument('--es-url', default=DEFAULT_SEARCH_URL,
+                        help='Elasticsearch URL, or local:<directory> for the embedded index')
+    args = parser.parse_args()
+    if not api_key or not args.csv:
         raise ValueError("Missing required environment variables")
     
-    generator = SecurityCodeGenerator(api_key)
-    df = generator.read_security_csv(csv_path)
-    results = generator.process_entries(df, limit=10)
-    
-    # Save results to JSON file
-    with open('security_code_samples.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    generator = SecurityCodeGenerator(api_key, args.es_url, workers=args.workers, requests_per_minute=args.rpm)
+    df = generator.read_security_csv(args.csv)
+    generator.process_entries(df, limit=args.limit, journal_path=args.journal)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,7 @@
 import csv
 import os
+import sys
+from email.utils import parsedate_to_datetime
 from itemadapter import ItemAdapter
 
 
@@ -29,3 +31,63 @@ class RssCrawlerPipeline:
         adapter = ItemAdapter(item)
         self.writer.writerow(adapter.asdict())
         return item
+
+
+class ArticleDatabasePipeline:
+    """
+    Inserts crawled articles into the database for the feed given as the
+    spider's feed_id argument, in batches, so each new batch is announced
+    to SSE listeners and notification subscribers. Does nothing for
+    crawls without a feed_id.
+    """
+
+    BATCH_SIZE = 100
+
+    def __init__(self):
+        self.feed_id = None
+        self.rows = []
+        self.insert_articles = None
+
+    def open_spider(self, spider):
+        feed_id = getattr(spider, 'feed_id', None)
+        if feed_id is None:
+            return
+        self.feed_id = int(feed_id)
+        # The crawler runs from rss_crawler/, the models and services live at the repository root
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+        from services.article_events import insert_articles
+        self.insert_articles = insert_articles
+
+    def close_spider(self, spider):
+        self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.insert_articles(self.feed_id, self.rows)
+            self.rows = []
+
+    def process_item(self, item, spider):
+        if self.feed_id is None:
+            return item
+        adapter = ItemAdapter(item)
+        if adapter.get('url'):
+            self.rows.append({
+                'url': adapter['url'],
+                'title': (adapter.get('title') or '')[:255],
+                'content': adapter.get('text_content'),
+                'author': (adapter.get('author') or None) and adapter['author'][:255],
+                'published_at': _parse_date(adapter.get('published_date')),
+            })
+        if len(self.rows) >= self.BATCH_SIZE:
+            self.flush()
+        return item
+
+
+def _parse_date(value):
+    """RSS dates are RFC 822; anything unparseable is stored as unknown"""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
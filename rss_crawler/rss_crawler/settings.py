@@ -64,6 +64,8 @@ ROBOTSTXT_OBEY = True
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
    "rss_crawler.pipelines.RssCrawlerPipeline": 300,
+   # Active only when the spider is run with -a feed_id=<id>
+   "rss_crawler.pipelines.ArticleDatabasePipeline": 400,
 }
 
 # Enable and configure the AutoThrottle extension (disabled by default)
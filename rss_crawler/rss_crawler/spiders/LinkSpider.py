@@ -10,8 +10,10 @@ import feedparser
 class LinkSpider(scrapy.Spider):
     name = "link_spider"
 
-    def __init__(self, start_url=None, assistant_id=None, max_urls=500, *args, **kwargs):
+    def __init__(self, start_url=None, assistant_id=None, max_urls=500, feed_id=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Feed the crawled articles are stored under, see ArticleDatabasePipeline
+        self.feed_id = feed_id
         start_url = start_url if start_url else 'https://thanhnien.vn/'
         self.start_urls = [start_url]
         self.allowed_domains = [urlparse(start_url).hostname] if start_url else []
@@ -0,0 +1,55 @@
+import json
+from typing import Dict, Iterable, List
+
+from models.database_models import db, Article, Feed
+from services.notifications import NotificationEngine
+
+NEW_ARTICLES_CHANNEL = 'new_articles'
+SUBSCRIPTIONS_CHANNEL = 'subscriptions_changed'
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_IDS_PER_NOTIFY = 500
+
+notifications = NotificationEngine()
+
+
+def notify(channel: str, payload: Dict):
+    """Queue a NOTIFY; Postgres delivers it when the surrounding transaction commits"""
+    db.execute_sql('SELECT pg_notify(%s, %s)', (channel, json.dumps(payload)))
+
+
+def notify_new_articles(feed_id: int, article_ids: List[int]):
+    for start in range(0, len(article_ids), MAX_IDS_PER_NOTIFY):
+        notify(NEW_ARTICLES_CHANNEL, {
+            'feed_id': feed_id,
+            'article_ids': article_ids[start:start + MAX_IDS_PER_NOTIFY],
+        })
+
+
+def notify_subscriptions_changed(user_id: int):
+    notify(SUBSCRIPTIONS_CHANNEL, {'user_id': user_id})
+
+
+def insert_articles(feed_id: int, rows: Iterable[Dict]) -> List[int]:
+    """
+    Insert a batch of articles for one feed and announce them to stream listeners.
+
+    Rows whose URL already exists are skipped. Only newly inserted ids are
+    returned, announced and turned into a user notification.
+    """
+    rows = [dict(row, feed=feed_id) for row in rows]
+    if not rows:
+        return []
+
+    with db.atomic():
+        cursor = (Article
+                  .insert_many(rows)
+                  .on_conflict_ignore()
+                  .returning(Article.id)
+                  .execute())
+        article_ids = [row[0] if isinstance(row, tuple) else row.id for row in cursor]
+        if article_ids:
+            notify_new_articles(feed_id, article_ids)
+            title = Feed.select(Feed.title).where(Feed.id == feed_id).scalar()
+            notifications.publish(feed_id, f"{len(article_ids)} new article(s) from {title}")
+    return article_ids
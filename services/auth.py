@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+ACCESS_TOKEN_TTL = 15 * 60
+REFRESH_TOKEN_TTL = 30 * 24 * 3600
+
+# PBKDF2 runs here instead of inline so a burst of logins and registrations
+# can only occupy this many cores; hashlib releases the GIL while hashing.
+_password_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='kdf')
+
+
+def _run_kdf(fn, *args, timeout: float):
+    """Run fn on the password pool; raises concurrent.futures.TimeoutError when it is saturated"""
+    future = _password_pool.submit(fn, *args)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        # Still queued: the caller has given up, so don't spend a core on it later
+        future.cancel()
+        raise
+
+
+def verify_password(password_hash: str, password: str, timeout: float = 10.0) -> bool:
+    return _run_kdf(check_password_hash, password_hash, password, timeout=timeout)
+
+
+def hash_password(password: str, timeout: float = 10.0) -> str:
+    return _run_kdf(generate_password_hash, password, timeout=timeout)
+
+
+class TokenManager:
+    """
+    Issues and validates signed access/refresh tokens.
+
+    Access tokens are short-lived and checked on every API call, so successful
+    verifications are kept in a small in-memory cache until the token expires.
+    """
+
+    def __init__(self, secret_key: str,
+                 access_ttl: int = ACCESS_TOKEN_TTL,
+                 refresh_ttl: int = REFRESH_TOKEN_TTL,
+                 cache_size: int = 50000):
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self._access = URLSafeTimedSerializer(secret_key, salt='access')
+        self._refresh = URLSafeTimedSerializer(secret_key, salt='refresh')
+        self._cache: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def issue(self, user_id: int) -> Dict:
+        return {
+            'access_token': self._access.dumps({'uid': user_id}),
+            'refresh_token': self._refresh.dumps({'uid': user_id}),
+            'token_type': 'Bearer',
+            'expires_in': self.access_ttl,
+        }
+
+    def verify_access(self, token: str) -> Optional[int]:
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached is not None:
+                expires_at, user_id = cached
+                if expires_at > now:
+                    self._cache.move_to_end(token)
+                    return user_id
+                del self._cache[token]
+
+        try:
+            payload, issued_at = self._access.loads(token, max_age=self.access_ttl, return_timestamp=True)
+        except (SignatureExpired, BadSignature):
+            return None
+
+        user_id = payload['uid']
+        expires_at = issued_at.timestamp() + self.access_ttl
+        with self._lock:
+            self._cache[token] = (expires_at, user_id)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return user_id
+
+    def refresh(self, refresh_token: str) -> Optional[Dict]:
+        try:
+            payload = self._refresh.loads(refresh_token, max_age=self.refresh_ttl)
+        except (SignatureExpired, BadSignature):
+            return None
+        return self.issue(payload['uid'])
+
+
+def bearer_token() -> Optional[str]:
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip()
+    return None
+
+
+def require_auth(tokens: TokenManager):
+    """Decorator that resolves the bearer token into g.user_id or returns 401"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = bearer_token()
+            user_id = tokens.verify_access(token) if token else None
+            if user_id is None:
+                return jsonify({'error': 'Invalid or expired token'}), 401
+            g.user_id = user_id
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,119 @@
+import heapq
+from datetime import datetime
+from typing import Dict, List
+
+from peewee import fn
+
+from models.database_models import (
+    db, Feed, FeedEvent, Notification, NotificationCursor, Setting, Subscription
+)
+
+# Feeds with more subscribers than this are fanned out on read
+FANOUT_THRESHOLD = 500
+INSERT_BATCH_SIZE = 1000
+
+
+class NotificationEngine:
+    """
+    Hybrid fan-out for new-article alerts.
+
+    Small feeds get one Notification row per subscriber at publish time. Large
+    feeds get a single FeedEvent row that subscribers merge into their inbox
+    when they read it, so publish cost is bounded by the threshold rather than
+    by the subscriber count.
+    """
+
+    def __init__(self, threshold: int = FANOUT_THRESHOLD, batch_size: int = INSERT_BATCH_SIZE):
+        self.threshold = threshold
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _muted_users():
+        return Setting.select(Setting.user).where(Setting.notifications_enabled == False)
+
+    def _is_large(self, feed_id: int) -> bool:
+        # LIMIT keeps the count bounded no matter how popular the feed is
+        query = Subscription.select(Subscription.id).where(Subscription.feed == feed_id)
+        return query.limit(self.threshold + 1).count() > self.threshold
+
+    def publish(self, feed_id: int, message: str) -> str:
+        """Record an event for a feed, returns the fan-out mode used"""
+        if self._is_large(feed_id):
+            FeedEvent.create(feed=feed_id, message=message)
+            return 'read'
+
+        user_ids = [
+            user_id for (user_id,) in Subscription
+            .select(Subscription.user)
+            .where((Subscription.feed == feed_id) &
+                   (Subscription.user.not_in(self._muted_users())))
+            .tuples()
+        ]
+        with db.atomic():
+            for start in range(0, len(user_ids), self.batch_size):
+                batch = user_ids[start:start + self.batch_size]
+                Notification.insert_many(
+                    [{'user': user_id, 'message': message} for user_id in batch]
+                ).execute()
+        return 'write'
+
+    def fetch(self, user_id: int, limit: int = 50) -> List[Dict]:
+        """Newest-first inbox merging direct notifications and large-feed events"""
+        enabled = (Setting
+                   .select(Setting.notifications_enabled)
+                   .where(Setting.user == user_id)
+                   .scalar())
+        if enabled is False:
+            return []
+
+        read_until = (NotificationCursor
+                      .select(NotificationCursor.read_until)
+                      .where(NotificationCursor.user == user_id)
+                      .scalar()) or datetime.min
+
+        direct = (Notification
+                  .select()
+                  .where(Notification.user == user_id)
+                  .order_by(Notification.created_at.desc())
+                  .limit(limit))
+
+        events = (FeedEvent
+                  .select(FeedEvent, Feed.title)
+                  .join(Feed)
+                  .switch(FeedEvent)
+                  .join(Subscription, on=(Subscription.feed == FeedEvent.feed))
+                  .where((Subscription.user == user_id) &
+                         (FeedEvent.created_at >= Subscription.subscribed_at))
+                  .order_by(FeedEvent.created_at.desc())
+                  .limit(limit))
+
+        direct_items = ({
+            'id': f'n{n.id}',
+            'message': n.message,
+            'is_read': n.is_read,
+            'created_at': n.created_at,
+        } for n in direct)
+        event_items = ({
+            'id': f'e{e.id}',
+            'feed': e.feed.title,
+            'message': e.message,
+            'is_read': e.created_at <= read_until,
+            'created_at': e.created_at,
+        } for e in events)
+
+        merged = heapq.merge(direct_items, event_items, key=lambda item: item['created_at'], reverse=True)
+        return [item for _, item in zip(range(limit), merged)]
+
+    def mark_all_read(self, user_id: int):
+        # FeedEvent.created_at is stamped by the database clock, so the cursor must be too
+        now = fn.NOW()
+        with db.atomic():
+            (Notification
+             .update(is_read=True)
+             .where((Notification.user == user_id) & (Notification.is_read == False))
+             .execute())
+            (NotificationCursor
+             .insert(user=user_id, read_until=now)
+             .on_conflict(conflict_target=[NotificationCursor.user],
+                          update={NotificationCursor.read_until: now})
+             .execute())
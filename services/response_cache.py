@@ -0,0 +1,183 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from flask import Response, jsonify, request
+
+
+class MemoryStore:
+    """
+    In-process LRU store with per-entry TTL.
+
+    Only valid with a single API process: invalidations made in one
+    process are invisible to the others. Use RedisStore otherwise.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Counters restart at zero with the process, so ETags must differ across restarts
+        self._epoch = secrets.token_hex(8)
+
+    def epoch(self) -> str:
+        return self._epoch
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        # Version counters live outside the LRU so eviction can never reset them
+        with self._lock:
+            value = self._versions.get(key, 0) + 1
+            self._versions[key] = value
+            return value
+
+    def version(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+
+class RedisStore:
+    """Shared store for multi-process deployments, same interface as MemoryStore"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", ttl: float = 300.0, prefix: str = "feedly:"):
+        import pickle
+        import redis
+
+        self._pickle = pickle
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        return self._pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.client.set(self.prefix + key, self._pickle.dumps(value), ex=int(self.ttl if ttl is None else ttl))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + 'v:' + key))
+
+    def epoch(self) -> str:
+        # Regenerated if Redis loses its data, which also resets the version counters
+        key = self.prefix + 'epoch'
+        raw = self.client.get(key)
+        if raw is None:
+            self.client.set(key, secrets.token_hex(8), nx=True)
+            raw = self.client.get(key)
+        return raw.decode('ascii')
+
+    def version(self, key: str) -> int:
+        raw = self.client.get(self.prefix + 'v:' + key)
+        return int(raw) if raw is not None else 0
+
+
+class ResponseCache:
+    """
+    Per-user JSON response cache with strong ETags.
+
+    ETags are derived from data version counters rather than from the response
+    body, so a matching If-None-Match can be answered with 304 before the
+    database is touched at all. The store's epoch is part of every ETag, so
+    counters that restart from zero never revive a client's old ETag.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or MemoryStore()
+
+    def invalidate_user(self, user_id):
+        """Call after a user's subscriptions change"""
+        self.store.incr(f'user:{user_id}')
+
+    def etag_for(self, endpoint: str, user_id) -> str:
+        user_version = self.store.version(f'user:{user_id}')
+        raw = f'{self.store.epoch()}|{endpoint}|{user_id}|{user_version}'
+        return '"' + hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32] + '"'
+
+    def cached(self, user_id_getter: Callable[[], Any]):
+        """
+        Decorator for read endpoints returning (data, status).
+
+        The wrapped view must return plain JSON-serialisable data rather than
+        a Response so the body can be stored and replayed.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                user_id = user_id_getter()
+                if user_id is None:
+                    return view(*args, **kwargs)
+
+                etag = self.etag_for(request.path, user_id)
+                client_tags = _parse_if_none_match(request.headers.get('If-None-Match', ''))
+                if etag in client_tags or '*' in client_tags:
+                    return _not_modified(etag)
+
+                key = f'resp:{etag}'
+                data = self.store.get(key)
+                if data is None:
+                    result = view(*args, **kwargs)
+                    if isinstance(result, tuple):
+                        data, status = result
+                    else:
+                        data, status = result, 200
+                    if isinstance(data, Response) or status != 200:
+                        return result
+                    self.store.set(key, data)
+
+                response = jsonify(data)
+                response.headers['ETag'] = etag
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response, 200
+            return wrapper
+        return decorator
+
+
+def _parse_if_none_match(header: str) -> Set[str]:
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    tags = set()
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag:
+            tags.add(tag)
+    return tags
+
+
+def _not_modified(etag: str) -> Response:
+    response = Response(status=304)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
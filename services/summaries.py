@@ -0,0 +1,248 @@
+import hashlib
+import json
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from models.database_models import db, Article, SummaryCache
+
+# Longer articles are truncated before hashing and summarizing
+MAX_INPUT_CHARS = 6000
+
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+class ExtractiveBackend:
+    """Local stand-in for the model: the leading sentences of each article"""
+
+    def __init__(self, sentences: int = 3, max_chars: int = 600):
+        self.sentences = sentences
+        self.max_chars = max_chars
+        self.version = f'extractive:{sentences}:{max_chars}'
+
+    def summarize_many(self, texts: Sequence[str]) -> List[str]:
+        summaries = []
+        for text in texts:
+            lead = ' '.join(SENTENCE_RE.split(' '.join(text.split()))[:self.sentences])
+            summaries.append(lead[:self.max_chars].rstrip())
+        return summaries
+
+
+class OpenAIBackend:
+    """Chat-completions backend that summarizes a whole batch in one request"""
+
+    PROMPT_VERSION = 1
+
+    def __init__(self, client=None, model: str = 'gpt-4o-mini', api_key: Optional[str] = None):
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=api_key)
+        self.client = client
+        self.model = model
+        # Part of the cache key: changing the model or prompt re-summarizes
+        self.version = f'openai:{model}:v{self.PROMPT_VERSION}'
+
+    def _request(self, texts: Sequence[str]) -> Optional[List[str]]:
+        articles = '\n\n'.join(f'[{i}]\n{text}' for i, text in enumerate(texts))
+        response = self.client.chat.completions.create(
+            model=self.model,
+            response_format={'type': 'json_object'},
+            messages=[
+                {"role": "system", "content": "You write concise 2-3 sentence overviews of news articles, "
+                                              "in the language of the article."},
+                {"role": "user", "content": f"Summarize each numbered article below. Return JSON of the form "
+                                            f"{{\"summaries\": [...]}} with exactly {len(texts)} strings, "
+                                            f"in order.\n\n{articles}"},
+            ]
+        )
+        try:
+            summaries = json.loads(response.choices[0].message.content)['summaries']
+        except (ValueError, KeyError, TypeError):
+            return None
+        if not isinstance(summaries, list) or len(summaries) != len(texts):
+            return None
+        return [str(summary).strip() for summary in summaries]
+
+    def summarize_many(self, texts: Sequence[str]) -> List[str]:
+        summaries = self._request(texts)
+        if summaries is not None:
+            return summaries
+        # The model lost track of the batch; fall back to one request per article
+        summaries = []
+        for text in texts:
+            single = self._request([text])
+            if single is None:
+                raise ValueError("Unparseable summary response")
+            summaries.extend(single)
+        return summaries
+
+
+class _Pending:
+    def __init__(self, text: str):
+        self.text = text
+        self.future: Future = Future()
+        self.article_ids: Set[int] = set()
+
+
+class Summarizer:
+    """
+    Summarizes each distinct article text once.
+
+    Summaries are keyed by a hash of the backend version and the article
+    text. A request is answered from an in-process LRU, then from the
+    SummaryCache table, and only then sent to the backend. Concurrent
+    requests for the same text share one pending future. Pending texts are
+    grouped into batches of up to batch_size; a batch is only formed once
+    one of max_concurrency backend slots is free, so under load requests
+    queue up into full batches instead of many small calls.
+    """
+
+    def __init__(self, backend, batch_size: int = 8, max_wait: float = 0.05,
+                 max_concurrency: int = 4, memory_size: int = 10000):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.memory_size = memory_size
+        self._slots = threading.Semaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._queue: queue.Queue = queue.Queue()
+        self._inflight: Dict[str, _Pending] = {}
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def content_hash(self, text: str) -> str:
+        return hashlib.sha256(f'{self.backend.version}\n{text}'.encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, summary: str):
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _done(summary: str) -> Future:
+        future: Future = Future()
+        future.set_result(summary)
+        return future
+
+    def submit(self, article_id: int) -> Optional[Future]:
+        """Future resolving to the article's summary, None if the article does not exist"""
+        row = (Article
+               .select(Article.content, Article.summary)
+               .where(Article.id == article_id)
+               .tuples()
+               .first())
+        if row is None:
+            return None
+        content, current = row
+        text = (content or '').strip()[:MAX_INPUT_CHARS]
+        if not text:
+            # Nothing to summarize; keep whatever the feed provided
+            return self._done(current or '')
+
+        key = self.content_hash(text)
+        with self._lock:
+            summary = self._memory.get(key)
+            if summary is not None:
+                self._memory.move_to_end(key)
+            elif key in self._inflight:
+                pending = self._inflight[key]
+                pending.article_ids.add(article_id)
+                return pending.future
+        if summary is None:
+            summary = (SummaryCache
+                       .select(SummaryCache.summary)
+                       .where(SummaryCache.content_hash == key)
+                       .scalar())
+        if summary is not None:
+            self._store_on_article(article_id, current, summary)
+            with self._lock:
+                self._remember(key, summary)
+            return self._done(summary)
+
+        with self._lock:
+            # Re-check: another request may have started or finished this text meanwhile
+            summary = self._memory.get(key)
+            if summary is None:
+                pending = self._inflight.get(key)
+                if pending is None:
+                    pending = self._inflight[key] = _Pending(text)
+                    self._queue.put(key)
+                    self._ensure_started()
+                pending.article_ids.add(article_id)
+                return pending.future
+        self._store_on_article(article_id, current, summary)
+        return self._done(summary)
+
+    def summarize(self, article_id: int, timeout: Optional[float] = None) -> Optional[str]:
+        future = self.submit(article_id)
+        return None if future is None else future.result(timeout=timeout)
+
+    @staticmethod
+    def _store_on_article(article_id: int, current: Optional[str], summary: str):
+        # Covers reposts: same text under another article id, already summarized
+        if current != summary:
+            Article.update(summary=summary).where(Article.id == article_id).execute()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='summarizer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            # Wait for a free slot before forming a batch, so a backlog yields full batches
+            self._slots.acquire()
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._summarize_batch, batch)
+
+    def _summarize_batch(self, keys: List[str]):
+        try:
+            with self._lock:
+                texts = [self._inflight[key].text for key in keys]
+            try:
+                summaries = self.backend.summarize_many(texts)
+                SummaryCache.insert_many([
+                    {'content_hash': key, 'summary': summary, 'model': self.backend.version}
+                    for key, summary in zip(keys, summaries)
+                ]).on_conflict_ignore().execute()
+            except Exception as e:
+                with self._lock:
+                    failed = [self._inflight.pop(key) for key in keys]
+                for pending in failed:
+                    pending.future.set_exception(e)
+                return
+
+            # From here on new requests hit the memory cache instead of joining
+            with self._lock:
+                done: List[Tuple[_Pending, str]] = []
+                for key, summary in zip(keys, summaries):
+                    self._remember(key, summary)
+                    done.append((self._inflight.pop(key), summary))
+            try:
+                with db.atomic():
+                    for pending, summary in done:
+                        (Article
+                         .update(summary=summary)
+                         .where(Article.id.in_(list(pending.article_ids)))
+                         .execute())
+            finally:
+                # The summary is already cached, so waiters get it even if this write failed
+                for pending, summary in done:
+                    pending.future.set_result(summary)
+        finally:
+            self._slots.release()
@@ -0,0 +1,45 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+class TrendSnapshot:
+    """
+    Serves the snapshot written by research/trend_engine.py.
+
+    The file is re-read only when its mtime changes, so requests cost a
+    stat() call plus a dict lookup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime: Optional[float] = None
+        self._data: Dict = {'scopes': {}}
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+
+    def top(self, scope: str = 'all', kind: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        self._refresh()
+        trends = self._data['scopes'].get(scope, [])
+        if kind:
+            trends = [t for t in trends if t['kind'] == kind]
+        return trends[:limit]
+
+    @property
+    def generated_at(self) -> Optional[str]:
+        self._refresh()
+        return self._data.get('generated_at')
@@ -0,0 +1,272 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+
+import psycopg2
+import psycopg2.extensions
+from aiohttp import web
+
+from models.database_models import db, Subscription
+from services.article_events import NEW_ARTICLES_CHANNEL, SUBSCRIPTIONS_CHANNEL
+from services.auth import TokenManager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15
+CLIENT_QUEUE_SIZE = 100
+MAX_RECONNECT_SECONDS = 30
+
+
+class SubscriberIndex:
+    """In-memory feed -> subscribed users index built from Subscription"""
+
+    def __init__(self):
+        self.feed_users: Dict[int, Set[int]] = defaultdict(set)
+        self.user_feeds: Dict[int, Set[int]] = defaultdict(set)
+
+    def load_all(self):
+        # Built aside and swapped in, so the event loop never sees a half-loaded index
+        feed_users: Dict[int, Set[int]] = defaultdict(set)
+        user_feeds: Dict[int, Set[int]] = defaultdict(set)
+        query = Subscription.select(Subscription.user, Subscription.feed).tuples()
+        for user_id, feed_id in query.iterator():
+            feed_users[feed_id].add(user_id)
+            user_feeds[user_id].add(feed_id)
+        self.feed_users, self.user_feeds = feed_users, user_feeds
+
+    @staticmethod
+    def fetch_user_feeds(user_id: int) -> Set[int]:
+        query = Subscription.select(Subscription.feed).where(Subscription.user == user_id).tuples()
+        return {feed_id for (feed_id,) in query}
+
+    def set_user_feeds(self, user_id: int, feed_ids: Set[int]):
+        for feed_id in self.user_feeds.pop(user_id, set()):
+            self.feed_users[feed_id].discard(user_id)
+        for feed_id in feed_ids:
+            self.feed_users[feed_id].add(user_id)
+        if feed_ids:
+            self.user_feeds[user_id] = set(feed_ids)
+
+    def subscribers(self, feed_id: int) -> Iterable[int]:
+        return self.feed_users.get(feed_id, ())
+
+
+class Broker:
+    """Fans article events out to the queues of connected users"""
+
+    def __init__(self, index: SubscriberIndex):
+        self.index = index
+        self.clients: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+
+    def connect(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.clients[user_id].add(queue)
+        return queue
+
+    def disconnect(self, user_id: int, queue: asyncio.Queue):
+        queues = self.clients.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.clients[user_id]
+
+    def publish(self, feed_id: int, event: Dict):
+        for user_id in self.index.subscribers(feed_id):
+            for queue in self.clients.get(user_id, ()):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # Slow client: drop the event, it can catch up by polling
+                    pass
+
+
+class NotificationListener:
+    """
+    Single LISTEN connection per process, driven by the event loop.
+
+    LISTEN is issued before the subscriber index is loaded, and queued
+    notifications are read only once the load is done, so changes made
+    while loading are applied on top of it. A dropped connection is
+    re-established with backoff and the index reloaded to cover the gap.
+    Per-user reloads run one at a time for each user; a change arriving
+    during a reload schedules exactly one more, so an older snapshot can
+    never overwrite a newer one.
+    """
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.conn = None
+        self.loop = None
+        self._fd = None
+        self._lost: asyncio.Event = None
+        self._task = None
+        # user id -> another reload requested while one is running
+        self._reloading: Dict[int, bool] = {}
+        # Bumped by every full load, which supersedes per-user reloads started before it
+        self._generation = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        self._close()
+
+    @staticmethod
+    def _connect():
+        # TCP keepalives make a silently dropped connection show up as a read error
+        conn = psycopg2.connect(dbname=db.database, keepalives=1, keepalives_idle=30,
+                                keepalives_interval=10, keepalives_count=3, **db.connect_params)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN {NEW_ARTICLES_CHANNEL}')
+            cursor.execute(f'LISTEN {SUBSCRIPTIONS_CHANNEL}')
+        return conn
+
+    async def _run(self):
+        delay = 1.0
+        while True:
+            try:
+                self.conn = await self.loop.run_in_executor(None, self._connect)
+                self._generation += 1
+                await self.loop.run_in_executor(None, self.broker.index.load_all)
+            except Exception as e:
+                logger.error(f"LISTEN connection failed, retrying in {delay:.0f}s: {e}")
+                self._close()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_SECONDS)
+                continue
+
+            delay = 1.0
+            logger.info(f"Listening; subscriber index loaded for {len(self.broker.index.user_feeds)} users")
+            self._lost = asyncio.Event()
+            self._fd = self.conn.fileno()
+            self.loop.add_reader(self._fd, self._on_readable)
+            # Notifications that arrived while the index was loading
+            self._on_readable()
+            await self._lost.wait()
+            logger.warning("LISTEN connection lost, reconnecting")
+            self._close()
+
+    def _close(self):
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            self._fd = None
+        if self.conn is not None:
+            with contextlib.suppress(psycopg2.Error):
+                self.conn.close()
+            self.conn = None
+
+    def _on_readable(self):
+        if self._lost.is_set():
+            return
+        try:
+            self.conn.poll()
+        except psycopg2.Error as e:
+            logger.error(f"LISTEN connection error: {e}")
+            self.loop.remove_reader(self._fd)
+            self._fd = None
+            self._lost.set()
+            return
+        while self.conn.notifies:
+            notification = self.conn.notifies.pop(0)
+            try:
+                payload = json.loads(notification.payload)
+            except ValueError:
+                logger.warning(f"Ignoring malformed payload on {notification.channel}")
+                continue
+
+            if notification.channel == NEW_ARTICLES_CHANNEL:
+                self.broker.publish(payload['feed_id'], payload)
+            elif notification.channel == SUBSCRIPTIONS_CHANNEL:
+                user_id = payload['user_id']
+                if user_id in self._reloading:
+                    self._reloading[user_id] = True
+                else:
+                    self._reloading[user_id] = False
+                    self.loop.create_task(self._reload_user(user_id))
+
+    async def _reload_user(self, user_id: int):
+        index = self.broker.index
+        try:
+            while True:
+                self._reloading[user_id] = False
+                generation = self._generation
+                feed_ids = await self.loop.run_in_executor(None, index.fetch_user_feeds, user_id)
+                if generation == self._generation:
+                    index.set_user_feeds(user_id, feed_ids)
+                if not self._reloading[user_id]:
+                    break
+        except Exception:
+            logger.exception(f"Reloading subscriptions of user {user_id} failed")
+        finally:
+            self._reloading.pop(user_id, None)
+
+
+async def stream(request: web.Request) -> web.StreamResponse:
+    # EventSource cannot set headers, so the token may also come as a query parameter
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else request.query.get('access_token')
+    user_id = request.app['tokens'].verify_access(token) if token else None
+    if user_id is None:
+        return web.json_response({'error': 'Invalid or expired token'}, status=401)
+
+    broker: Broker = request.app['broker']
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    await response.prepare(request)
+
+    queue = broker.connect(user_id)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await response.write(b': keep-alive\n\n')
+                continue
+            data = json.dumps(event)
+            await response.write(f'event: articles\ndata: {data}\n\n'.encode('utf-8'))
+    except ConnectionResetError:
+        pass
+    finally:
+        broker.disconnect(user_id, queue)
+    return response
+
+
+async def on_startup(app: web.Application):
+    # The listener loads the subscriber index itself, after LISTEN is in place
+    app['broker'] = Broker(SubscriberIndex())
+    app['listener'] = NotificationListener(app['broker'])
+    app['listener'].start(asyncio.get_running_loop())
+
+
+async def on_cleanup(app: web.Application):
+    await app['listener'].stop()
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app['tokens'] = TokenManager(os.environ['SECRET_KEY'])
+    app.router.add_get('/api/stream', stream)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), port=5001)